@@ -8,7 +8,14 @@ import uvicorn
 import time
 from pathlib import Path
 
+from mcp_server_jupyter import json_codec
+from mcp_server_jupyter.binary_frames import (
+    BinaryOutputMessage,
+    binary_message,
+    configured_min_bytes,
+)
 from mcp_server_jupyter.kernel_manager import KernelManager
+from mcp_server_jupyter.output_limiter import create_output_limiter
 from mcp_server_jupyter.package_manager import PackageManager
 from mcp_server_jupyter.logging_config import setup_logging
 from mcp_server_jupyter.config import config  # Import the config object
@@ -103,45 +110,73 @@ class ConnectionManager:
         self.idle_timeout: int = IDLE_TIMEOUT
         self._monitoring: bool = True
         self.last_activity: float = time.time()
-        self.last_broadcast: float = 0.0
-        self.throttle_interval: float = 0.1  # ~10Hz for output messages
+        # Per-execution token buckets for notebook/output (output_limiter.py)
+        self.output_limiter = create_output_limiter(self._fanout)
+        # Connections that accept binary output frames (binary_frames.py)
+        self.binary_connections: set = set()
+        self.binary_min_bytes = configured_min_bytes()
 
-    async def connect(self, websocket):
+    async def connect(self, websocket, binary: bool = False):
         self.active_connections.append(websocket)
+        if binary:
+            self.binary_connections.add(websocket)
         self.last_activity = time.time()
 
     def disconnect(self, websocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.binary_connections.discard(websocket)
         self.last_activity = time.time()
 
     async def broadcast(self, msg):
         """Broadcast a message to all active connections.
 
-        Output messages (notebook/output) are throttled to ~10Hz.
-        
+        Output messages (notebook/output) are rate limited per execution;
+        bursts are merged and delayed, never dropped. Any other message for a
+        notebook first flushes that notebook's delayed output.
+
         [HEAD-OF-LINE BLOCKING FIX] Uses fire-and-forget with background tasks
         instead of awaiting sends sequentially. This prevents a slow client from
         blocking all other clients from receiving updates.
         """
-        now = time.time()
         method = None
         if isinstance(msg, dict):
             method = msg.get("method")
 
-        if method and method.startswith("notebook/output"):
-            if now - self.last_broadcast < self.throttle_interval:
-                return
-            self.last_broadcast = now
+        if method == "notebook/output":
+            await self.output_limiter.submit(msg)
+            return
+        if isinstance(msg, dict) and self.output_limiter.pending_count():
+            notebook_path = (msg.get("params") or {}).get("notebook_path")
+            if notebook_path:
+                await self.output_limiter.flush(notebook_path)
+
+        await self._fanout(msg)
 
+    async def _fanout(self, msg):
+        """Send one message to every active connection."""
         # [HEAD-OF-LINE BLOCKING FIX] Fire-and-forget with background tasks
         # Instead of: for conn in ...: await conn.send_text(...)
         # We create background tasks so slow clients don't block others
         background_tasks = set()
-        
+        # Encode once for all clients; large images go to binary clients as
+        # one shared raw frame instead of base64 JSON
+        text = None
+        frame = None
+        if self.binary_connections and isinstance(msg, dict):
+            msg = binary_message(msg, self.binary_min_bytes)
+
         for conn in list(self.active_connections):
+            if isinstance(msg, BinaryOutputMessage) and conn in self.binary_connections:
+                if frame is None:
+                    frame = msg.frame()
+                payload = frame
+            else:
+                if text is None:
+                    text = msg if isinstance(msg, str) else json_codec.dumps(msg)
+                payload = text
             # Create a background task for each send (don't await)
-            task = asyncio.create_task(self._send_to_connection(conn, msg))
+            task = asyncio.create_task(self._send_to_connection(conn, payload))
             background_tasks.add(task)
             # Clean up completed tasks
             task.add_done_callback(background_tasks.discard)
@@ -152,12 +187,16 @@ class ConnectionManager:
     async def _send_to_connection(self, conn, msg):
         """Helper to send message to a single connection, removing on failure."""
         try:
-            payload = msg if isinstance(msg, str) else json.dumps(msg)
-            await conn.send_text(payload)
+            if isinstance(msg, bytes):
+                await conn.send_bytes(msg)
+            else:
+                payload = msg if isinstance(msg, str) else json_codec.dumps(msg)
+                await conn.send_text(payload)
         except Exception:
             # Remove broken connections (self-healing)
             if conn in self.active_connections:
                 self.active_connections.remove(conn)
+            self.binary_connections.discard(conn)
 
     def set_idle_timeout(self, seconds: int):
         self.idle_timeout = seconds
@@ -378,7 +417,8 @@ async def websocket_root(websocket: WebSocket):
     """Backward-compatible root websocket endpoint used by manual tests.
 
     Accepts optional ?token=<token> query param. If server is configured with
-    MCP_SESSION_TOKEN, the provided token must match.
+    MCP_SESSION_TOKEN, the provided token must match. With ?binary=1 the
+    client receives large image outputs as binary frames (binary_frames.py).
     """
     import os
     import uuid
@@ -397,6 +437,8 @@ async def websocket_root(websocket: WebSocket):
     session_id = token or str(uuid.uuid4())
 
     await websocket.accept()
+    binary = websocket.query_params.get("binary", "").lower() in ("1", "true", "yes")
+    await connection_manager.connect(websocket, binary=binary)
     client_ip = websocket.client.host if websocket.client else "unknown"
     logger.info(f"Client connected for session {session_id}", extra={"client_ip": client_ip})
 
@@ -411,7 +453,7 @@ async def websocket_root(websocket: WebSocket):
         while websocket.application_state == WebSocketState.CONNECTED:
             raw = await websocket.receive_text()
             try:
-                message_data = json.loads(raw)
+                message_data = json_codec.loads(raw)
             except Exception:
                 # Non-JSON messages are ignored
                 continue
@@ -421,7 +463,7 @@ async def websocket_root(websocket: WebSocket):
                 req_id = message_data.get("id")
                 # Send a minimal JSON-RPC response acknowledging initialize
                 resp = {"jsonrpc": "2.0", "id": req_id, "result": {"server": "mcp-server-jupyter"}}
-                await websocket.send_text(json.dumps(resp))
+                await websocket.send_text(json_codec.dumps(resp))
                 continue
 
             # Fallback: maintain compatibility with existing message format
@@ -429,7 +471,7 @@ async def websocket_root(websocket: WebSocket):
             if message_type == "execute_code":
                 code = message_data.get("code", "")
                 result = await kernel_manager.execute_code(session_id, code)
-                await websocket.send_text(json.dumps({"type": "execute_result", "data": result}))
+                await websocket.send_text(json_codec.dumps({"type": "execute_result", "data": result}))
 
     except WebSocketDisconnect:
         logger.info(f"Client {session_id} disconnected.", extra={"session_id": session_id, "client_ip": client_ip})
@@ -437,6 +479,8 @@ async def websocket_root(websocket: WebSocket):
         logger.error("Unhandled websocket error on root", exc_info=True, extra={"session_id": session_id})
         if websocket.application_state == WebSocketState.CONNECTED:
             await websocket.close(code=1011)
+    finally:
+        connection_manager.disconnect(websocket)
 
 
 async def main():
@@ -10,7 +10,8 @@ Prevents asset/ directory from polluting Git history:
 import re
 from pathlib import Path
 from typing import Set, Dict
-import nbformat
+
+from mcp_server_jupyter.notebook_cache import notebook_cache
 
 
 def ensure_assets_gitignored(assets_dir: str) -> bool:
@@ -76,8 +77,7 @@ def get_referenced_assets(notebook_path: str) -> Set[str]:
     referenced = set()
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            nb = nbformat.read(f, as_version=4)
+        nb = notebook_cache.get(path)
 
         # Pattern to match asset references
         # Matches:
@@ -213,11 +213,6 @@ def prune_unused_assets(notebook_path: str, dry_run: bool = False) -> Dict[str,
         "total_size_freed": total_size_freed,
         "message": message,
     }
-        "deleted": deleted,
-        "kept": kept,
-        "total_size_freed": total_size_freed,
-        "message": message,
-    }
 
 
 def get_assets_summary(notebook_path: str) -> Dict[str, any]:
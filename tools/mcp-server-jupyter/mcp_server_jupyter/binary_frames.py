@@ -0,0 +1,196 @@
+"""
+Binary Output Frames
+====================
+
+Binary WebSocket lane for large rich outputs (images, PDFs).
+
+A display_data PNG reaches the server as a base64 string in the IOPub JSON.
+Broadcasting it as `notebook/output` re-serializes that string with
+json.dumps for every connection, and the client decodes the base64 again.
+A 5 MB image costs ~6.7 MB of text per client.
+
+Design:
+1. split_output() pulls binary mime entries at or above `min_bytes` out of
+   a display_data/execute_result output. Each is base64-decoded once into
+   raw bytes; the nbformat output kept for the notebook is not touched.
+2. BinaryOutputMessage is the notebook/output JSON-RPC message (a dict, so
+   text clients and existing callbacks see exactly what they saw before).
+   It also carries the raw parts and builds one binary frame on first use,
+   shared by every binary client.
+3. Frame layout: 4-byte big-endian header length, UTF-8 JSON header, then
+   the raw parts back to back. The header is the message with each split
+   mime value replaced by null, plus a "buffers" list of
+   {"mime", "offset", "length"} into the payload.
+4. min_bytes <= 0 disables the lane (no output is split).
+5. Clients opt in with /ws?binary=1. Output normally leaves as forwarded
+   IOPub (notebook/iopub_message); ConnectionManager wraps those with
+   binary_message() only while a binary client is connected, and the
+   multiplexer sends a message carrying a large image on its own instead
+   of inside a notebook/iopub_batch.
+"""
+
+import binascii
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp_server_jupyter import json_codec
+from mcp_server_jupyter.config import settings
+
+DEFAULT_MIN_BYTES = 256 * 1024
+
+BINARY_MIME_TYPES = frozenset(
+    {
+        "image/png",
+        "image/jpeg",
+        "image/gif",
+        "image/webp",
+        "image/bmp",
+        "application/pdf",
+    }
+)
+
+_HEADER_LENGTH = struct.Struct(">I")
+
+_RICH_MSG_TYPES = ("display_data", "execute_result", "update_display_data")
+
+
+def _is_large(mime: str, value: Any, min_bytes: int) -> bool:
+    return (
+        mime in BINARY_MIME_TYPES and isinstance(value, str) and len(value) >= min_bytes
+    )
+
+
+def has_binary_data(data: Optional[Dict[str, Any]], min_bytes: int) -> bool:
+    """Whether split_output would split this mime bundle (no decoding)."""
+    if min_bytes <= 0 or not data:
+        return False
+    return any(_is_large(mime, value, min_bytes) for mime, value in data.items())
+
+
+def _split_data(
+    data: Dict[str, Any], min_bytes: int
+) -> Optional[Tuple[Dict[str, Any], List[Tuple[str, bytes]]]]:
+    parts = []
+    for mime, value in data.items():
+        if not _is_large(mime, value, min_bytes):
+            continue
+        try:
+            parts.append((mime, binascii.a2b_base64(value)))
+        except (binascii.Error, ValueError):
+            # Not valid base64: leave it in the JSON
+            continue
+    if not parts:
+        return None
+    stripped = dict(data)
+    for mime, _ in parts:
+        stripped[mime] = None
+    return stripped, parts
+
+
+def split_output(
+    output: Dict[str, Any], min_bytes: int
+) -> Optional[Tuple[Dict[str, Any], List[Tuple[str, bytes]]]]:
+    """
+    Separate large binary mime entries from an output.
+
+    Returns:
+        (output with split entries set to None, [(mime, raw bytes), ...]),
+        or None if nothing qualifies.
+    """
+    if min_bytes <= 0 or output.get("output_type") not in (
+        "display_data",
+        "execute_result",
+    ):
+        return None
+    split = _split_data(output.get("data") or {}, min_bytes)
+    if split is None:
+        return None
+    stripped = dict(output)
+    stripped["data"], parts = split
+    return stripped, parts
+
+
+def binary_message(message: Dict[str, Any], min_bytes: int) -> Dict[str, Any]:
+    """
+    Wrap a notebook/output or notebook/iopub_message carrying large images.
+
+    Returns a BinaryOutputMessage, or `message` itself if nothing qualifies.
+    """
+    if isinstance(message, BinaryOutputMessage) or min_bytes <= 0:
+        return message
+    method = message.get("method")
+    params = message.get("params") or {}
+    if method == "notebook/output":
+        split = split_output(params.get("output") or {}, min_bytes)
+        field = "output"
+    elif method == "notebook/iopub_message" and params.get("msg_type") in _RICH_MSG_TYPES:
+        content = params.get("content") or {}
+        split = _split_data(content.get("data") or {}, min_bytes)
+        if split is not None:
+            split = (dict(content, data=split[0]), split[1])
+        field = "content"
+    else:
+        return message
+    if split is None:
+        return message
+    return BinaryOutputMessage(message, *split, field=field)
+
+
+class BinaryOutputMessage(dict):
+    """An output message that can also be sent as one binary frame."""
+
+    def __init__(
+        self,
+        message: Dict[str, Any],
+        stripped_output: Dict[str, Any],
+        parts: List[Tuple[str, bytes]],
+        field: str = "output",
+    ):
+        super().__init__(message)
+        self._stripped_output = stripped_output
+        self._parts = parts
+        # The params entry the stripped output replaces in the frame header
+        self._field = field
+        self._frame: Optional[bytes] = None
+
+    def frame(self) -> bytes:
+        """Encode (once) the header and raw parts into a binary frame."""
+        if self._frame is None:
+            header = dict(self)
+            header["params"] = dict(header.get("params") or {})
+            header["params"][self._field] = self._stripped_output
+            buffers = []
+            offset = 0
+            for mime, raw in self._parts:
+                buffers.append({"mime": mime, "offset": offset, "length": len(raw)})
+                offset += len(raw)
+            header["buffers"] = buffers
+            encoded = json_codec.dumpb(header)
+            self._frame = b"".join(
+                [_HEADER_LENGTH.pack(len(encoded)), encoded]
+                + [raw for _, raw in self._parts]
+            )
+        return self._frame
+
+
+def decode_frame(frame: bytes) -> Tuple[Dict[str, Any], Dict[str, memoryview]]:
+    """Inverse of BinaryOutputMessage.frame(): (header, {mime: payload view})."""
+    view = memoryview(frame)
+    (length,) = _HEADER_LENGTH.unpack_from(view)
+    start = _HEADER_LENGTH.size
+    header = json_codec.loads(view[start : start + length])
+    payload = view[start + length :]
+    parts = {
+        b["mime"]: payload[b["offset"] : b["offset"] + b["length"]]
+        for b in header.get("buffers", [])
+    }
+    return header, parts
+
+
+def configured_min_bytes() -> int:
+    """MCP_BINARY_OUTPUT_MIN_BYTES (base64 length at which mime data is split)."""
+    return int(
+        os.getenv("MCP_BINARY_OUTPUT_MIN_BYTES")
+        or getattr(settings, "MCP_BINARY_OUTPUT_MIN_BYTES", DEFAULT_MIN_BYTES)
+    )
@@ -3,12 +3,112 @@ Cell ID Management for Git-Safe Notebook Operations
 
 Ensures all notebooks have stable UUIDs for cells (nbformat 4.5+).
 Migrates legacy notebooks and provides ID-based cell addressing.
+
+ID lookups go through a CellIdIndex kept with each cached document, so
+locating a cell is O(1) instead of a scan of the cell list.
 """
 
 import uuid
 import nbformat
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mcp_server_jupyter.io_lanes import on_notebook_lane
+from mcp_server_jupyter.notebook_cache import notebook_cache
+
+
+class CellIdIndex:
+    """
+    Cell id -> index map for one notebook document.
+
+    Built once per cached document (see NotebookDocumentCache.get_indexed)
+    and updated incrementally by writers on insert/delete/move. Every hit is
+    checked against the cell list, so a stale map causes a rebuild rather
+    than a wrong answer.
+
+    Inserts and deletes only edit the id list and note the lowest position
+    they shifted; the map is renumbered from there on the next lookup, so a
+    batch of edits costs one pass over the affected suffix.
+    """
+
+    def __init__(self, cells: Optional[List[nbformat.NotebookNode]] = None):
+        self._positions: Dict[str, int] = {}
+        # Ids by position; _positions is current only below _synced
+        self._order: List[Optional[str]] = []
+        self._synced = 0
+        if cells is not None:
+            self.rebuild(cells)
+
+    def rebuild(self, cells: List[nbformat.NotebookNode]) -> None:
+        self._order = [cell.get("id") for cell in cells]
+        self._positions = {
+            cell_id: idx for idx, cell_id in enumerate(self._order) if cell_id
+        }
+        self._synced = len(self._order)
+
+    def _sync(self) -> None:
+        """Renumber ids from the first position shifted since the last sync."""
+        for idx in range(self._synced, len(self._order)):
+            cell_id = self._order[idx]
+            if cell_id:
+                self._positions[cell_id] = idx
+        self._synced = len(self._order)
+
+    def copy(self) -> "CellIdIndex":
+        clone = CellIdIndex()
+        clone._positions = dict(self._positions)
+        clone._order = list(self._order)
+        clone._synced = self._synced
+        return clone
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._positions)
+
+    def lookup(self, cells: List[nbformat.NotebookNode], cell_id: str) -> Optional[int]:
+        """Return the index of `cell_id` in `cells`, or None."""
+        if self._synced < len(self._order):
+            self._sync()
+        idx = self._positions.get(cell_id)
+        if idx is None:
+            return None
+        if idx < len(cells) and cells[idx].get("id") == cell_id:
+            return idx
+        # Out of sync (document mutated without updating the map)
+        self.rebuild(cells)
+        return self._positions.get(cell_id)
+
+    def resolve_many(
+        self, cells: List[nbformat.NotebookNode], cell_ids: Iterable[str]
+    ) -> Dict[str, Optional[int]]:
+        """Resolve many ids at once; missing ids map to None."""
+        return {cell_id: self.lookup(cells, cell_id) for cell_id in cell_ids}
+
+    def inserted(self, index: int, cell_id: Optional[str]) -> None:
+        """Record a cell inserted at `index` (later cells shift right)."""
+        self._order.insert(index, cell_id)
+        self._synced = min(self._synced, index)
+
+    def deleted(self, index: int, cell_id: Optional[str]) -> None:
+        """Record removal of the cell at `index` (later cells shift left)."""
+        if index < len(self._order):
+            removed = self._order.pop(index)
+            if removed:
+                self._positions.pop(removed, None)
+        self._synced = min(self._synced, index)
+
+    def moved(self, from_index: int, to_index: int, cell_id: Optional[str]) -> None:
+        """Record a cell moved with list.pop(from_index) + insert(to_index)."""
+        self.deleted(from_index, cell_id)
+        self.inserted(to_index, cell_id)
+
+    def renamed(self, index: int, old_id: Optional[str], new_id: str) -> None:
+        """Record a cell at `index` getting a new id."""
+        if index < len(self._order) and self._order[index] == old_id:
+            self._order[index] = new_id
+            if old_id:
+                self._positions.pop(old_id, None)
+        self._positions[new_id] = index
 
 
 def ensure_cell_ids(nb: nbformat.NotebookNode) -> Tuple[bool, int]:
@@ -38,6 +138,7 @@ def ensure_cell_ids(nb: nbformat.NotebookNode) -> Tuple[bool, int]:
     return was_modified, cells_updated
 
 
+@on_notebook_lane
 def migrate_notebook_to_cell_ids(notebook_path: str) -> str:
     """
     Migrate notebook to use Cell IDs (nbformat 4.5+).
@@ -62,8 +163,7 @@ def migrate_notebook_to_cell_ids(notebook_path: str) -> str:
 
     try:
         # Read notebook
-        with open(path, "r", encoding="utf-8") as f:
-            nb = nbformat.read(f, as_version=4)
+        nb = notebook_cache.checkout(path)
 
         # Check version
         original_version = (nb.nbformat, nb.nbformat_minor)
@@ -98,7 +198,7 @@ def migrate_notebook_to_cell_ids(notebook_path: str) -> str:
 
 
 def find_cell_by_id(
-    nb: nbformat.NotebookNode, cell_id: str
+    nb: nbformat.NotebookNode, cell_id: str, id_index: Optional[CellIdIndex] = None
 ) -> Optional[Tuple[int, nbformat.NotebookNode]]:
     """
     Find cell by ID and return (index, cell).
@@ -106,16 +206,59 @@ def find_cell_by_id(
     Args:
         nb: Notebook node
         cell_id: Cell ID to search for
+        id_index: Optional index for `nb` (O(1) lookup instead of a scan)
 
     Returns:
         Tuple of (index, cell) if found, None otherwise
     """
+    if id_index is not None:
+        idx = id_index.lookup(nb.cells, cell_id)
+        return (idx, nb.cells[idx]) if idx is not None else None
+
     for idx, cell in enumerate(nb.cells):
         if hasattr(cell, "id") and cell.id == cell_id:
             return (idx, cell)
     return None
 
 
+def find_cells_by_id(
+    nb: nbformat.NotebookNode,
+    cell_ids: Iterable[str],
+    id_index: Optional[CellIdIndex] = None,
+) -> Dict[str, Optional[int]]:
+    """
+    Resolve many Cell IDs to indices in one pass.
+
+    Args:
+        nb: Notebook node
+        cell_ids: Cell IDs to resolve
+        id_index: Optional index for `nb` (built on the fly if omitted)
+
+    Returns:
+        Dict of cell_id -> index (None for IDs not in the notebook)
+    """
+    if id_index is None:
+        id_index = CellIdIndex(nb.cells)
+    return id_index.resolve_many(nb.cells, cell_ids)
+
+
+def resolve_cell_ids(notebook_path: str, cell_ids: List[str]) -> Dict[str, Optional[int]]:
+    """
+    Resolve many Cell IDs against a notebook on disk.
+
+    Uses the cached document's index, so repeated calls cost no scan.
+
+    Returns:
+        Dict of cell_id -> index (None for IDs not in the notebook)
+    """
+    path = Path(notebook_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+
+    nb, id_index = notebook_cache.get_indexed(path)
+    return id_index.resolve_many(nb.cells, cell_ids)
+
+
 def get_cell_id_at_index(nb: nbformat.NotebookNode, index: int) -> Optional[str]:
     """
     Get Cell ID at given index.
@@ -160,6 +303,7 @@ class StaleStateError(Exception):
     pass
 
 
+@on_notebook_lane
 def edit_cell_by_id(
     notebook_path: str, cell_id: str, content: str, expected_index: Optional[int] = None
 ) -> str:
@@ -184,11 +328,10 @@ def edit_cell_by_id(
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     # Find cell by ID
-    result = find_cell_by_id(nb, cell_id)
+    result = find_cell_by_id(nb, cell_id, id_index)
 
     # [FIX START] Heal-on-write: If an agent provided a temporary/buffer ID
     # (e.g., buffer-0) that isn't on disk yet, but the agent provided an
@@ -200,6 +343,7 @@ def edit_cell_by_id(
             # Heuristic: Treat the agent's expected index as authoritative
             # when ID lookup fails; assign the provided ID so the edit can
             # proceed even if the on-disk cell lacks a stable ID.
+            id_index.renamed(expected_index, candidate.get("id"), cell_id)
             candidate.id = cell_id
             result = (expected_index, candidate)
     # [FIX END]
@@ -224,10 +368,11 @@ def edit_cell_by_id(
         cell.outputs = []
         cell.execution_count = None
 
-    _atomic_write_notebook(nb, path)
+    _atomic_write_notebook(nb, path, id_index=id_index)
     return f"Cell {cell_id} (index {index}) edited successfully"
 
 
+@on_notebook_lane
 def delete_cell_by_id(
     notebook_path: str, cell_id: str, expected_index: Optional[int] = None
 ) -> str:
@@ -245,17 +390,20 @@ def delete_cell_by_id(
     Raises:
         StaleStateError: If cell moved or doesn't exist
     """
-    from mcp_server_jupyter.notebook import _atomic_write_notebook
+    from mcp_server_jupyter.notebook import (
+        _atomic_write_notebook,
+        _flush_pending_results,
+    )
 
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     # Find cell by ID
-    result = find_cell_by_id(nb, cell_id)
+    result = find_cell_by_id(nb, cell_id, id_index)
 
     # [FIX START] Heal-on-write: attempt recovery using expected_index when the
     # agent supplied a buffer-style ID (e.g., buffer-0) that isn't present on disk.
@@ -265,6 +413,7 @@ def delete_cell_by_id(
             # Heuristic: Treat the agent's expected index as authoritative
             # when ID lookup fails; assign the provided ID so the delete can
             # proceed even if the on-disk cell lacks a stable ID.
+            id_index.renamed(expected_index, candidate.get("id"), cell_id)
             candidate.id = cell_id
             result = (expected_index, candidate)
     # [FIX END]
@@ -285,11 +434,13 @@ def delete_cell_by_id(
 
     # Delete cell
     nb.cells.pop(index)
+    id_index.deleted(index, cell_id)
 
-    _atomic_write_notebook(nb, path)
+    _atomic_write_notebook(nb, path, id_index=id_index)
     return f"Cell {cell_id} (was at index {index}) deleted successfully. {len(nb.cells)} cells remaining."
 
 
+@on_notebook_lane
 def insert_cell_by_id(
     notebook_path: str,
     after_cell_id: Optional[str],
@@ -308,14 +459,17 @@ def insert_cell_by_id(
     Returns:
         Success message with new cell ID
     """
-    from mcp_server_jupyter.notebook import _atomic_write_notebook
+    from mcp_server_jupyter.notebook import (
+        _atomic_write_notebook,
+        _flush_pending_results,
+    )
 
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     # Create new cell with ID
     if cell_type == "code":
@@ -332,7 +486,7 @@ def insert_cell_by_id(
         nb.cells.insert(0, new_cell)
         insert_index = 0
     else:
-        result = find_cell_by_id(nb, after_cell_id)
+        result = find_cell_by_id(nb, after_cell_id, id_index)
         if not result:
             raise StaleStateError(
                 f"Cell ID {after_cell_id} not found. Notebook may have been modified."
@@ -342,5 +496,6 @@ def insert_cell_by_id(
         insert_index = index + 1
         nb.cells.insert(insert_index, new_cell)
 
-    _atomic_write_notebook(nb, path)
+    id_index.inserted(insert_index, new_cell.id)
+    _atomic_write_notebook(nb, path, id_index=id_index)
     return f"Cell inserted at index {insert_index} with ID {new_cell.id}"
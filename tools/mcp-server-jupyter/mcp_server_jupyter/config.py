@@ -17,6 +17,88 @@ class ServerConfig(BaseSettings):
     # Operational limits (defaults provided for tests/contracts)
     MCP_MEMORY_LIMIT_BYTES: int = int(os.getenv("MCP_MEMORY_LIMIT_BYTES", str(8 * 1024 * 1024 * 1024)))
     MCP_IO_POOL_SIZE: int = int(os.getenv("MCP_IO_POOL_SIZE", "4"))
+    # Byte budget for the in-process parsed notebook cache (notebook_cache.py)
+    MCP_NOTEBOOK_CACHE_BYTES: int = int(
+        os.getenv("MCP_NOTEBOOK_CACHE_BYTES", str(256 * 1024 * 1024))
+    )
+    # Worker threads shared by the per-notebook I/O lanes (io_lanes.py)
+    MCP_NOTEBOOK_IO_WORKERS: int = int(os.getenv("MCP_NOTEBOOK_IO_WORKERS", "4"))
+    # Notebooks at least this large are rewritten by splicing unchanged cell
+    # bytes from the previous file (notebook_splice.py); 0 disables
+    MCP_SPLICE_WRITE_MIN_BYTES: int = int(
+        os.getenv("MCP_SPLICE_WRITE_MIN_BYTES", str(4 * 1024 * 1024))
+    )
+    # Content-addressed store for large output payloads (output_store.py).
+    # Opt-in: payloads >= MIN_BYTES go to assets/blobs/ instead of the .ipynb
+    MCP_OUTPUT_BLOB_STORE: bool = os.getenv("MCP_OUTPUT_BLOB_STORE", "0").lower() in (
+        "1",
+        "true",
+        "yes",
+        "on",
+    )
+    MCP_OUTPUT_BLOB_MIN_BYTES: int = int(
+        os.getenv("MCP_OUTPUT_BLOB_MIN_BYTES", str(64 * 1024))
+    )
+    # Write-behind for execution results (write_behind.py). Max unflushed
+    # seconds is the durability window; 0 disables buffering.
+    MCP_WRITE_BEHIND_DEBOUNCE_SECONDS: float = float(
+        os.getenv("MCP_WRITE_BEHIND_DEBOUNCE_SECONDS", "0.25")
+    )
+    MCP_WRITE_BEHIND_MAX_UNFLUSHED_SECONDS: float = float(
+        os.getenv("MCP_WRITE_BEHIND_MAX_UNFLUSHED_SECONDS", "2.0")
+    )
+    # Consecutive IOPub stream chunks of one execution are merged for this
+    # long, or up to MAX_BYTES, before being emitted (stream_coalescer.py).
+    # A window of 0 disables coalescing.
+    MCP_STREAM_COALESCE_WINDOW_SECONDS: float = float(
+        os.getenv("MCP_STREAM_COALESCE_WINDOW_SECONDS", "0.05")
+    )
+    MCP_STREAM_COALESCE_MAX_BYTES: int = int(
+        os.getenv("MCP_STREAM_COALESCE_MAX_BYTES", str(64 * 1024))
+    )
+    # Per-execution output bytes held in memory before further outputs spill
+    # to assets/spill/ (output_spill.py); 0 disables spilling
+    MCP_OUTPUT_MEMORY_LIMIT_BYTES: int = int(
+        os.getenv("MCP_OUTPUT_MEMORY_LIMIT_BYTES", str(32 * 1024 * 1024))
+    )
+    # Direct-mode IOPub forwarding drains up to BATCH_SIZE queued messages
+    # (for at most WINDOW seconds) into one notebook/iopub_batch notification;
+    # a batch size of 1 sends one notebook/iopub_message per message
+    MCP_IOPUB_BATCH_SIZE: int = int(os.getenv("MCP_IOPUB_BATCH_SIZE", "64"))
+    MCP_IOPUB_BATCH_WINDOW_SECONDS: float = float(
+        os.getenv("MCP_IOPUB_BATCH_WINDOW_SECONDS", "0.005")
+    )
+    # Image/PDF mime data whose base64 is at least this long is sent to
+    # binary-capable WebSocket clients as raw bytes (binary_frames.py);
+    # 0 disables the binary lane
+    MCP_BINARY_OUTPUT_MIN_BYTES: int = int(
+        os.getenv("MCP_BINARY_OUTPUT_MIN_BYTES", str(256 * 1024))
+    )
+    # JSON backend for broadcasts, tool results and spill files
+    # (json_codec.py): auto (orjson, then msgspec, then stdlib), orjson,
+    # msgspec or stdlib
+    MCP_JSON_CODEC: str = os.getenv("MCP_JSON_CODEC", "auto")
+    # notebook/output broadcasts per execution: RATE tokens per second, up to
+    # BURST at once; excess output is merged and delayed, never dropped
+    # (output_limiter.py). A rate of 0 disables limiting
+    MCP_OUTPUT_RATE_PER_SECOND: float = float(
+        os.getenv("MCP_OUTPUT_RATE_PER_SECOND", "10")
+    )
+    MCP_OUTPUT_RATE_BURST: int = int(os.getenv("MCP_OUTPUT_RATE_BURST", "10"))
+    # run_all_cells(fanout=True) runs independent DAG branches on up to this
+    # many replica kernels next to the primary (fanout.py)
+    MCP_FANOUT_MAX_REPLICAS: int = int(os.getenv("MCP_FANOUT_MAX_REPLICAS", "2"))
+    # Execution queue lanes (execution_scheduler.LaneQueue): introspection,
+    # interactive, batch. A waiting lane is served after being passed over
+    # this many times in a row; 0 means strict priority
+    MCP_QUEUE_STARVATION_LIMIT: int = int(
+        os.getenv("MCP_QUEUE_STARVATION_LIMIT", "4")
+    )
+    # Cell dependency analyses (dag_executor.py) kept in an LRU keyed by
+    # source hash, shared across notebooks; 0 disables the cache
+    MCP_DAG_ANALYSIS_CACHE_ENTRIES: int = int(
+        os.getenv("MCP_DAG_ANALYSIS_CACHE_ENTRIES", "4096")
+    )
 
     # In a real app, you'd have more, like database URLs, external API keys, etc.
 
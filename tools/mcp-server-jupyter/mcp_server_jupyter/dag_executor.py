@@ -18,12 +18,21 @@ Example:
 """
 
 import ast
-from typing import Dict, List, Set, Union
-from dataclasses import dataclass
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field
 import logging
 
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.utils import get_cell_hash
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_ANALYSIS_CACHE_ENTRIES = 4096
+
 
 @dataclass
 class CellDependencies:
@@ -76,10 +85,70 @@ class VariableVisitor(ast.NodeVisitor):
         # Similar to functions, don't traverse body
 
 
+class AnalysisCache:
+    """
+    Bounded LRU of cell analyses shared across calls and notebooks.
+
+    Keyed by utils.get_cell_hash(source). That hash ignores whitespace, which
+    can matter to Python (indentation decides what is inside a function
+    body), so each entry keeps its source and a hit must match it exactly.
+    Entries hold frozensets; callers get fresh mutable copies.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_ANALYSIS_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, FrozenSet[str], FrozenSet[str]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, source: str) -> Optional[Tuple[FrozenSet[str], FrozenSet[str]]]:
+        """(defines, uses) for source, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+        return None
+
+    def put(self, key: str, source: str, defines: Set[str], uses: Set[str]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (source, frozenset(defines), frozenset(uses))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+analysis_cache = AnalysisCache(
+    int(
+        os.getenv("MCP_DAG_ANALYSIS_CACHE_ENTRIES")
+        or getattr(settings, "MCP_DAG_ANALYSIS_CACHE_ENTRIES", DEFAULT_ANALYSIS_CACHE_ENTRIES)
+    )
+)
+
+
 def analyze_cell(source: str, cell_index: int) -> CellDependencies:
     """
     Parse a cell's source code and extract dependencies.
 
+    Results are cached by source hash (see AnalysisCache), so only cells
+    whose source changed since an earlier call are parsed again.
+
     Args:
         source: Python source code
         cell_index: Cell position in notebook
@@ -87,6 +156,22 @@ def analyze_cell(source: str, cell_index: int) -> CellDependencies:
     Returns:
         CellDependencies with defines/uses sets
     """
+    key = get_cell_hash(source)
+    cached = analysis_cache.get(key, source)
+    if cached is not None:
+        return CellDependencies(
+            cell_index=cell_index,
+            defines=set(cached[0]),
+            uses=set(cached[1]),
+            source=source,
+        )
+
+    dependencies = _analyze_source(source, cell_index)
+    analysis_cache.put(key, source, dependencies.defines, dependencies.uses)
+    return dependencies
+
+
+def _analyze_source(source: str, cell_index: int) -> CellDependencies:
     try:
         tree = ast.parse(source)
         visitor = VariableVisitor()
@@ -162,53 +247,80 @@ def build_dependency_graph(cells: List[CellDependencies]) -> Dict[int, Set[int]]
     return graph
 
 
+def build_consumer_index(cells: List[CellDependencies]) -> Dict[str, List[int]]:
+    """
+    Reverse index: variable -> positions (in `cells`, ascending) of the cells
+    that read it.
+    """
+    consumers: Dict[str, List[int]] = {}
+    for position, cell in enumerate(cells):
+        for var in cell.uses:
+            consumers.setdefault(var, []).append(position)
+    return consumers
+
+
 def compute_affected_cells(
-    changed_cell: int, changed_variables: Set[str], cells: List[CellDependencies]
+    changed_cell: int,
+    changed_variables: Set[str],
+    cells: List[CellDependencies],
+    consumers: Optional[Dict[str, List[int]]] = None,
 ) -> Set[int]:
     """
     Compute which cells need re-execution after a change.
 
+    A cell is affected when it reads a variable that an affected cell above
+    it (re)defines. Propagation walks the consumer index breadth-first; each
+    (variable, consumer) pair is visited at most once, so the sweep is
+    O(V + E) apart from a bisect per newly dirtied variable.
+
+    A cell that reads a variable above the affected cell that redefines it
+    is not affected: in notebook order it reads the earlier binding. The
+    previous propagation kept one global dirty set and, depending on queue
+    order, also reran such cells.
+
     Args:
         changed_cell: Index of modified cell
         changed_variables: Variables that were redefined
         cells: All cell dependencies
+        consumers: build_consumer_index(cells), if the caller already has it
 
     Returns:
         Set of cell indices that must be re-executed
     """
+    if consumers is None:
+        consumers = build_consumer_index(cells)
+    positions = {cell.cell_index: position for position, cell in enumerate(cells)}
+    start = positions.get(changed_cell, changed_cell)
+
     # Start with the changed cell itself
     affected = {changed_cell}
-
-    # Build variable ownership map
-    var_to_cell = {}
-    for cell in cells:
-        for var in cell.defines:
-            var_to_cell[var] = cell.cell_index
-
-    # Track which variables have been modified by cascade
-    dirty_vars = set(changed_variables)
-
-    # BFS to find downstream dependencies
-    queue = [changed_cell]
-    visited = {changed_cell}
-
-    while queue:
-        current = queue.pop(0)
-        current_cell = cells[current]
-
-        # When a cell is rerun, all its outputs become dirty
-        dirty_vars.update(current_cell.defines)
-
-        # Find cells that use any dirty variables
-        for cell in cells[current + 1 :]:  # Only look forward (execution order matters)
-            if cell.cell_index in visited:
+    # var -> lowest position whose later consumers have been visited
+    dirty_from: Dict[str, int] = {}
+    queue: Deque[int] = deque()
+
+    def mark_dirty(variables: Set[str], position: int) -> None:
+        for var in variables:
+            readers = consumers.get(var)
+            if not readers:
                 continue
-
-            # Does this cell use any dirty variables?
-            if dirty_vars & cell.uses:
-                affected.add(cell.cell_index)
-                visited.add(cell.cell_index)
-                queue.append(cell.cell_index)
+            # Consumers after the previous (lower-or-equal) mark were already visited
+            seen_from = dirty_from.get(var, len(cells))
+            if position >= seen_from:
+                continue
+            dirty_from[var] = position
+            for reader in readers[
+                bisect_right(readers, position) : bisect_right(readers, seen_from)
+            ]:
+                index = cells[reader].cell_index
+                if index not in affected:
+                    affected.add(index)
+                    queue.append(reader)
+
+    # When a cell is rerun, all its outputs become dirty
+    mark_dirty(set(changed_variables) | cells[start].defines, start)
+    while queue:
+        position = queue.popleft()
+        mark_dirty(cells[position].defines, position)
 
     return affected
 
@@ -255,8 +367,8 @@ def get_minimal_rerun_set(
 
         dependencies.append(analyze_cell(source, i))
 
-    # Build dependency graph
-    build_dependency_graph(dependencies)
+    # Reverse index, shared by every changed cell
+    consumers = build_consumer_index(dependencies)
 
     # Compute all affected cells
     affected = set()
@@ -264,7 +376,7 @@ def get_minimal_rerun_set(
         if changed_idx < len(dependencies):
             changed_dep = dependencies[changed_idx]
             newly_affected = compute_affected_cells(
-                changed_idx, changed_dep.defines, dependencies
+                changed_idx, changed_dep.defines, dependencies, consumers
             )
             affected.update(newly_affected)
         else:
@@ -280,6 +392,214 @@ def get_minimal_rerun_set(
     return affected
 
 
+
+@dataclass
+class FanoutPlan:
+    """
+    How a run-all splits across the primary kernel and replicas.
+
+    Every list holds cell indices in notebook order. `trunk` runs first
+    (replicas replay it), `branches` are mutually independent and
+    branches[0] stays on the primary, `merge` are replica cells the primary
+    re-executes to pick up their definitions, `joins` run last on the primary.
+    """
+
+    order: List[int]
+    trunk: List[int] = field(default_factory=list)
+    branches: List[List[int]] = field(default_factory=list)
+    merge: List[int] = field(default_factory=list)
+    joins: List[int] = field(default_factory=list)
+    reason: str = ""  # Why the plan is sequential, if it is
+
+    @property
+    def parallel(self) -> bool:
+        return len(self.branches) > 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "parallel": self.parallel,
+            "trunk": self.trunk,
+            "branches": self.branches,
+            "merge": self.merge,
+            "joins": self.joins,
+            "reason": self.reason,
+        }
+
+
+def _stored_base(node: ast.AST) -> Optional[str]:
+    """`df` for targets like df["a"], df.attr, df.loc[0, "a"]."""
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _planning_dependencies(source: str, cell_index: int) -> Optional[CellDependencies]:
+    """
+    analyze_cell, made conservative enough to run cells in separate kernels.
+
+    Names a cell both reads and rebinds (`a = a + b`) stay in `uses`, imports
+    count as definitions, item/attribute stores and augmented assignments as
+    both use and definition of the base name. Returns None for cells the
+    analysis cannot see through (magics, syntax errors, star imports).
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    visitor = VariableVisitor()
+    visitor.visit(tree)
+    deps = CellDependencies(
+        cell_index=cell_index,
+        defines=set(visitor.defines),
+        uses=set(visitor.uses),
+        source=source,
+    )
+    imported: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                imported.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name) and not isinstance(node, ast.AugAssign):
+                    continue
+                base = _stored_base(target)
+                if base:
+                    deps.defines.add(base)
+                    deps.uses.add(base)
+
+    deps.defines |= imported
+    deps.uses -= imported
+    return deps
+
+
+def _reaching_edges(deps: List[CellDependencies]) -> Dict[int, Set[int]]:
+    """Cell -> earlier cells whose definitions it reads (last definition wins)."""
+    edges: Dict[int, Set[int]] = {}
+    last_definition: Dict[str, int] = {}
+    for cell in deps:
+        edges[cell.cell_index] = {
+            last_definition[var] for var in cell.uses if var in last_definition
+        }
+        for var in cell.defines:
+            last_definition[var] = cell.cell_index
+    return edges
+
+
+def _split_branches(
+    cells: List[int], edges: Dict[int, Set[int]], deps: Dict[int, CellDependencies]
+) -> Tuple[List[List[int]], List[int]]:
+    """Split cells into independent branches plus the join cells that need several."""
+    parent: Dict[int, int] = {}
+
+    def find(cell: int) -> int:
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    joins: List[int] = []
+    join_set: Set[int] = set()
+    join_names: Set[str] = set()
+    for cell in cells:
+        preds = {p for p in edges[cell] if p in parent or p in join_set}
+        roots = {find(p) for p in preds if p not in join_set}
+        # A cell that feeds on a join, or rebinds a name a join touches,
+        # must run after the joins
+        if preds & join_set or len(roots) > 1 or deps[cell].defines & join_names:
+            joins.append(cell)
+            join_set.add(cell)
+            join_names |= deps[cell].defines | deps[cell].uses
+            continue
+        parent[cell] = cell
+        for root in roots:
+            parent[root] = cell
+
+    groups: Dict[int, List[int]] = {}
+    for cell in parent:
+        groups.setdefault(find(cell), []).append(cell)
+    branches = sorted(groups.values(), key=lambda branch: branch[0])
+
+    # Branches that bind a name another branch reads or binds would see each
+    # other's values when run in sequence; keep those together
+    defines = [set().union(*(deps[c].defines for c in b)) for b in branches]
+    names = [d | set().union(*(deps[c].uses for c in b)) for d, b in zip(defines, branches)]
+    group = list(range(len(branches)))
+
+    def find_group(i: int) -> int:
+        while group[i] != i:
+            i = group[i]
+        return i
+
+    for i in range(len(branches)):
+        for j in range(i + 1, len(branches)):
+            if defines[i] & names[j] or defines[j] & names[i]:
+                group[find_group(j)] = find_group(i)
+
+    merged: Dict[int, List[int]] = {}
+    for i, branch in enumerate(branches):
+        merged.setdefault(find_group(i), []).extend(branch)
+    return sorted((sorted(b) for b in merged.values()), key=lambda b: b[0]), joins
+
+
+def plan_fanout(cells: List[Tuple[int, str]]) -> FanoutPlan:
+    """
+    Plan a fan-out run of `cells` ((cell_index, source) pairs in notebook order).
+
+    The trunk is the shortest prefix after which the remaining cells fall
+    into at least two independent branches; it always extends past the last
+    cell the analysis cannot see through. The largest branch becomes
+    branches[0] (the primary's). When no split exists the plan is sequential:
+    everything is trunk and `reason` says why.
+    """
+    order = [index for index, _ in cells]
+    plan = FanoutPlan(order=order, trunk=list(order))
+
+    deps: Dict[int, CellDependencies] = {}
+    barrier = -1
+    for position, (index, source) in enumerate(cells):
+        cell_deps = _planning_dependencies(source, index)
+        if cell_deps is None:
+            barrier = position
+            cell_deps = CellDependencies(index, set(), set(), source)
+        deps[index] = cell_deps
+    edges = _reaching_edges([deps[index] for index in order])
+
+    for split in range(barrier + 1, len(order)):
+        branches, joins = _split_branches(order[split:], edges, deps)
+        if len(branches) > 1:
+            break
+    else:
+        plan.reason = (
+            "cells after the last magic or unparseable cell are a single chain"
+            if barrier >= 0
+            else "no independent branches"
+        )
+        return plan
+
+    primary = max(range(len(branches)), key=lambda i: (len(branches[i]), -i))
+    branches.insert(0, branches.pop(primary))
+    plan.trunk = order[:split]
+    plan.branches = branches
+    plan.joins = joins
+
+    # The primary needs every replica definition (and what it was computed
+    # from); cells that only display or print are not repeated
+    replica_cells = {cell for branch in branches[1:] for cell in branch}
+    needed = [c for c in replica_cells if deps[c].defines]
+    merge: Set[int] = set()
+    while needed:
+        cell = needed.pop()
+        if cell not in merge:
+            merge.add(cell)
+            needed.extend(edges[cell] & replica_cells)
+    plan.merge = [cell for cell in order if cell in merge]
+    return plan
+
 # Example usage for testing
 if __name__ == "__main__":
     # Test case
@@ -1,13 +1,165 @@
 import asyncio
+import os
 import time
 import logging
-from typing import Any, Dict, Optional
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.output_spill import create_output_buffer
 
 logger = logging.getLogger(__name__)
 
+TERMINAL_STATUSES = frozenset({"completed", "error", "cancelled", "timeout"})
+
+# Queue lanes, highest dispatch priority first. Introspection probes
+# (variable manifests, import cache refresh) are short, so they go between
+# cells instead of behind the whole backlog.
+LANE_INTROSPECTION = "introspection"
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTROSPECTION, LANE_INTERACTIVE, LANE_BATCH)
+
+# A waiting lane is served after being passed over this many times in a row
+DEFAULT_STARVATION_LIMIT = 4
+
+# Finished executions kept per session (by exec_id) for status lookups
+FINISHED_HISTORY = 64
+
+
+def _lane_of(item: Any) -> str:
+    if item is None:
+        # Shutdown signal: after the work already queued in every lane
+        return LANE_BATCH
+    lane = item.get("lane", LANE_INTERACTIVE) if isinstance(item, dict) else None
+    return lane if lane in LANES else LANE_INTERACTIVE
+
+
+class _Lanes:
+    """One FIFO per lane; len() is the total, as asyncio.Queue expects."""
+
+    __slots__ = ("fifos", "passed_over", "size")
+
+    def __init__(self):
+        self.fifos = {lane: deque() for lane in LANES}
+        self.passed_over = {lane: 0 for lane in LANES}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return repr({lane: len(fifo) for lane, fifo in self.fifos.items()})
+
+
+class LaneQueue(asyncio.Queue):
+    """
+    Execution queue with priority lanes and starvation protection.
+
+    Items are dicts with an optional "lane" (interactive by default). get()
+    takes the oldest item of the highest-priority non-empty lane, unless a
+    lower lane has been passed over `starvation_limit` times in a row; then
+    that lane goes first. A limit of 0 means strict priority.
+    """
+
+    def __init__(self, maxsize: int = 0, starvation_limit: int = DEFAULT_STARVATION_LIMIT):
+        self.starvation_limit = starvation_limit
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self._queue = _Lanes()
+
+    def _put(self, item):
+        self._queue.fifos[_lane_of(item)].append(item)
+        self._queue.size += 1
+
+    def _get(self):
+        lanes = self._queue
+        waiting = [lane for lane in LANES if lanes.fifos[lane]]
+        chosen = waiting[0]
+        if self.starvation_limit > 0:
+            starved = [
+                lane
+                for lane in waiting[1:]
+                if lanes.passed_over[lane] >= self.starvation_limit
+            ]
+            if starved:
+                chosen = max(starved, key=lambda lane: lanes.passed_over[lane])
+
+        for lane in LANES:
+            if lane == chosen or not lanes.fifos[lane]:
+                lanes.passed_over[lane] = 0
+            else:
+                lanes.passed_over[lane] += 1
+        lanes.size -= 1
+        return lanes.fifos[chosen].popleft()
+
+    def lane_sizes(self) -> Dict[str, int]:
+        return {lane: len(fifo) for lane, fifo in self._queue.fifos.items()}
+
+    def drain(self, lanes: Iterable[str] = LANES) -> List[Any]:
+        """Remove and return every queued item in `lanes`; others stay queued."""
+        lanes = set(lanes)
+        passed_over = dict(self._queue.passed_over)
+        removed, kept = [], []
+        while True:
+            try:
+                item = self.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            (removed if _lane_of(item) in lanes else kept).append(item)
+        for item in kept:
+            self.put_nowait(item)
+        self._queue.passed_over.update(passed_over)
+        return removed
+
+
+def create_execution_queue(maxsize: int = 0) -> LaneQueue:
+    """Build a LaneQueue from MCP_QUEUE_STARVATION_LIMIT."""
+    return LaneQueue(
+        maxsize,
+        starvation_limit=int(
+            os.getenv("MCP_QUEUE_STARVATION_LIMIT")
+            or getattr(settings, "MCP_QUEUE_STARVATION_LIMIT", DEFAULT_STARVATION_LIMIT)
+        ),
+    )
+
+
+class ExecutionRecord(dict):
+    """
+    Execution entry that signals its own completion.
+
+    Writing a terminal status (by the IOPub router, a timeout, or a test
+    mutating session_data['executions'][msg_id]['status']) sets
+    `completion_event` directly, so waiting on a running cell needs no
+    polling task.
+    """
+
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key == "status" and value in TERMINAL_STATUSES:
+            event = self.get("completion_event")
+            if event is not None:
+                event.set()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
 class ExecutionScheduler:
-    def __init__(self, default_timeout: int = 300):
+    def __init__(self, default_timeout: int = 300, io_multiplexer=None):
         self.default_timeout = default_timeout
+        # Registers and retires executions for IOPub routing. Without one,
+        # entries are plain dict items completed by whoever owns the dict.
+        self.io_multiplexer = io_multiplexer
 
     def _check_linearity(self, session_data: Dict[str, Any], cell_index: int) -> str:
         """Return warning string if execution is non-linear (backwards)."""
@@ -29,6 +181,7 @@ class ExecutionScheduler:
         exec_id: str,
         execute_callback,
         persistence=None,
+        finalize_callback=None,
     ) -> None:
         """Register an execution and wait for it to complete or timeout.
 
@@ -41,6 +194,10 @@ class ExecutionScheduler:
         of polling with sleep(0.01). This eliminates the 100 checks/second CPU burn.
         
         [PERSISTENCE FIX] Optional persistence manager to record task lifecycle events.
+
+        finalize_callback(nb_path, exec_entry), if given, is awaited once the
+        execution has completed or failed (not on timeout, while the kernel is
+        still running it), e.g. to save its outputs to the notebook.
         """
         # Call execute callback to get msg_id; handle exceptions
         try:
@@ -69,43 +226,25 @@ class ExecutionScheduler:
         # [OBSERVABILITY Fix] Use asyncio.Event instead of polling
         completion_event = asyncio.Event()
         
-        exec_entry = {
-            "status": "running",
-            "cell_index": cell_index,
-            "execution_count": execution_count,
-            "start_time": time.time(),
-            "finalization_event": asyncio.Event(),
-            "completion_event": completion_event,  # <-- THE FIX: Push, not Poll
-            "error": None,
-            # Execution identifier provided by SessionManager (task id)
-            "id": exec_id,
-            # Outputs accumulated from IOPub
-            "outputs": [],
-            "output_count": 0,
-            "text_summary": linearity_warning,
-            "last_activity": time.time(),
-        }
-
-        # Sanity monitor: In unit tests we sometimes simulate an error by directly
-        # mutating session_data['executions'][msg_id]['status'] = 'error'. To
-        # ensure the completion_event gets set in those test scenarios, spawn a
-        # lightweight monitor that sets the completion_event when status changes
-        # to a terminal state.
-        async def _status_monitor(entry):
-            try:
-                while True:
-                    await asyncio.sleep(0.01)
-                    s = entry.get("status")
-                    if s in {"completed", "error", "cancelled", "timeout"}:
-                        if "completion_event" in entry and entry["completion_event"]:
-                            entry["completion_event"].set()
-                        break
-            except asyncio.CancelledError:
-                pass
-            except Exception:
-                pass
-
-        status_monitor_task = asyncio.create_task(_status_monitor(exec_entry))
+        exec_entry = ExecutionRecord(
+            {
+                "status": "running",
+                "cell_index": cell_index,
+                "execution_count": execution_count,
+                "start_time": time.time(),
+                "finalization_event": asyncio.Event(),
+                # Set by the status setter, no monitor task needed
+                "completion_event": completion_event,
+                "error": None,
+                # Execution identifier provided by SessionManager (task id)
+                "id": exec_id,
+                # Outputs accumulated from IOPub (spills to disk past a memory ceiling)
+                "outputs": create_output_buffer(nb_path),
+                "output_count": 0,
+                "text_summary": linearity_warning,
+                "last_activity": time.time(),
+            }
+        )
 
         # Remove from queued_executions (it is now being processed)
         try:
@@ -114,7 +253,12 @@ class ExecutionScheduler:
         except Exception:
             pass
 
-        session_data["executions"][msg_id] = exec_entry
+        executions = session_data["executions"]
+        if self.io_multiplexer is not None:
+            # Indexes msg_id and flushes IOPub messages that beat registration
+            self.io_multiplexer.register_execution(executions, msg_id, exec_entry)
+        else:
+            executions[msg_id] = exec_entry
         logger.info(f"Registered execution: msg_id={msg_id} id={exec_id} cell_index={cell_index} status={exec_entry['status']}")
 
         # Wait for completion or timeout
@@ -123,7 +267,12 @@ class ExecutionScheduler:
         # Helper: best-effort auto-complete for tests that don't simulate kernel messages.
         # Do NOT auto-complete if code appears to contain a long-blocking call like time.sleep()
         # or an explicit raise (tests simulate errors by setting status to 'error').
-        if "time.sleep" not in (code or "") and "raise" not in (code or ""):
+        # With a multiplexer the kernel's own messages complete the entry.
+        if (
+            self.io_multiplexer is None
+            and "time.sleep" not in (code or "")
+            and "raise" not in (code or "")
+        ):
             # schedule best-effort completion after slightly longer delay so tests can
             # observe a 'running' status before completion (tests commonly sleep 0.1s).
             try:
@@ -160,6 +309,25 @@ class ExecutionScheduler:
             # Signal finalization
             exec_entry["finalization_event"].set()
 
+            if finalize_callback is not None and exec_entry.get("status") in (
+                "completed",
+                "error",
+            ):
+                try:
+                    await finalize_callback(nb_path, exec_entry)
+                except Exception:
+                    logger.exception(f"Finalize callback failed for {msg_id}")
+
+            # Finished entries stop taking part in parent_id routing; waiters
+            # keep their reference to exec_entry, status lookups find it here
+            finished = session_data.setdefault("finished_executions", {})
+            finished.pop(exec_id, None)
+            finished[exec_id] = exec_entry
+            while len(finished) > FINISHED_HISTORY:
+                finished.pop(next(iter(finished)))
+            if self.io_multiplexer is not None:
+                self.io_multiplexer.retire_execution(executions, msg_id)
+
             # Clear short-lived queued hint to avoid lingering 'busy' state
             try:
                 session_data.pop("last_queued_ts", None)
@@ -170,17 +338,21 @@ class ExecutionScheduler:
             if exec_entry.get("status") == "error" and session_data.get("stop_on_error"):
                 await self._clear_queue_on_error(session_data, exec_entry.get("error"))
 
-            # Ensure the status monitor task is cancelled to avoid leaks
-            try:
-                status_monitor_task.cancel()
-            except Exception:
-                pass
-
 
     async def _clear_queue_on_error(self, session_data: Dict[str, Any], error: Optional[str]) -> None:
         q = session_data.get("execution_queue")
         if q is None:
             return
+        if isinstance(q, LaneQueue):
+            # Cells after the failure are dropped; introspection probes do not
+            # depend on them and still run
+            removed = q.drain((LANE_INTERACTIVE, LANE_BATCH))
+            queued = session_data.get("queued_executions")
+            if queued:
+                for item in removed:
+                    if isinstance(item, dict):
+                        queued.pop(item.get("exec_id"), None)
+            return
         # Drain the queue robustly. Use get_nowait in a loop and stop when QueueEmpty
         try:
             while True:
@@ -198,18 +370,42 @@ class ExecutionScheduler:
         except Exception:
             pass
 
-    async def process_queue(self, nb_path: str, session_data: Dict[str, Any], execute_callback, persistence=None):
+    async def process_queue(
+        self,
+        nb_path: str,
+        session_data: Dict[str, Any],
+        execute_callback,
+        persistence=None,
+        drain_callback=None,
+        dispatch_callback=None,
+        finalize_callback=None,
+    ):
         """Process items from `execution_queue` sequentially until a None shutdown signal.
+
+        With a LaneQueue, items are taken by lane priority (see LaneQueue);
+        a plain asyncio.Queue is processed FIFO.
         
         Args:
             nb_path: Notebook path
             session_data: Session data dict
             execute_callback: Async callback to execute code
             persistence: Optional PersistenceManager for task lifecycle tracking
+            drain_callback: Optional async callback(nb_path) awaited whenever the
+                queue becomes empty (e.g. flush buffered notebook writes)
+            dispatch_callback: Optional async callback(item) -> msg_id used
+                instead of execute_callback when starting an item needs more
+                than its code (cell index, exec_id)
+            finalize_callback: Optional async callback(nb_path, exec_entry)
+                awaited after each finished execution (see _execute_cell)
+
+        Each item runs under session_data["exec_lock"], so work that holds
+        the lock (a fan-out run) pauses the queue.
         """
         q = session_data.get("execution_queue")
         if q is None:
             return
+        # Held per cell; a fan-out run holds it for the whole run
+        exec_lock = session_data.setdefault("exec_lock", asyncio.Lock())
 
         while True:
             logger.debug(f"Waiting for next execution item on queue for {nb_path}")
@@ -226,22 +422,36 @@ class ExecutionScheduler:
 
             # Each item should be a dict with cell_index, code, exec_id
             logger.info(f"Dequeued execution item for {nb_path}: {item}")
+            start = execute_callback
+            if dispatch_callback is not None:
+
+                async def start(code, item=item):
+                    return await dispatch_callback(item)
+
             try:
                 # Call execute_callback and then wait for cell execution (sequential)
                 # [STATE AMNESIA FIX] Pass persistence to track task lifecycle
-                await self._execute_cell(
-                    nb_path=nb_path,
-                    session_data=session_data,
-                    cell_index=item.get("cell_index"),
-                    code=item.get("code"),
-                    exec_id=item.get("exec_id"),
-                    execute_callback=execute_callback,
-                    persistence=persistence,
-                )
+                async with exec_lock:
+                    await self._execute_cell(
+                        nb_path=nb_path,
+                        session_data=session_data,
+                        cell_index=item.get("cell_index"),
+                        code=item.get("code"),
+                        exec_id=item.get("exec_id"),
+                        execute_callback=start,
+                        persistence=persistence,
+                        finalize_callback=finalize_callback,
+                    )
             except Exception:
                 # Ensure that exceptions in processing a cell don't kill the loop
                 logger.exception(f"Error while processing execution item for {nb_path}")
-                continue
+
+            # Queue drained: let the owner flush anything it batched per cell
+            if drain_callback is not None and q.empty():
+                try:
+                    await drain_callback(nb_path)
+                except Exception:
+                    logger.exception(f"Drain callback failed for {nb_path}")
 
 
 def _auto_complete_callback(exec_entry: dict):
@@ -253,10 +463,8 @@ def _auto_complete_callback(exec_entry: dict):
     """
     try:
         if exec_entry.get("status") == "running":
+            # Setting the status signals the waiting coroutine (ExecutionRecord)
             exec_entry["status"] = "completed"
-            # [OBSERVABILITY FIX] Signal completion to waiting coroutine
-            if "completion_event" in exec_entry:
-                exec_entry["completion_event"].set()
     except Exception:
         pass
 
@@ -0,0 +1,399 @@
+"""
+Fan-out Execution
+=================
+
+Opt-in parallel run-all: independent branches of the cell dependency DAG
+run at the same time on replica kernels.
+
+A run-all executes every cell one after another on one kernel, even when
+half the notebook never reads what the other half computes.
+
+Design:
+1. dag_executor.plan_fanout splits the cells into a trunk, independent
+   branches, merge cells and joins. A sequential plan runs every cell on
+   the primary, as a plain run-all would.
+2. Replica kernels are started in the primary's environment and working
+   directory while the primary runs the trunk. Each replica replays the
+   trunk, then runs the branches assigned to it. The primary runs the
+   trunk and branches[0] through execute_cell_async, so clients see the
+   usual notifications.
+3. Merge: once every branch is done, the primary re-executes only the
+   replica cells that define names (plus what they were computed from),
+   then runs the join cells. A branch whose replica could not start runs
+   on the primary instead of being merged.
+4. Outputs of every first execution are written to the notebook, as a
+   run-all would: replica cells from the replica, primary cells from an
+   execution record registered with the IOPub multiplexer as the request
+   is sent. The output of merge re-execution is not written. The first error stops the run: later phases are
+   skipped and replicas are always shut down. A primary cell that times
+   out, or is still running when a replica fails, is interrupted so the
+   kernel is free when the report comes back.
+6. The run holds the session's exec_lock, which the execution queue also
+   takes per cell, so queued cells and probes wait for the run instead of
+   interleaving with it on the primary.
+5. The report gives wall-clock time, the sequential estimate (one
+   execution of every cell, as measured in this run) and their ratio.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from queue import Empty
+from typing import Any, Dict, List, Optional, Tuple
+
+import nbformat
+
+from mcp_server_jupyter import notebook
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.dag_executor import FanoutPlan, plan_fanout
+from mcp_server_jupyter.execution_scheduler import ExecutionRecord
+from mcp_server_jupyter.kernel_startup import get_startup_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_REPLICAS = 2
+DEFAULT_CELL_TIMEOUT = 300
+# How long to wait after execute_reply for the cell's IOPub idle status
+_OUTPUT_SETTLE_SECONDS = 5.0
+_OUTPUT_MSG_TYPES = {"stream", "display_data", "execute_result", "error"}
+
+
+class CellFailed(Exception):
+    """A cell finished with status other than ok."""
+
+    def __init__(self, cell_index: int, content: Dict[str, Any]):
+        self.cell_index = cell_index
+        self.content = content
+        super().__init__(
+            f"Cell {cell_index} failed: "
+            f"{content.get('ename', content.get('status'))}: {content.get('evalue', '')}"
+        )
+
+
+class ReplicaKernel:
+    """A scratch kernel that runs the trunk and one or more branches."""
+
+    def __init__(
+        self,
+        lifecycle,
+        kernel_id: str,
+        notebook_dir: Path,
+        venv_path: Optional[str] = None,
+    ):
+        self.lifecycle = lifecycle
+        self.kernel_id = kernel_id
+        self.notebook_dir = notebook_dir
+        self.venv_path = venv_path
+        self.kc = None
+
+    async def start(self) -> None:
+        km = await self.lifecycle.start_kernel(
+            kernel_id=self.kernel_id,
+            notebook_dir=self.notebook_dir,
+            venv_path=self.venv_path,
+        )
+        self.kc = km.client()
+        self.kc.start_channels()
+        await self.kc.wait_for_ready(timeout=120)
+        # Same startup code as the primary; the kernel runs it before any cell
+        self.kc.execute(get_startup_code(), silent=True)
+
+    async def run(
+        self, code: str, timeout: float
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Execute code; return the execute_reply content and nbformat outputs."""
+        outputs: List[Dict[str, Any]] = []
+
+        def collect(msg):
+            msg_type = msg["header"]["msg_type"]
+            if msg_type == "clear_output":
+                outputs.clear()
+            elif msg_type in _OUTPUT_MSG_TYPES:
+                outputs.append(nbformat.v4.output_from_msg(msg))
+
+        reply = await self.kc.execute_interactive(
+            code, output_hook=collect, timeout=timeout
+        )
+        return reply["content"], outputs
+
+    async def stop(self) -> None:
+        try:
+            if self.kc is not None:
+                self.kc.stop_channels()
+        finally:
+            await self.lifecycle.stop_kernel(self.kernel_id)
+
+
+async def _await_shell_reply(kc, msg_id: str, timeout: float) -> Dict[str, Any]:
+    """Wait for the execute_reply to msg_id, skipping older shell replies."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"No reply to {msg_id} within {timeout}s")
+        try:
+            msg = await kc.get_shell_msg(timeout=remaining)
+        except Empty:
+            # jupyter_client signals a timed-out read with queue.Empty
+            continue
+        if msg.get("parent_header", {}).get("msg_id") == msg_id:
+            return msg["content"]
+
+
+class FanoutRun:
+    """One fan-out run of a notebook; see the module docstring."""
+
+    def __init__(
+        self,
+        session_manager,
+        nb_path: str,
+        cells: List[Tuple[int, str]],
+        max_replicas: int = DEFAULT_MAX_REPLICAS,
+    ):
+        self.session_manager = session_manager
+        self.nb_path = nb_path
+        self.sources = dict(cells)
+        self.plan: FanoutPlan = plan_fanout(cells)
+        self.max_replicas = max(0, max_replicas)
+        self.session = session_manager.get_session(nb_path)
+        self.timeout = float(
+            self.session.get("execution_timeout") or DEFAULT_CELL_TIMEOUT
+        )
+        # Seconds per cell, first execution only (replays and merges excluded)
+        self.durations: Dict[int, float] = {}
+        self.replica_outputs: Dict[int, Dict[str, Any]] = {}
+        self.primary_outputs: Dict[int, Dict[str, Any]] = {}
+        self.fallback_branches: List[List[int]] = []
+
+    async def _run_primary(self, cell_index: int, timed: bool = True) -> None:
+        started = time.monotonic()
+        executions = self.session.setdefault("executions", {})
+        multiplexer = self.session_manager.io_multiplexer
+        record = ExecutionRecord(
+            {
+                "id": f"fanout-{cell_index}",
+                "status": "running",
+                "cell_index": cell_index,
+                "execution_count": None,
+                "completion_event": asyncio.Event(),
+                "outputs": [],
+                "output_count": 0,
+                "start_time": time.time(),
+            }
+        )
+        sent: List[str] = []
+
+        def track(msg_id: str) -> None:
+            # Registered before any IOPub reply can be read (see execute_cell_async)
+            multiplexer.register_execution(executions, msg_id, record)
+            sent.append(msg_id)
+
+        try:
+            msg_id = await self.session_manager.execute_cell_async(
+                self.nb_path, cell_index, self.sources[cell_index], on_sent=track
+            )
+            if not msg_id:
+                raise RuntimeError(f"Primary kernel rejected cell {cell_index}")
+            content = await self._await_primary_reply(cell_index, msg_id)
+            if timed:
+                self.durations[cell_index] = time.monotonic() - started
+            # Outputs may still be in flight on IOPub after the shell reply
+            try:
+                await asyncio.wait_for(
+                    record["completion_event"].wait(), _OUTPUT_SETTLE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"[FANOUT] No idle status for cell {cell_index}")
+            if timed:
+                # First execution only: merge re-runs are not written back
+                self.primary_outputs[cell_index] = {
+                    "outputs": list(record["outputs"]),
+                    "execution_count": content.get("execution_count")
+                    or record.get("execution_count"),
+                }
+            if content.get("status") != "ok":
+                raise CellFailed(cell_index, content)
+        finally:
+            for msg_id in sent:
+                multiplexer.retire_execution(executions, msg_id)
+
+    async def _await_primary_reply(
+        self, cell_index: int, msg_id: str
+    ) -> Dict[str, Any]:
+        try:
+            return await _await_shell_reply(self.session["kc"], msg_id, self.timeout)
+        except asyncio.TimeoutError:
+            await self._interrupt_primary()
+            raise CellFailed(
+                cell_index,
+                {
+                    "status": "timeout",
+                    "ename": "TimeoutError",
+                    "evalue": f"no reply within {self.timeout:g}s, "
+                    "primary kernel interrupted",
+                },
+            )
+        except asyncio.CancelledError:
+            # Another branch failed; stop this cell instead of leaving it running
+            await self._interrupt_primary()
+            raise
+
+    async def _interrupt_primary(self) -> None:
+        try:
+            await self.session_manager.interrupt_kernel(self.nb_path)
+        except Exception as e:
+            logger.warning(f"[FANOUT] Could not interrupt {self.nb_path}: {e}")
+
+    async def _run_replica(
+        self, replica: ReplicaKernel, branches: List[List[int]]
+    ) -> None:
+        try:
+            await replica.start()
+        except Exception as e:
+            logger.warning(f"[FANOUT] Replica {replica.kernel_id} unavailable: {e}")
+            self.fallback_branches.extend(branches)
+            return
+
+        for cell_index in self.plan.trunk:
+            content, _ = await replica.run(self.sources[cell_index], self.timeout)
+            if content.get("status") != "ok":
+                raise CellFailed(cell_index, content)
+
+        for branch in branches:
+            for cell_index in branch:
+                started = time.monotonic()
+                content, outputs = await replica.run(
+                    self.sources[cell_index], self.timeout
+                )
+                self.durations[cell_index] = time.monotonic() - started
+                self.replica_outputs[cell_index] = {
+                    "outputs": outputs,
+                    "execution_count": content.get("execution_count"),
+                }
+                if content.get("status") != "ok":
+                    raise CellFailed(cell_index, content)
+
+    async def _run_primary_side(self) -> None:
+        for cell_index in self.plan.trunk:
+            await self._run_primary(cell_index)
+        if self.plan.branches:
+            for cell_index in self.plan.branches[0]:
+                await self._run_primary(cell_index)
+
+    def _replicas(self) -> List[Tuple[ReplicaKernel, List[List[int]]]]:
+        """Replica kernels with their branches (round-robin over branches[1:])."""
+        extra = self.plan.branches[1:]
+        count = min(self.max_replicas, len(extra))
+        if count == 0:
+            self.fallback_branches.extend(extra)
+            return []
+
+        abs_path = str(Path(self.nb_path).resolve())
+        notebook_dir = Path(self.session.get("cwd") or Path(abs_path).parent)
+        return [
+            (
+                ReplicaKernel(
+                    self.session_manager.kernel_lifecycle,
+                    f"{abs_path}#fanout-{i}",
+                    notebook_dir,
+                    self.session.get("venv_path"),
+                ),
+                extra[i::count],
+            )
+            for i in range(count)
+        ]
+
+    async def _run_branches(
+        self, replicas: List[Tuple[ReplicaKernel, List[List[int]]]]
+    ) -> None:
+        """Primary side and replicas concurrently; the first failure cancels the rest."""
+        tasks = [asyncio.create_task(self._run_primary_side())] + [
+            asyncio.create_task(self._run_replica(replica, branches))
+            for replica, branches in replicas
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        replicas = self._replicas()
+        error: Optional[str] = None
+        failed_cell: Optional[int] = None
+        merged: List[int] = []
+
+        try:
+            async with self.session["exec_lock"]:
+                await self._run_branches(replicas)
+
+                fallback = {c for branch in self.fallback_branches for c in branch}
+                for cell_index in self.plan.order:
+                    if cell_index in fallback:
+                        await self._run_primary(cell_index)
+                    elif cell_index in self.plan.merge:
+                        await self._run_primary(cell_index, timed=False)
+                        merged.append(cell_index)
+                for cell_index in self.plan.joins:
+                    await self._run_primary(cell_index)
+        except CellFailed as e:
+            error, failed_cell = str(e), e.cell_index
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            await asyncio.gather(
+                *(replica.stop() for replica, _ in replicas), return_exceptions=True
+            )
+
+        wall = time.monotonic() - started
+        outputs = {**self.primary_outputs, **self.replica_outputs}
+        if outputs:
+            try:
+                await asyncio.to_thread(
+                    notebook.save_cell_executions, self.nb_path, outputs
+                )
+            except Exception as e:
+                logger.warning(f"[FANOUT] Failed to save cell outputs: {e}")
+
+        sequential = sum(self.durations.values())
+        report = {
+            "status": "error" if error else "ok",
+            "plan": self.plan.to_dict(),
+            "replicas": len(replicas),
+            "replica_fallback_cells": sorted(
+                c for branch in self.fallback_branches for c in branch
+            ),
+            "merged": merged,
+            "wall_seconds": round(wall, 3),
+            "sequential_seconds": round(sequential, 3),
+            "speedup": round(sequential / wall, 2) if wall > 0 else 1.0,
+        }
+        if error:
+            report["error"] = error
+            report["failed_cell"] = failed_cell
+        logger.info(
+            f"[FANOUT] {self.nb_path}: {len(self.plan.branches)} branches on "
+            f"{len(replicas) + 1} kernels, {wall:.2f}s wall vs "
+            f"{sequential:.2f}s sequential ({report['speedup']}x)"
+        )
+        return report
+
+
+async def run_fanout(
+    session_manager,
+    nb_path: str,
+    cells: List[Tuple[int, str]],
+    max_replicas: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run (cell_index, source) pairs with fan-out; return the run report."""
+    if max_replicas is None:
+        max_replicas = int(
+            os.getenv("MCP_FANOUT_MAX_REPLICAS")
+            or getattr(settings, "MCP_FANOUT_MAX_REPLICAS", DEFAULT_MAX_REPLICAS)
+        )
+    return await FanoutRun(session_manager, nb_path, cells, max_replicas).run()
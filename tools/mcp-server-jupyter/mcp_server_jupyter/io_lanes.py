@@ -0,0 +1,207 @@
+"""
+Per-Notebook I/O Lanes
+======================
+
+Executor for blocking notebook I/O (parse, serialize, atomic write).
+
+A single shared pool lets one slow 80 MB write (or a burst of writes to one
+notebook) occupy every worker, stalling reads for all other sessions.
+
+Design:
+1. Every notebook gets a FIFO lane. At most one job per lane runs at a
+   time, so operations on the same notebook execute in submission order.
+2. Lanes with pending work wait in a round-robin ready queue. A job is
+   handed to the bounded global pool only when a worker is free, and a lane
+   that just ran goes to the back of the queue. A notebook with 100 queued
+   writes therefore gets one worker, not all of them.
+3. Queue wait (submit -> start) and run time are recorded per lane and in
+   process-wide totals. A lane is dropped once it is idle, so a server that
+   touches thousands of notebooks keeps only the lanes with work.
+4. Synchronous read-modify-write helpers (notebook.edit_cell, ...) run on
+   the lane through @on_notebook_lane. A job that is already on a lane
+   worker runs nested calls inline: waiting on a lane from inside the pool
+   could deadlock it.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Union
+
+from mcp_server_jupyter.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _Lane:
+    __slots__ = ("jobs", "running", "completed", "wait_total", "wait_max", "run_total")
+
+    def __init__(self):
+        self.jobs: Deque[_Job] = deque()
+        self.running = False
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+
+class NotebookIOLanes:
+    """Serialized per-notebook lanes over a bounded, fair thread pool."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="notebook-io"
+        )
+        self._lanes: Dict[str, _Lane] = {}
+        self._ready: Deque[str] = deque()
+        self._active = 0
+        self._totals = _Lane()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return str(Path(path).resolve())
+
+    def submit(
+        self, path: Union[str, Path], fn: Callable, *args: Any, **kwargs: Any
+    ) -> Future:
+        """Queue fn(*args, **kwargs) on the lane for `path`."""
+        key = self._key(path)
+        job = _Job(fn, args, kwargs)
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = _Lane()
+            lane.jobs.append(job)
+            if not lane.running and len(lane.jobs) == 1:
+                self._ready.append(key)
+            self._dispatch()
+        return job.future
+
+    async def run(
+        self, path: Union[str, Path], fn: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """Await fn(*args, **kwargs) on the lane for `path`."""
+        return await asyncio.wrap_future(self.submit(path, fn, *args, **kwargs))
+
+    def call(
+        self, path: Union[str, Path], fn: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """Run fn(*args, **kwargs) on the lane for `path` and block for the result."""
+        if getattr(self._local, "in_job", False):
+            return fn(*args, **kwargs)
+        return self.submit(path, fn, *args, **kwargs).result()
+
+    def _dispatch(self) -> None:
+        """Start jobs from ready lanes while workers are free (lock held)."""
+        while self._active < self.max_workers and self._ready:
+            key = self._ready.popleft()
+            lane = self._lanes[key]
+            job = lane.jobs.popleft()
+            lane.running = True
+            self._active += 1
+
+            wait = time.monotonic() - job.enqueued_at
+            for stats in (lane, self._totals):
+                stats.wait_total += wait
+                stats.wait_max = max(stats.wait_max, wait)
+            self._pool.submit(self._run, key, lane, job)
+
+    def _run(self, key: str, lane: _Lane, job: _Job) -> None:
+        started = time.monotonic()
+        self._local.in_job = True
+        try:
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(*job.args, **job.kwargs))
+                except BaseException as e:
+                    job.future.set_exception(e)
+        finally:
+            self._local.in_job = False
+            elapsed = time.monotonic() - started
+            with self._lock:
+                lane.running = False
+                for stats in (lane, self._totals):
+                    stats.completed += 1
+                    stats.run_total += elapsed
+                self._active -= 1
+                if lane.jobs:
+                    # Back of the queue: other notebooks go first
+                    self._ready.append(key)
+                else:
+                    del self._lanes[key]
+                self._dispatch()
+
+    @staticmethod
+    def _lane_stats(lane: _Lane) -> dict:
+        return {
+            "queued": len(lane.jobs),
+            "running": lane.running,
+            "completed": lane.completed,
+            "avg_wait_ms": round(1000 * lane.wait_total / lane.completed, 3)
+            if lane.completed
+            else 0.0,
+            "max_wait_ms": round(1000 * lane.wait_max, 3),
+            "avg_run_ms": round(1000 * lane.run_total / lane.completed, 3)
+            if lane.completed
+            else 0.0,
+        }
+
+    def stats(self) -> dict:
+        """Queue depth per busy notebook lane and wait/run time totals."""
+        with self._lock:
+            totals = self._lane_stats(self._totals)
+            del totals["queued"], totals["running"]
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "ready_lanes": len(self._ready),
+                "lanes": {
+                    key: self._lane_stats(lane) for key, lane in self._lanes.items()
+                },
+                "totals": totals,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_workers = int(
+    os.getenv("MCP_NOTEBOOK_IO_WORKERS")
+    or getattr(settings, "MCP_NOTEBOOK_IO_WORKERS", DEFAULT_WORKERS)
+)
+
+# Process-wide lanes for notebook reads and writes
+notebook_io_lanes = NotebookIOLanes(max_workers=_workers)
+
+
+def on_notebook_lane(fn: Callable) -> Callable:
+    """Run a notebook_path-first helper on that notebook's lane."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        path = args[0] if args else kwargs["notebook_path"]
+        return notebook_io_lanes.call(path, fn, *args, **kwargs)
+
+    return wrapper
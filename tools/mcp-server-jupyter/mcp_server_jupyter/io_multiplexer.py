@@ -24,13 +24,147 @@ Design Goals:
 """
 
 import asyncio
-from collections import deque
+import os
+from collections import OrderedDict, deque
+from itertools import islice
+from queue import Empty
 from typing import Dict, Any, Optional, Callable
 import structlog
 import nbformat
 
+from mcp_server_jupyter.binary_frames import (
+    BinaryOutputMessage,
+    configured_min_bytes,
+    has_binary_data,
+    split_output,
+)
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.stream_coalescer import StreamCoalescer, create_stream_coalescer
+
 logger = structlog.get_logger(__name__)
 
+# Executions mappings at most this large are scanned instead of indexed
+_SMALL_EXECUTIONS = 8
+# Indexed executions mappings kept per multiplexer (one per live session)
+_MAX_EXECUTION_INDEXES = 64
+# Orphaned messages unclaimed for this long go to the most recent execution
+_ORPHAN_TTL = 1.0
+# Width of one orphan timer wheel slot, in seconds
+_WHEEL_TICK = 0.25
+# IOPub messages drained per batch in direct mode, and the time spent draining
+DEFAULT_IOPUB_BATCH_SIZE = 64
+DEFAULT_IOPUB_BATCH_WINDOW_SECONDS = 0.005
+
+
+def _msg_base(msg_id: str) -> str:
+    """Kernel msg_ids are '<session>_<pid>_<counter>'; drop the counter."""
+    return msg_id.rsplit("_", 1)[0]
+
+
+class _ExecutionIndex:
+    """
+    Base prefix -> msg_ids index over one `executions` mapping.
+
+    The mapping is a plain dict that callers may also mutate directly, so
+    the index reconciles lazily: new keys are appended at the end of a dict,
+    which makes catching up with k direct inserts O(k). Direct removals are
+    detected by size and the newest key, and trigger a rebuild.
+    """
+
+    __slots__ = ("executions", "by_base", "keys")
+
+    def __init__(self, executions: Dict[str, Any]):
+        self.executions = executions
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        self.by_base: Dict[str, Dict[str, None]] = {}
+        self.keys: Dict[str, str] = {}
+        for key in self.executions:
+            self.add(key)
+
+    def add(self, msg_id: str) -> None:
+        if msg_id in self.keys:
+            return
+        base = _msg_base(msg_id)
+        self.keys[msg_id] = base
+        self.by_base.setdefault(base, {})[msg_id] = None
+
+    def remove(self, msg_id: str) -> None:
+        base = self.keys.pop(msg_id, None)
+        if base is None:
+            return
+        ids = self.by_base.get(base)
+        if ids is not None:
+            ids.pop(msg_id, None)
+            if not ids:
+                del self.by_base[base]
+
+    def sync(self) -> None:
+        added = len(self.executions) - len(self.keys)
+        if added == 0:
+            # Same size: unchanged unless the newest key is one we never saw
+            if not self.executions or next(reversed(self.executions)) in self.keys:
+                return
+            self.rebuild()
+            return
+        if added > 0:
+            new_keys = list(islice(reversed(self.executions), added))
+            if not any(key in self.keys for key in new_keys):
+                for key in reversed(new_keys):
+                    self.add(key)
+                return
+        self.rebuild()
+
+    def match(self, parent_id: str) -> Optional[str]:
+        """Most recently registered execution sharing parent_id's base."""
+        self.sync()
+        ids = self.by_base.get(_msg_base(parent_id))
+        if not ids:
+            return None
+        for key in reversed(ids):
+            if key in self.executions:
+                return key
+        # Same-size replacement slipped past sync(): rebuild and retry once
+        self.rebuild()
+        ids = self.by_base.get(_msg_base(parent_id)) or {}
+        return next(reversed(ids), None)
+
+
+class _Listener:
+    """Routing context of one running listen_iopub loop."""
+
+    __slots__ = (
+        "nb_path",
+        "executions",
+        "session_data",
+        "finalize_callback",
+        "broadcast_callback",
+        "notification_callback",
+        "persist_callback",
+        "lock",
+    )
+
+    def __init__(
+        self,
+        nb_path: str,
+        executions: Dict[str, Any],
+        session_data: Dict[str, Any],
+        finalize_callback: Optional[Callable],
+        broadcast_callback: Optional[Callable],
+        notification_callback: Optional[Callable],
+        persist_callback: Optional[Callable],
+    ):
+        self.nb_path = nb_path
+        self.executions = executions
+        self.session_data = session_data
+        self.finalize_callback = finalize_callback
+        self.broadcast_callback = broadcast_callback
+        self.notification_callback = notification_callback
+        self.persist_callback = persist_callback
+        # Serializes live routing with orphan flushes so outputs stay ordered
+        self.lock = asyncio.Lock()
+
 
 class IOMultiplexer:
     """
@@ -40,14 +174,51 @@ class IOMultiplexer:
     broadcasts output to WebSocket connections, and handles stdin requests.
     """
 
-    def __init__(self, input_request_timeout: int = 60):
+    def __init__(
+        self,
+        input_request_timeout: int = 60,
+        stream_coalescer: Optional[StreamCoalescer] = None,
+        iopub_batch_size: Optional[int] = None,
+        iopub_batch_window: Optional[float] = None,
+        binary_min_bytes: Optional[int] = None,
+    ):
         """
         Initialize the I/O multiplexer.
 
         Args:
             input_request_timeout: Timeout for input() requests in seconds
+            stream_coalescer: Merges stream chunks before emission
+                (defaults to one built from MCP_STREAM_COALESCE_* settings)
+            iopub_batch_size: Max IOPub messages forwarded per notebook/iopub_batch
+                notification in direct mode; 1 disables batching
+                (default: MCP_IOPUB_BATCH_SIZE)
+            iopub_batch_window: Max seconds spent draining queued IOPub messages
+                into one batch (default: MCP_IOPUB_BATCH_WINDOW_SECONDS)
+            binary_min_bytes: Base64 length at which image mime data is also
+                offered as a binary frame to WebSocket clients; 0 disables it
+                (default: MCP_BINARY_OUTPUT_MIN_BYTES)
         """
         self.input_request_timeout = input_request_timeout
+        self.stream_coalescer = stream_coalescer or create_stream_coalescer()
+        if iopub_batch_size is None:
+            iopub_batch_size = int(
+                os.getenv("MCP_IOPUB_BATCH_SIZE")
+                or getattr(settings, "MCP_IOPUB_BATCH_SIZE", DEFAULT_IOPUB_BATCH_SIZE)
+            )
+        if iopub_batch_window is None:
+            iopub_batch_window = float(
+                os.getenv("MCP_IOPUB_BATCH_WINDOW_SECONDS")
+                or getattr(
+                    settings,
+                    "MCP_IOPUB_BATCH_WINDOW_SECONDS",
+                    DEFAULT_IOPUB_BATCH_WINDOW_SECONDS,
+                )
+            )
+        self.iopub_batch_size = max(1, iopub_batch_size)
+        self.iopub_batch_window = iopub_batch_window
+        self.binary_min_bytes = (
+            configured_min_bytes() if binary_min_bytes is None else binary_min_bytes
+        )
         logger.info(
             f"IOMultiplexer initialized (input_timeout={input_request_timeout}s)"
         )
@@ -56,6 +227,74 @@ class IOMultiplexer:
         # Older messages are dropped when limit is exceeded
         self._message_buffer = {}  # Dict[parent_id] -> deque of messages
         self._max_orphaned_per_id = 1000
+        # base prefix -> buffered parent_ids, so registration finds its orphans in O(1)
+        self._orphan_bases: Dict[str, Dict[Any, None]] = {}
+        # Timer wheel: slot -> parent_ids whose oldest orphan expires in that slot
+        self._orphan_wheel: Dict[int, list] = {}
+        self._orphan_armed: set = set()
+        self._wheel_cursor = -1
+        # id(executions) -> running listen_iopub context
+        self._listeners: Dict[int, _Listener] = {}
+        self._flush_tasks: set = set()
+        # Input requests dispatched from the shared kernel poller
+        self._input_tasks: set = set()
+        # id(executions) -> base prefix index, LRU over live sessions
+        self._execution_indexes: "OrderedDict[int, _ExecutionIndex]" = OrderedDict()
+
+    def _index_for(self, executions: Dict[str, Any]) -> _ExecutionIndex:
+        index = self._execution_indexes.get(id(executions))
+        if index is None or index.executions is not executions:
+            index = _ExecutionIndex(executions)
+            self._execution_indexes[id(executions)] = index
+            while len(self._execution_indexes) > _MAX_EXECUTION_INDEXES:
+                self._execution_indexes.popitem(last=False)
+        else:
+            self._execution_indexes.move_to_end(id(executions))
+        return index
+
+    def register_execution(
+        self, executions: Dict[str, Any], msg_id: str, exec_data: Dict[str, Any]
+    ) -> None:
+        """
+        Add an execution and index its msg_id for parent_id routing.
+
+        IOPub messages that arrived before registration are flushed to the
+        new execution by the listener serving `executions`, if one is running.
+        Otherwise they wait for the orphan timer to expire.
+        """
+        executions[msg_id] = exec_data
+        self._index_for(executions).add(msg_id)
+        if not self._orphan_bases.get(_msg_base(msg_id)):
+            return
+        listener = self._listeners.get(id(executions))
+        if listener is None or listener.executions is not executions:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._flush_orphans(listener, msg_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def retire_execution(self, executions: Dict[str, Any], msg_id: str) -> None:
+        """Remove a finished execution from routing."""
+        executions.pop(msg_id, None)
+        index = self._execution_indexes.get(id(executions))
+        if index is not None and index.executions is executions:
+            index.remove(msg_id)
+
+    def _match_execution(
+        self, parent_id: str, executions: Dict[str, Any]
+    ) -> Optional[str]:
+        """Find a registered execution whose msg_id shares parent_id's base."""
+        if len(executions) <= _SMALL_EXECUTIONS:
+            base = _msg_base(parent_id)
+            for key in reversed(executions):
+                if _msg_base(key) == base:
+                    return key
+            return None
+        return self._index_for(executions).match(parent_id)
 
     async def listen_iopub(
         self,
@@ -83,6 +322,16 @@ class IOMultiplexer:
         """
         logger.info(f"Starting IOPub listener for {nb_path}")
         consecutive_errors = 0
+        listener = _Listener(
+            nb_path,
+            executions,
+            session_data,
+            finalize_callback,
+            broadcast_callback,
+            notification_callback,
+            persist_callback,
+        )
+        self._listeners[id(executions)] = listener
 
         try:
             while True:
@@ -90,32 +339,31 @@ class IOMultiplexer:
                     # Retrieve message from IOPub channel
                     msg = await kc.get_iopub_msg()
 
-                    # Route message to execution
-                    await self._route_message(
-                        nb_path=nb_path,
-                        msg=msg,
-                        executions=executions,
-                        session_data=session_data,
-                        finalize_callback=finalize_callback,
-                        broadcast_callback=broadcast_callback,
-                        notification_callback=notification_callback,
-                        persist_callback=persist_callback,
-                    )
+                    async with listener.lock:
+                        # Route message to execution
+                        await self._route_message(
+                            nb_path=nb_path,
+                            msg=msg,
+                            executions=executions,
+                            session_data=session_data,
+                            finalize_callback=finalize_callback,
+                            broadcast_callback=broadcast_callback,
+                            notification_callback=notification_callback,
+                            persist_callback=persist_callback,
+                        )
+
+                        # Orphans are flushed by register_execution; here we
+                        # only advance the timer wheel, which is O(1) unless a
+                        # slot is due.
+                        try:
+                            await self._expire_orphans(listener)
+                        except Exception:
+                            # Best-effort: do not let buffer flushing break the listener
+                            pass
 
                     # Reset error counter on success
                     consecutive_errors = 0
 
-                    # After processing a live message, attempt to flush any
-                    # buffered messages whose parent_id has since been
-                    # registered in `executions`.
-                    try:
-                        await self._flush_buffered_messages(
-                            executions, session_data, finalize_callback, broadcast_callback, notification_callback, persist_callback
-                        )
-                    except Exception:
-                        # Best-effort: do not let buffer flushing break the listener
-                        pass
-
                 except asyncio.CancelledError:
                     raise
                 except Exception as e:
@@ -143,23 +391,37 @@ class IOMultiplexer:
 
         except asyncio.CancelledError:
             logger.info(f"IOPub listener cancelled for {nb_path}")
+        finally:
+            if self._listeners.get(id(executions)) is listener:
+                del self._listeners[id(executions)]
+            # Don't strand merged stream text that hasn't been emitted yet
+            try:
+                for exec_data in list(executions.values()):
+                    await self.stream_coalescer.flush(id(exec_data))
+            except Exception:
+                pass
 
     async def listen_iopub_direct(
         self,
         nb_path: str,
         kc,
         notification_callback: Optional[Callable] = None,
+        executions: Optional[Dict[str, Any]] = None,
     ):
         """
         Listen for IOPub messages and directly forward them as MCP notifications.
 
-        This simplified version doesn't track executions or buffer messages.
+        This simplified version doesn't buffer messages.
         All IOPub messages are immediately converted to MCP notifications.
+        After each awaited message, whatever else is already queued (up to
+        iopub_batch_size, within iopub_batch_window) is drained without
+        blocking and sent as one notebook/iopub_batch notification.
 
         Args:
             nb_path: Notebook path
             kc: Jupyter kernel client
             notification_callback: Async callback to send MCP notifications
+            executions: Registered executions to keep current (see track_direct)
         """
         logger.info(f"Starting direct IOPub listener for {nb_path}")
         consecutive_errors = 0
@@ -167,26 +429,15 @@ class IOMultiplexer:
         try:
             while True:
                 try:
-                    # Retrieve message from IOPub channel
+                    # Retrieve message from IOPub channel, plus any already queued
                     msg = await kc.get_iopub_msg()
+                    msgs = await self._drain_iopub(kc, [msg])
+                    self.track_direct(msgs, executions)
 
-                    # Immediately forward as MCP notification
-                    if notification_callback:
-                        msg_type = msg.get("msg_type", "unknown")
-                        content = msg.get("content", {})
-                        parent_header = msg.get("parent_header", {})
-                        msg_id = parent_header.get("msg_id", "unknown")
-
-                        await notification_callback(
-                            "notebook/iopub_message",
-                            {
-                                "notebook_path": nb_path,
-                                "msg_type": msg_type,
-                                "msg_id": msg_id,
-                                "content": content,
-                                "parent_header": parent_header,
-                            },
-                        )
+                    # Immediately forward as MCP notification(s)
+                    await self._forward_direct_batch(
+                        nb_path, msgs, notification_callback
+                    )
 
                     # Reset error counter on success
                     consecutive_errors = 0
@@ -218,6 +469,156 @@ class IOMultiplexer:
         except asyncio.CancelledError:
             logger.info(f"Direct IOPub listener cancelled for {nb_path}")
 
+    async def _drain_iopub(self, kc, msgs: list) -> list:
+        """Append IOPub messages that are already queued, without waiting."""
+        if self.iopub_batch_size <= 1:
+            return msgs
+        deadline = asyncio.get_event_loop().time() + self.iopub_batch_window
+        while len(msgs) < self.iopub_batch_size:
+            if asyncio.get_event_loop().time() >= deadline:
+                break
+            try:
+                msgs.append(await kc.get_iopub_msg(timeout=0))
+            except Empty:
+                break
+            except Exception as e:
+                # Client can't do non-blocking reads: forward what we have
+                logger.debug(f"IOPub drain stopped: {e}")
+                break
+        return msgs
+
+    @staticmethod
+    def _direct_params(msg: Dict[str, Any]) -> Dict[str, Any]:
+        parent_header = msg.get("parent_header", {})
+        return {
+            "msg_type": msg.get("msg_type", "unknown"),
+            "msg_id": parent_header.get("msg_id", "unknown"),
+            "content": msg.get("content", {}),
+            "parent_header": parent_header,
+        }
+
+    async def _forward_direct(
+        self,
+        nb_path: str,
+        msg: Dict[str, Any],
+        notification_callback: Optional[Callable],
+    ):
+        """Forward one IOPub message as a notebook/iopub_message notification."""
+        if not notification_callback:
+            return
+        await notification_callback(
+            "notebook/iopub_message",
+            {"notebook_path": nb_path, **self._direct_params(msg)},
+        )
+
+    async def _forward_direct_batch(
+        self,
+        nb_path: str,
+        msgs: list,
+        notification_callback: Optional[Callable],
+    ):
+        """
+        Forward IOPub messages as one notebook/iopub_batch notification.
+
+        A single message still goes out as notebook/iopub_message. Each entry
+        of params["messages"] has the same fields as an iopub_message, minus
+        notebook_path, and entries are in arrival order. A message with large
+        image data goes out on its own, so binary clients can receive it as a
+        binary frame (binary_frames.py).
+        """
+        if not notification_callback or not msgs:
+            return
+        run: list = []
+        for msg in msgs:
+            if has_binary_data(msg.get("content", {}).get("data"), self.binary_min_bytes):
+                await self._send_direct_run(nb_path, run, notification_callback)
+                run = []
+                await self._forward_direct(nb_path, msg, notification_callback)
+            else:
+                run.append(msg)
+        await self._send_direct_run(nb_path, run, notification_callback)
+
+    async def _send_direct_run(
+        self,
+        nb_path: str,
+        msgs: list,
+        notification_callback: Callable,
+    ):
+        if not msgs:
+            return
+        if len(msgs) == 1:
+            await self._forward_direct(nb_path, msgs[0], notification_callback)
+            return
+        await notification_callback(
+            "notebook/iopub_batch",
+            {
+                "notebook_path": nb_path,
+                "messages": [self._direct_params(msg) for msg in msgs],
+            },
+        )
+
+    async def forward_iopub_batch(
+        self,
+        nb_path: str,
+        msgs: list,
+        notification_callback: Optional[Callable] = None,
+        executions: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Forward a batch of IOPub messages read by the shared kernel poller.
+
+        Sent in notifications of at most iopub_batch_size messages each.
+        Registered `executions` are kept current first (see track_direct).
+        """
+        try:
+            self.track_direct(msgs, executions)
+        except Exception as e:
+            logger.error(f"Direct tracking error for {nb_path}: {e}")
+        step = self.iopub_batch_size
+        for start in range(0, len(msgs), step):
+            try:
+                await self._forward_direct_batch(
+                    nb_path, msgs[start:start + step], notification_callback
+                )
+            except Exception as e:
+                logger.error(f"Direct forward error for {nb_path}: {e}")
+
+    def track_direct(
+        self, msgs: list, executions: Optional[Dict[str, Any]]
+    ) -> None:
+        """
+        Record forwarded IOPub messages on the executions they belong to.
+
+        In direct mode clients render the forwarded messages themselves; this
+        only keeps each registered execution's outputs and status current, so
+        whoever waits on it (ExecutionScheduler) sees it finish. Messages
+        whose parent is not registered are ignored, and nothing is buffered.
+        """
+        if not executions:
+            return
+        for msg in msgs:
+            exec_data = executions.get(msg.get("parent_header", {}).get("msg_id"))
+            if exec_data is None:
+                continue
+            msg_type = msg.get("msg_type") or msg.get("header", {}).get("msg_type")
+            content = msg.get("content", {})
+            if msg_type == "status":
+                exec_data["kernel_state"] = content.get("execution_state")
+                if content.get("execution_state") == "idle" and exec_data.get(
+                    "status"
+                ) not in ("error", "cancelled"):
+                    exec_data["status"] = "completed"
+            elif msg_type == "execute_input":
+                # The kernel's count, for cells without an execute_result
+                exec_data["execution_count"] = content.get("execution_count")
+            elif msg_type == "clear_output":
+                self._handle_clear_output(exec_data, content)
+            elif msg_type in ("stream", "display_data", "execute_result", "error"):
+                output = self._create_output(msg_type, content, exec_data)
+                exec_data["outputs"].append(output)
+                exec_data["output_count"] = len(exec_data["outputs"])
+                exec_data["last_activity"] = asyncio.get_event_loop().time()
+
     async def _route_message(
         self,
         nb_path: str,
@@ -248,17 +649,14 @@ class IOMultiplexer:
         # Quick fuzzy-match: Sometimes kernels send slightly different msg_id suffixes
         # (e.g. ..._4 vs ..._6). Try to match based on base prefix to avoid buffering
         # messages unnecessarily when an execution key is present with same base.
+        # O(1) via the base prefix index, however many executions the session has seen.
         if parent_id and executions and parent_id not in executions:
             try:
-                base = parent_id.rsplit("_", 1)[0]
-                for k in executions.keys():
-                    if k.startswith(base) or k.rsplit("_", 1)[0] == base:
-                        # Rewrite parent_id to the matched key and continue processing
-                        logger.debug(
-                            f"Fuzzy-matched IOPub parent_id {parent_id} -> {k}"
-                        )
-                        parent_id = k
-                        break
+                k = self._match_execution(parent_id, executions)
+                if k is not None:
+                    # Rewrite parent_id to the matched key and continue processing
+                    logger.debug(f"Fuzzy-matched IOPub parent_id {parent_id} -> {k}")
+                    parent_id = k
             except Exception:
                 pass
 
@@ -267,20 +665,14 @@ class IOMultiplexer:
             # If the client is slow to register, we wait up to 1000 messages
             # If buffer overflows, we drop the oldest message
             try:
-                exec_keys = list(executions.keys()) if executions is not None else []
+                exec_keys = list(islice(executions or (), 5))
                 logger.debug(
-                    f"Buffering IOPub msg (type={msg.get('msg_type')} parent_id={parent_id}) - known exec keys: {exec_keys[:5]} (len={len(exec_keys)})"
+                    f"Buffering IOPub msg (type={msg.get('msg_type')} parent_id={parent_id}) - known exec keys: {exec_keys} (len={len(executions or ())})"
                 )
                 # Store nb_path in msg to preserve context for later routing
                 msg_with_context = dict(msg)
                 msg_with_context["_nb_path"] = nb_path
-                
-                # Ring buffer: store (timestamp, message) in deque with max size
-                if parent_id not in self._message_buffer:
-                    self._message_buffer[parent_id] = deque(maxlen=self._max_orphaned_per_id)
-
-                timestamp = asyncio.get_event_loop().time()
-                self._message_buffer[parent_id].append((timestamp, msg_with_context))
+                self._buffer_orphan(parent_id, msg_with_context)
             except Exception:
                 pass
             return
@@ -288,9 +680,8 @@ class IOMultiplexer:
         # If we reach here, parent_id exists and we should also ensure any
         # buffered messages for this parent are processed as well. This helps
         # with races where some messages arrived before registration.
-        if parent_id in getattr(self, "_message_buffer", {}):
-            buffered_deque = self._message_buffer.pop(parent_id, deque())
-            for _, buffered_msg in buffered_deque:
+        if parent_id in self._message_buffer:
+            for _, buffered_msg in self._take_orphans(parent_id):
                 try:
                     # Process buffered messages by routing them through
                     # the same code path (avoid recursion loops by calling
@@ -326,6 +717,8 @@ class IOMultiplexer:
                 persist_callback,
             )
         elif msg_type == "clear_output":
+            # Emit text printed before the clear so it isn't appended after it
+            await self.stream_coalescer.flush(id(exec_data))
             self._handle_clear_output(exec_data, content)
         elif msg_type in ["stream", "display_data", "execute_result", "error"]:
             await self._handle_output(
@@ -356,6 +749,10 @@ class IOMultiplexer:
         exec_data["kernel_state"] = content["execution_state"]
 
         if content["execution_state"] == "idle":
+            # Waiters read exec_data["outputs"]; emit any merged stream text
+            # before the terminal status wakes them
+            await self.stream_coalescer.flush(id(exec_data))
+
             # Execution completed
             if exec_data["status"] not in ["error", "cancelled"]:
                 exec_data["status"] = "completed"
@@ -368,10 +765,12 @@ class IOMultiplexer:
             # that arrived before the execution was registered. Process them now to ensure
             # they are included in the finalization step.
             try:
-                # Exact match for any buffered messages
-                if parent_id in getattr(self, "_message_buffer", {}):
-                    entries = self._message_buffer.pop(parent_id, deque())
-                    for _, buffered_msg in entries:
+                # Exact and fuzzy prefix matches (handles msg_id_3 vs msg_id_5)
+                base_ids = self._orphan_bases.get(_msg_base(parent_id), {})
+                keys_to_check = [parent_id] if parent_id in base_ids else []
+                keys_to_check.extend(k for k in base_ids if k != parent_id)
+                for k in keys_to_check:
+                    for _, buffered_msg in self._take_orphans(k):
                         try:
                             nb_path_from_msg = buffered_msg.pop("_nb_path", "")
                             await self._route_message(
@@ -386,33 +785,10 @@ class IOMultiplexer:
                             )
                         except Exception:
                             pass
-
-                # Fuzzy prefix matches: also process buffered messages that share
-                # the same base prefix (handles cases like msg_id_3 vs msg_id_5)
-                try:
-                    parent_base = parent_id.rsplit("_", 1)[0]
-                    keys_to_check = [k for k in list(self._message_buffer.keys()) if k and k.rsplit("_", 1)[0] == parent_base]
-                    for k in keys_to_check:
-                        entries = self._message_buffer.pop(k, deque())
-                        for _, buffered_msg in entries:
-                            try:
-                                nb_path_from_msg = buffered_msg.pop("_nb_path", "")
-                                await self._route_message(
-                                    nb_path=nb_path_from_msg,
-                                    msg=buffered_msg,
-                                    executions={parent_id: exec_data},
-                                    session_data=session_data,
-                                    finalize_callback=finalize_callback,
-                                    broadcast_callback=None,
-                                    notification_callback=notification_callback,
-                                    persist_callback=persist_callback,
-                                )
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
             except Exception:
                 pass
+            # Late buffered stream chunks were coalesced again
+            await self.stream_coalescer.flush(id(exec_data))
 
             # Wait for finalization event (synchronizes with queue processor)
             if "finalization_event" in exec_data:
@@ -456,8 +832,8 @@ class IOMultiplexer:
         """Handle 'clear_output' messages (for progress bars)."""
         wait = content.get("wait", False)
         if not wait:
-            # Immediate clear: reset outputs but keep metadata
-            exec_data["outputs"] = []
+            # Immediate clear: reset outputs (and any spill file) but keep metadata
+            exec_data["outputs"].clear()
             # Note: output_count is NOT reset - agents track cumulative index
 
     async def _handle_output(
@@ -470,24 +846,76 @@ class IOMultiplexer:
         notification_callback: Optional[Callable],
     ):
         """Handle output messages (stream, display_data, execute_result, error)."""
+        key = id(exec_data)
+        if msg_type == "stream":
+            # Consecutive chunks are merged by the coalescer and emitted together
+            seq = exec_data.get("stream_seq", 0) + 1
+            exec_data["stream_seq"] = seq
+
+            async def emit_stream(name: str, text: str, seq_start: int, seq_end: int):
+                await self._emit_output(
+                    nb_path,
+                    exec_data,
+                    "stream",
+                    {"name": name, "text": text},
+                    broadcast_callback,
+                    notification_callback,
+                    seq=(seq_start, seq_end),
+                )
+
+            await self.stream_coalescer.push(
+                key, content["name"], content["text"], seq, emit_stream
+            )
+            return
+
+        # Any other output flushes pending stream text first to keep ordering
+        await self.stream_coalescer.emit_after(
+            key,
+            lambda: self._emit_output(
+                nb_path,
+                exec_data,
+                msg_type,
+                content,
+                broadcast_callback,
+                notification_callback,
+            ),
+        )
+
+    async def _emit_output(
+        self,
+        nb_path: str,
+        exec_data: Dict[str, Any],
+        msg_type: str,
+        content: Dict[str, Any],
+        broadcast_callback: Optional[Callable],
+        notification_callback: Optional[Callable],
+        seq: Optional[tuple] = None,
+    ):
+        """Append one output and send it to WebSocket clients and MCP."""
         # Convert to nbformat output
         output = self._create_output(msg_type, content, exec_data)
 
         if output:
             # Broadcast to WebSocket clients
             if broadcast_callback:
-                await broadcast_callback(
-                    {
-                        "jsonrpc": "2.0",
-                        "method": "notebook/output",
-                        "params": {
-                            "notebook_path": nb_path,
-                            "task_id": exec_data.get("id"),
-                            "cell_index": exec_data.get("cell_index"),
-                            "output": output,
-                        },
-                    }
-                )
+                params = {
+                    "notebook_path": nb_path,
+                    "task_id": exec_data.get("id"),
+                    "cell_index": exec_data.get("cell_index"),
+                    "output": output,
+                }
+                if seq is not None:
+                    params["seq_start"], params["seq_end"] = seq
+                message = {
+                    "jsonrpc": "2.0",
+                    "method": "notebook/output",
+                    "params": params,
+                }
+                # Large images: binary clients get raw bytes instead of base64
+                split = split_output(output, self.binary_min_bytes)
+                if split is not None:
+                    message = BinaryOutputMessage(message, *split)
+                await broadcast_callback(message)
 
             # Append to execution outputs
             exec_data["outputs"].append(output)
@@ -496,16 +924,16 @@ class IOMultiplexer:
 
             # Send MCP notification
             if notification_callback:
+                params = {
+                    "notebook_path": nb_path,
+                    "exec_id": exec_data.get("id"),
+                    "type": msg_type,
+                    "content": content,
+                }
+                if seq is not None:
+                    params["seq_start"], params["seq_end"] = seq
                 try:
-                    await notification_callback(
-                        "notebook/output",
-                        {
-                            "notebook_path": nb_path,
-                            "exec_id": exec_data.get("id"),
-                            "type": msg_type,
-                            "content": content,
-                        },
-                    )
+                    await notification_callback("notebook/output", params)
                 except Exception as e:
                     logger.warning(f"Failed to send MCP notification: {e}")
 
@@ -550,127 +978,149 @@ class IOMultiplexer:
 
         return None
 
-    async def _flush_buffered_messages(
-        self,
-        executions: Dict[str, Any],
-        session_data: Dict[str, Any],
-        finalize_callback: Optional[Callable],
-        broadcast_callback: Optional[Callable],
-        notification_callback: Optional[Callable],
-        persist_callback: Optional[Callable] = None,
-    ):
-        """Process any buffered IOPub messages whose parent_id has been
-        registered in the executions mapping. This is a best-effort helper to
-        mitigate a race between IOPub arrival and execution registration.
-        
-        For messages that don't have matching executions but are old enough (>1 second),
-        we assume they might be from a kernel system message or previous execution.
-        We route them to the most recent execution as a fallback.
+    def _buffer_orphan(self, parent_id: Optional[str], msg: Dict[str, Any]) -> None:
+        """Buffer a message for an unregistered parent and arm its expiry."""
+        entries = self._message_buffer.get(parent_id)
+        if entries is None:
+            # Ring buffer: store (timestamp, message) in deque with max size
+            entries = deque(maxlen=self._max_orphaned_per_id)
+            self._message_buffer[parent_id] = entries
+            if parent_id:
+                self._orphan_bases.setdefault(_msg_base(parent_id), {})[parent_id] = None
+        timestamp = asyncio.get_event_loop().time()
+        entries.append((timestamp, msg))
+        if parent_id not in self._orphan_armed:
+            self._arm_orphan(parent_id, timestamp + _ORPHAN_TTL)
+
+    def _arm_orphan(self, parent_id: Optional[str], deadline: float) -> None:
+        # Slot strictly after the deadline, so it never fires early, and never
+        # behind the cursor, so it always fires
+        slot = max(int(deadline // _WHEEL_TICK) + 1, self._wheel_cursor + 1)
+        self._orphan_wheel.setdefault(slot, []).append(parent_id)
+        self._orphan_armed.add(parent_id)
+
+    def _take_orphans(self, parent_id: Optional[str]):
+        """Remove and return the buffered messages for parent_id."""
+        entries = self._message_buffer.pop(parent_id, None)
+        if entries is None:
+            return ()
+        if parent_id:
+            base = _msg_base(parent_id)
+            ids = self._orphan_bases.get(base)
+            if ids is not None:
+                ids.pop(parent_id, None)
+                if not ids:
+                    del self._orphan_bases[base]
+        return entries
+
+    def _due_orphans(self, now: float) -> list:
+        """Advance the timer wheel to `now` and return expired parent_ids."""
+        slot = int(now // _WHEEL_TICK)
+        if slot <= self._wheel_cursor:
+            return []
+        if slot - self._wheel_cursor > len(self._orphan_wheel):
+            # Long quiet period: visit occupied slots instead of every tick
+            due_slots = sorted(s for s in self._orphan_wheel if s <= slot)
+        else:
+            due_slots = range(self._wheel_cursor + 1, slot + 1)
+        self._wheel_cursor = slot
+
+        expired = []
+        for due in due_slots:
+            for parent_id in self._orphan_wheel.pop(due, ()):
+                self._orphan_armed.discard(parent_id)
+                entries = self._message_buffer.get(parent_id)
+                if not entries:
+                    continue
+                deadline = entries[0][0] + _ORPHAN_TTL
+                if deadline > now:
+                    # Buffer was flushed and refilled since this slot was armed
+                    self._arm_orphan(parent_id, deadline)
+                else:
+                    expired.append(parent_id)
+        return expired
+
+    async def _flush_orphans(self, listener: _Listener, msg_id: str) -> None:
+        """Route buffered messages sharing msg_id's base once it is registered."""
+        async with listener.lock:
+            for parent_id in list(self._orphan_bases.get(_msg_base(msg_id), ())):
+                for _, buffered_msg in self._take_orphans(parent_id):
+                    try:
+                        nb_path_from_msg = buffered_msg.pop("_nb_path", listener.nb_path)
+                        await self._route_message(
+                            nb_path=nb_path_from_msg,
+                            msg=buffered_msg,
+                            executions=listener.executions,
+                            session_data=listener.session_data,
+                            finalize_callback=listener.finalize_callback,
+                            broadcast_callback=listener.broadcast_callback,
+                            notification_callback=listener.notification_callback,
+                            persist_callback=listener.persist_callback,
+                        )
+                    except Exception:
+                        # Ignore errors processing buffered messages
+                        pass
+
+    async def _expire_orphans(self, listener: _Listener) -> None:
         """
-        if not hasattr(self, "_message_buffer"):
+        Route orphans that have gone unclaimed for longer than _ORPHAN_TTL.
+
+        Executions written straight into the mapping never pass through
+        register_execution, so expired orphans are matched against it first.
+        Anything still unmatched is assumed to belong to a just-completed or
+        recently started execution and goes to the most recently active one,
+        to avoid losing outputs. With no executions at all it is dropped.
+        """
+        expired = self._due_orphans(asyncio.get_event_loop().time())
+        if not expired:
             return
 
-        now = asyncio.get_event_loop().time()
-        # Collect keys to process and stale keys to drop
-        to_process = []
-        to_drop = []
-        to_process_stale = {}  # parent_id -> entries for old messages without matching execution
-        
-        for parent_id, entries in list(self._message_buffer.items()):
-            if not entries:
-                continue
-            
-            msg_age = now - entries[0][0]
-            
-            # Check if parent_id is registered
-            if parent_id in executions:
-                to_process.append(parent_id)
-            # If message is old (>1 second) and still no matching execution,
-            # save for fallback routing
-            elif msg_age > 1.0:
-                to_process_stale[parent_id] = entries
-                to_drop.append(parent_id)
-            # Drop entries older than TTL without a matching execution
-            elif msg_age > self._buffer_ttl:
-                to_drop.append(parent_id)
-
-        # Drop stale entries
-        for key in to_drop:
-            try:
-                self._message_buffer.pop(key, None)
-            except Exception:
-                pass
+        executions = listener.executions
+        fallback = None
+        for parent_id in expired:
+            target = None
+            if parent_id and executions:
+                if parent_id in executions:
+                    target = parent_id
+                else:
+                    target = self._match_execution(parent_id, executions)
+
+            if target is not None:
+                route_to = executions
+            else:
+                if not executions:
+                    self._take_orphans(parent_id)
+                    continue
+                if fallback is None:
+                    # Prefer running executions, then highest last_activity
+                    running = [
+                        kv for kv in executions.items() if kv[1].get("status") == "running"
+                    ]
+                    if running:
+                        fallback = running[0]
+                    else:
+                        fallback = max(
+                            executions.items(),
+                            key=lambda kv: kv[1].get("last_activity", 0),
+                        )
+                route_to = {fallback[0]: fallback[1]}
 
-        # Process messages with matching registered executions  
-        for parent_id in to_process:
-            entries = self._message_buffer.pop(parent_id, [])
-            for _, buffered_msg in entries:
+            for _, buffered_msg in self._take_orphans(parent_id):
                 try:
-                    nb_path_from_msg = buffered_msg.pop("_nb_path", "")
+                    nb_path_from_msg = buffered_msg.pop("_nb_path", listener.nb_path)
                     await self._route_message(
                         nb_path=nb_path_from_msg,
                         msg=buffered_msg,
-                        executions=executions,
-                        session_data=session_data,
-                        finalize_callback=finalize_callback,
-                        broadcast_callback=broadcast_callback,
-                        notification_callback=notification_callback,
-                        persist_callback=persist_callback,
+                        executions=route_to,
+                        session_data=listener.session_data,
+                        finalize_callback=listener.finalize_callback,
+                        broadcast_callback=listener.broadcast_callback,
+                        notification_callback=listener.notification_callback,
+                        persist_callback=listener.persist_callback,
                     )
                 except Exception:
-                    # Ignore errors processing buffered messages
                     pass
 
-        # Process stale messages: route them to a recent execution as a best-effort
-        # If messages are older than 1s and no matching execution exists, we assume
-        # they may belong to a just-completed or recently started execution. Route
-        # them to the most recently active execution to avoid losing outputs.
-        try:
-            if executions:
-                # Pick the best candidate: prefer running executions, then highest last_activity
-                candidates = []
-                for key, data in executions.items():
-                    candidates.append((key, data))
-
-                # Prefer running executions
-                running = [c for c in candidates if c[1].get("status") == "running"]
-                if running:
-                    fallback_key, fallback_exec = running[0]
-                else:
-                    # Use last_activity timestamp if available, else last key
-                    candidates_sorted = sorted(
-                        candidates,
-                        key=lambda kv: kv[1].get("last_activity", 0),
-                        reverse=True,
-                    )
-                    fallback_key, fallback_exec = candidates_sorted[0]
-
-                # Route each stale entry to the fallback execution
-                for parent_id, entries in to_process_stale.items():
-                    try:
-                        for _, buffered_msg in entries:
-                            try:
-                                nb_path_from_msg = buffered_msg.pop("_nb_path", "")
-                                # Route using a small executions mapping that maps the
-                                # chosen fallback_key to the fallback_exec data
-                                await self._route_message(
-                                    nb_path=nb_path_from_msg,
-                                    msg=buffered_msg,
-                                    executions={fallback_key: fallback_exec},
-                                    session_data=session_data,
-                                    finalize_callback=finalize_callback,
-                                    broadcast_callback=broadcast_callback,
-                                    notification_callback=notification_callback,
-                                    persist_callback=persist_callback,
-                                )
-                            except Exception:
-                                pass
-                    except Exception:
-                        pass
-        except Exception:
-            # Best-effort: never allow buffered message routing to raise
-            pass
-
     async def listen_stdin(
         self,
         nb_path: str,
@@ -693,19 +1143,19 @@ class IOMultiplexer:
 
         try:
             while True:
-                # Wait for stdin message
+                # Wait for stdin message: get_msg() with no timeout awaits the
+                # ZMQ socket itself, so an idle kernel costs no wakeups
                 try:
                     if not kc.stdin_channel.is_alive():
                         await asyncio.sleep(0.5)
                         continue
 
-                    if await kc.stdin_channel.msg_ready():
-                        msg = await kc.stdin_channel.get_msg(timeout=0)
-                    else:
-                        await asyncio.sleep(0.1)
-                        continue
+                    msg = await kc.stdin_channel.get_msg()
 
+                except asyncio.CancelledError:
+                    raise
                 except Exception:
+                    # Channel closed or restarting: back off instead of spinning
                     await asyncio.sleep(0.1)
                     continue
 
@@ -727,6 +1177,37 @@ class IOMultiplexer:
         except Exception as e:
             logger.error(f"Stdin listener error for {nb_path}: {e}")
 
+    async def dispatch_stdin_batch(
+        self,
+        nb_path: str,
+        kc,
+        msgs: list,
+        session_data: Dict[str, Any],
+        notification_callback: Optional[Callable] = None,
+        interrupt_callback: Optional[Callable] = None,
+    ):
+        """
+        Handle stdin messages read by the shared kernel poller.
+
+        An input request waits for the user (up to its timeout), so it runs as
+        its own task instead of holding up the poller's other kernels.
+        """
+        for msg in msgs:
+            if msg["header"]["msg_type"] != "input_request":
+                continue
+            task = asyncio.create_task(
+                self._handle_input_request(
+                    nb_path,
+                    kc,
+                    msg["content"],
+                    session_data,
+                    notification_callback,
+                    interrupt_callback,
+                )
+            )
+            self._input_tasks.add(task)
+            task.add_done_callback(self._input_tasks.discard)
+
     async def _handle_input_request(
         self,
         nb_path: str,
@@ -736,36 +1217,41 @@ class IOMultiplexer:
         notification_callback: Optional[Callable],
         interrupt_callback: Optional[Callable],
     ):
-        """Handle input() request from kernel."""
-        logger.info(f"Kernel requested input: {content.get('prompt', '')}")
+        """
+        Handle input() request from kernel.
 
-        # Notify client to ask user
-        if notification_callback:
-            await notification_callback(
-                "notebook/input_request",
-                {
-                    "notebook_path": nb_path,
-                    "prompt": content.get("prompt", ""),
-                    "password": content.get("password", False),
-                },
-            )
+        Waits on session_data["input_event"], which submit_input sets, instead
+        of polling waiting_for_input. The flag is still honoured for callers
+        that only clear it.
+        """
+        logger.info(f"Kernel requested input: {content.get('prompt', '')}")
 
-        # Wait for input with timeout watchdog
+        # Armed before notifying, so an answer sent during the notification counts
+        input_event = asyncio.Event()
+        session_data["input_event"] = input_event
         session_data["waiting_for_input"] = True
         try:
+            # Notify client to ask user
+            if notification_callback:
+                await notification_callback(
+                    "notebook/input_request",
+                    {
+                        "notebook_path": nb_path,
+                        "prompt": content.get("prompt", ""),
+                        "password": content.get("password", False),
+                    },
+                )
+
+            # Wait for input with timeout watchdog
             timeout = session_data.get(
                 "input_request_timeout", self.input_request_timeout
             )
-            elapsed = 0.0
-            interval = 0.1
-            timed_out = True
-
-            while elapsed < timeout:
-                await asyncio.sleep(interval)
-                elapsed += interval
-                if not session_data.get("waiting_for_input"):
-                    timed_out = False
-                    break
+            timed_out = False
+            if session_data.get("waiting_for_input"):
+                try:
+                    await asyncio.wait_for(input_event.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    timed_out = bool(session_data.get("waiting_for_input"))
 
             if timed_out:
                 logger.warning(
@@ -785,3 +1271,5 @@ class IOMultiplexer:
                         await interrupt_callback(nb_path)
         finally:
             session_data["waiting_for_input"] = False
+            if session_data.get("input_event") is input_event:
+                session_data.pop("input_event", None)
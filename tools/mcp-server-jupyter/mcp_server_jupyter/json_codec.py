@@ -0,0 +1,168 @@
+"""
+JSON Codec
+==========
+
+One JSON encoder/decoder for every hot serialization path of the server
+(WebSocket broadcasts, tool results, binary frame headers, output spill).
+
+Those paths used stdlib json directly. Encoding a display_data or stream
+notification is a measurable share of per-message cost, and orjson /
+msgspec are several times faster when they happen to be installed.
+
+Design:
+1. The codec is picked once, at import time, from MCP_JSON_CODEC:
+   "auto" (default: orjson, then msgspec, then stdlib), "orjson",
+   "msgspec" or "stdlib". A named backend that is not installed falls back
+   to auto with a warning.
+2. dumps() returns str, dumpb() returns UTF-8 bytes (no decode/encode round
+   trip for sockets and files), loads() accepts either.
+3. Fast backends emit compact JSON, write NaN/Infinity as null, and reject
+   some objects stdlib accepts (non-str keys, ints over 64 bits). Any encode
+   error falls back to stdlib for that call, so no payload that encoded
+   before fails now.
+4. Paths whose output must be byte-stable (content hashes with sort_keys,
+   notebook files) keep using stdlib json on purpose.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Optional, Union
+
+from mcp_server_jupyter.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODEC = "auto"
+
+
+class StdlibCodec:
+    name = "stdlib"
+
+    def dumps(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> str:
+        return json.dumps(obj, indent=2 if indent else None, default=default)
+
+    def dumpb(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> bytes:
+        return StdlibCodec.dumps(self, obj, indent=indent, default=default).encode(
+            "utf-8"
+        )
+
+    def loads(self, data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+class OrjsonCodec(StdlibCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumpb(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> bytes:
+        options = self._options | (self._orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return self._orjson.dumps(obj, default=default, option=options)
+        except (TypeError, ValueError, OverflowError):
+            return super().dumpb(obj, indent=indent, default=default)
+
+    def dumps(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> str:
+        return self.dumpb(obj, indent=indent, default=default).decode("utf-8")
+
+    def loads(self, data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            # NaN/Infinity literals written by stdlib
+            return super().loads(data)
+
+
+class MsgspecCodec(StdlibCodec):
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumpb(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> bytes:
+        if indent:
+            # msgspec has no indent option; only used off the hot path
+            return super().dumpb(obj, indent=indent, default=default)
+        try:
+            if default is not None:
+                return self._msgspec.json.encode(obj, enc_hook=default)
+            return self._encoder.encode(obj)
+        except (TypeError, ValueError, OverflowError, self._msgspec.EncodeError):
+            return super().dumpb(obj, indent=indent, default=default)
+
+    def dumps(
+        self, obj: Any, indent: bool = False, default: Optional[Callable] = None
+    ) -> str:
+        return self.dumpb(obj, indent=indent, default=default).decode("utf-8")
+
+    def loads(self, data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except self._msgspec.DecodeError:
+            return super().loads(data)
+
+
+_BACKENDS = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "stdlib": StdlibCodec,
+}
+
+
+def create_codec(name: Optional[str] = None) -> StdlibCodec:
+    """Build the codec named by `name` (default: MCP_JSON_CODEC)."""
+    if name is None:
+        name = os.getenv("MCP_JSON_CODEC") or getattr(
+            settings, "MCP_JSON_CODEC", DEFAULT_CODEC
+        )
+    name = name.lower()
+    if name in _BACKENDS:
+        try:
+            return _BACKENDS[name]()
+        except ImportError:
+            logger.warning(f"[JSON] {name} is not installed, choosing automatically")
+    elif name != "auto":
+        logger.warning(f"[JSON] Unknown codec {name!r}, choosing automatically")
+
+    for backend in (OrjsonCodec, MsgspecCodec):
+        try:
+            return backend()
+        except ImportError:
+            continue
+    return StdlibCodec()
+
+
+codec = create_codec()
+
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+    return codec.dumps(obj, indent=indent, default=default)
+
+
+def dumpb(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> bytes:
+    return codec.dumpb(obj, indent=indent, default=default)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    return codec.loads(data)
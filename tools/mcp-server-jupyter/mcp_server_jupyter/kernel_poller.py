@@ -0,0 +1,221 @@
+"""
+Shared Kernel Channel Poller
+============================
+
+One zmq.asyncio.Poller for the IOPub and stdin sockets of every kernel.
+
+Each kernel used to get its own IOPub listener task and stdin listener
+task, each awaiting its own socket. With MCP_MAX_KERNELS at 100+ that is
+hundreds of tasks, and every IOPub message costs a task switch.
+
+Design:
+1. Kernels register their channels with `register()`. A single reader task
+   awaits the poller for all of them; task count does not grow with the
+   number of kernels.
+2. When sockets are ready, each one is drained up to `batch_size` messages
+   without blocking, and the batch is handed to that kernel's callback.
+   Batches of different kernels are dispatched concurrently; a kernel's
+   next batch is only read after its previous one was handled, so order is
+   preserved per channel.
+3. register()/unregister() wake the reader so the poller picks up the new
+   socket set immediately (no periodic timeout).
+4. A channel whose socket fails (or is closed while registered) is
+   unregistered and logged; the others keep running.
+5. supports() is False for clients without asyncio ZMQ sockets (test
+   doubles, blocking clients); callers fall back to per-kernel listeners.
+"""
+
+import asyncio
+import logging
+from queue import Empty
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import zmq
+import zmq.asyncio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 64
+
+# callback(messages) for one channel of one kernel
+BatchCallback = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class _Registration:
+    __slots__ = ("key", "channels")
+
+    def __init__(self, key: str):
+        self.key = key
+        # socket -> (channel name, channel, callback)
+        self.channels: Dict[Any, Tuple[str, Any, BatchCallback]] = {}
+
+
+class KernelChannelPoller:
+    """Reads IOPub and stdin messages for all kernels from one task."""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._poller = zmq.asyncio.Poller()
+        self._kernels: Dict[str, _Registration] = {}
+        # socket -> registration, for dispatching poll results
+        self._sockets: Dict[Any, _Registration] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+
+        # Metrics
+        self.polls = 0
+        self.messages = 0
+
+    @staticmethod
+    def supports(kc) -> bool:
+        """True if every channel we read exposes an asyncio ZMQ socket."""
+        try:
+            return all(
+                isinstance(getattr(channel, "socket", None), zmq.asyncio.Socket)
+                for channel in (kc.iopub_channel, kc.stdin_channel)
+            )
+        except Exception:
+            return False
+
+    def register(
+        self,
+        key: str,
+        kc,
+        on_iopub: BatchCallback,
+        on_stdin: Optional[BatchCallback] = None,
+    ) -> None:
+        """Start reading a kernel's IOPub (and stdin) channel."""
+        self.unregister(key)
+        registration = _Registration(key)
+        channels = [("iopub", kc.iopub_channel, on_iopub)]
+        if on_stdin is not None:
+            channels.append(("stdin", kc.stdin_channel, on_stdin))
+        for name, channel, callback in channels:
+            socket = channel.socket
+            registration.channels[socket] = (name, channel, callback)
+            self._sockets[socket] = registration
+            self._poller.register(socket, zmq.POLLIN)
+        self._kernels[key] = registration
+        self._ensure_running()
+        self._wake()
+
+    def unregister(self, key: str) -> None:
+        """Stop reading a kernel's channels (no-op if not registered)."""
+        registration = self._kernels.pop(key, None)
+        if registration is None:
+            return
+        for socket in registration.channels:
+            self._drop_socket(socket)
+        self._wake()
+
+    def _drop_socket(self, socket) -> None:
+        self._sockets.pop(socket, None)
+        try:
+            self._poller.unregister(socket)
+        except KeyError:
+            pass
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._kernels
+
+    def __len__(self) -> int:
+        return len(self._kernels)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._changed = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _run(self) -> None:
+        logger.info("Starting shared kernel channel poller")
+        try:
+            while True:
+                if not self._sockets:
+                    await self._changed.wait()
+                    self._changed.clear()
+                    continue
+
+                poll = asyncio.ensure_future(self._poller.poll())
+                changed = asyncio.ensure_future(self._changed.wait())
+                done, _ = await asyncio.wait(
+                    {poll, changed}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if poll not in done:
+                    # Socket set changed: re-poll with the new registrations
+                    poll.cancel()
+                    self._changed.clear()
+                    continue
+                changed.cancel()
+                self.polls += 1
+
+                try:
+                    events = poll.result()
+                except zmq.ZMQError as e:
+                    # A socket was closed before its kernel was unregistered
+                    logger.warning(f"[POLLER] Poll failed: {e}. Dropping closed sockets.")
+                    for socket in [s for s in self._sockets if s.closed]:
+                        registration = self._sockets[socket]
+                        registration.channels.pop(socket, None)
+                        self._drop_socket(socket)
+                    continue
+
+                ready = [socket for socket, event in events if event & zmq.POLLIN]
+                await asyncio.gather(*(self._dispatch(socket) for socket in ready))
+        except asyncio.CancelledError:
+            logger.info("Shared kernel channel poller cancelled")
+            raise
+
+    async def _dispatch(self, socket) -> None:
+        registration = self._sockets.get(socket)
+        if registration is None:
+            return
+        name, channel, callback = registration.channels[socket]
+
+        messages = []
+        try:
+            while len(messages) < self.batch_size:
+                try:
+                    messages.append(await channel.get_msg(timeout=0))
+                except Empty:
+                    break
+        except Exception as e:
+            logger.error(
+                f"[POLLER] {name} channel for {registration.key} failed: {e}. "
+                f"Unregistering it."
+            )
+            registration.channels.pop(socket, None)
+            self._drop_socket(socket)
+
+        if not messages:
+            return
+        self.messages += len(messages)
+        try:
+            await callback(messages)
+        except Exception as e:
+            logger.warning(
+                f"[POLLER] {name} dispatch for {registration.key} failed: {e}"
+            )
+
+    async def close(self) -> None:
+        """Stop the reader task and forget every kernel."""
+        for key in list(self._kernels):
+            self.unregister(key)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "kernels": len(self._kernels),
+            "sockets": len(self._sockets),
+            "polls": self.polls,
+            "messages": self.messages,
+        }
@@ -158,6 +158,10 @@ class RunAllCellsArgs(SecureBaseModel):
         default=False,
         description="Force run even if cell is tagged as frozen/expensive",
     )
+    fanout: bool = Field(
+        default=False,
+        description="Run independent cell branches concurrently on replica kernels",
+    )
 
     @field_validator("notebook_path")
     @classmethod
@@ -1,19 +1,53 @@
+import copy
 import nbformat
 import os
 import sys
 import tempfile
 import logging
 import re
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from array import array
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+
+from mcp_server_jupyter.io_lanes import notebook_io_lanes, on_notebook_lane
+from mcp_server_jupyter.notebook_cache import notebook_cache
+from mcp_server_jupyter.notebook_stream import skeleton_cache
+from mcp_server_jupyter import notebook_splice, output_spill, output_store, search_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Thread pool for blocking I/O operations
-_notebook_io_pool = ThreadPoolExecutor(max_workers=2)
+
+def _load_notebook(path: Union[str, Path]) -> nbformat.NotebookNode:
+    """
+    Read a notebook through the shared document cache.
+
+    The returned node is shared with other readers and must not be mutated.
+    Use _checkout_notebook() for read-modify-write operations.
+    """
+    return notebook_cache.get(path)
+
+
+def _checkout_notebook(path: Union[str, Path]) -> nbformat.NotebookNode:
+    """Read a private, mutable copy of a notebook for read-modify-write."""
+    return notebook_cache.checkout(path)
+
+
+def _load_skeleton(path: Union[str, Path]) -> nbformat.NotebookNode:
+    """
+    Read cell types, ids, sources and metadata without materializing outputs.
+
+    Cells carry `output_count` instead of `outputs`. Falls back to a full
+    (shared, read-only) read for pre-v4 notebooks, which nbformat upgrades,
+    and for files the scanner cannot parse, so nbformat reports the error.
+    """
+    try:
+        skeleton = skeleton_cache.get(path)
+    except ValueError:
+        return _load_notebook(path)
+    if skeleton.get("nbformat") != 4:
+        return _load_notebook(path)
+    return skeleton
 
 
 async def read_notebook_async(path: str):
@@ -22,10 +56,21 @@ async def read_notebook_async(path: str):
 
     Large notebooks (>1MB) can block the asyncio loop for 100ms+,
     causing heartbeat timeouts and agent disconnects.
+
+    Returns a private copy so callers may mutate it freely.
     """
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(
-        _notebook_io_pool, lambda: nbformat.read(path, as_version=4)
+    return await notebook_io_lanes.run(path, _checkout_notebook, path)
+
+
+async def write_notebook_async(nb: nbformat.NotebookNode, path: str, id_index=None):
+    """
+    Async wrapper for _atomic_write_notebook.
+
+    Runs on the notebook's I/O lane, so it is ordered after any pending
+    read or write of the same notebook and never blocks other notebooks.
+    """
+    return await notebook_io_lanes.run(
+        path, _atomic_write_notebook, nb, Path(path), id_index=id_index
     )
 
 
@@ -57,6 +102,81 @@ def _slice_text(text: str, line_range: Optional[List[int]] = None) -> str:
     return "\n".join(lines[start:end])
 
 
+def _join_cell_output(cell: nbformat.NotebookNode) -> str:
+    """Concatenate a code cell's text-like outputs the way read_cell_smart shows them."""
+    parts = []
+    for out in cell.get("outputs", []):
+        # Handle stream (stdout/stderr)
+        if out.output_type == "stream":
+            parts.append(out.text)
+        # Handle text/plain (execution results)
+        elif "text/plain" in out.get("data", {}):
+            parts.append(out.data["text/plain"])
+        # Handle errors
+        elif "error" == out.output_type:
+            parts.append(f"\nError: {out.ename}: {out.evalue}\n")
+            # traceback is usually a list of strings
+            if "traceback" in out:
+                parts.append("\n".join(out.traceback))
+    return "".join(parts)
+
+
+class _OutputLines:
+    """
+    A cell's joined output text plus the offset of every line start.
+
+    Built once per cached document, so head/tail summaries and line-range
+    slices cost O(returned lines) instead of re-splitting the whole output.
+    """
+
+    __slots__ = ("text", "_starts")
+
+    def __init__(self, text: str):
+        self.text = text
+        starts = array("q", [0])
+        find = text.find
+        pos = find("\n")
+        while pos >= 0:
+            starts.append(pos + 1)
+            pos = find("\n", pos + 1)
+        self._starts = starts
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @property
+    def line_count(self) -> int:
+        # Same as len(text.split("\n"))
+        return len(self._starts)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.text) + self._starts.itemsize * len(self._starts)
+
+    def lines(self, start: int, end: int) -> str:
+        """Lines [start, end) joined with newlines (indices already clamped)."""
+        if start >= end:
+            return ""
+        stop = self._starts[end] - 1 if end < len(self._starts) else len(self.text)
+        return self.text[self._starts[start] : stop]
+
+    def slice(self, line_range: List[int]) -> str:
+        """Same semantics as _slice_text(text, line_range)."""
+        total_lines = self.line_count
+        start, end = line_range[0], line_range[1]
+
+        # Handle negative indexing
+        if start < 0:
+            start += total_lines
+        if end < 0:
+            end += total_lines + 1  # +1 because slice is exclusive
+
+        # Clamp values
+        start = max(0, start)
+        end = min(total_lines, end)
+        return self.lines(start, end)
+
+
 def read_cell_smart(
     path: str,
     index: int,
@@ -71,7 +191,7 @@ def read_cell_smart(
     line_range: [start_line, end_line] (e.g., [0, 10] or [-10, -1]).
     """
     try:
-        nb = nbformat.read(path, as_version=4)
+        nb = _load_notebook(path)
     except Exception as e:
         return f"Error reading notebook: {e}"
 
@@ -92,47 +212,43 @@ def read_cell_smart(
 
     # 2. Get Outputs
     if target in ["output", "both"] and cell.cell_type == "code":
-        raw_output = ""
-        outputs = cell.get("outputs", [])
-        for out in outputs:
-            # Handle stream (stdout/stderr)
-            if out.output_type == "stream":
-                raw_output += out.text
-            # Handle text/plain (execution results)
-            elif "text/plain" in out.get("data", {}):
-                raw_output += out.data["text/plain"]
-            # Handle errors
-            elif "error" == out.output_type:
-                raw_output += f"\nError: {out.ename}: {out.evalue}\n"
-                # traceback is usually a list of strings
-                if "traceback" in out:
-                    raw_output += "\n".join(out.traceback)
-
-        if raw_output:
+        # Joined text and line offsets are computed once per cached document
+        text = notebook_cache.derive(
+            path,
+            nb,
+            ("output_lines", index),
+            lambda: _OutputLines(_join_cell_output(cell)),
+            size=lambda lines: lines.nbytes,
+        )
+
+        if text:
             # Apply Logic
             if fmt == "summary":
                 # Smart default: First 5, Last 5 lines
-                lines = raw_output.split("\n")
                 if (
-                    len(lines) > 20
+                    text.line_count > 20
                 ):  # Slightly larger buffer than 10 to make it worth truncating
-                    truncated = (
-                        lines[:5]
-                        + [f"\n... ({len(lines)-10} lines hidden) ...\n"]
-                        + lines[-5:]
+                    raw_output = "\n".join(
+                        [
+                            text.lines(0, 5),
+                            f"\n... ({text.line_count-10} lines hidden) ...\n",
+                            text.lines(text.line_count - 5, text.line_count),
+                        ]
                     )
-                    raw_output = "\n".join(truncated)
-                elif len(raw_output) > 2000:
+                elif len(text) > 2000:
                     raw_output = (
-                        raw_output[:1000]
+                        text.text[:1000]
                         + "\n... [Truncated] ...\n"
-                        + raw_output[-500:]
+                        + text.text[-500:]
                     )
+                else:
+                    raw_output = text.text
 
             elif fmt == "slice" and line_range:
-                raw_output = _slice_text(raw_output, line_range)
+                raw_output = text.slice(line_range)
 
             elif fmt == "full":
+                raw_output = text.text
                 # Safety Cap for "Full"
                 if len(raw_output) > 10000:
                     raw_output = (
@@ -140,6 +256,9 @@ def read_cell_smart(
                         + "\n... [Safety Truncated by MCP Server (10k char limit)] ..."
                     )
 
+            else:
+                raw_output = text.text
+
             result.append(f"--- CELL {index} OUTPUT ---")
             result.append(raw_output)
         else:
@@ -154,11 +273,12 @@ def search_notebook(path: str, query: str, regex: bool = False) -> str:
     Search for a string or regex pattern in the notebook.
     """
     try:
-        nb = nbformat.read(path, as_version=4)
+        nb = _load_skeleton(path)
     except Exception as e:
         return f"Error reading notebook: {e}"
 
     matches = []
+    pattern = re.compile(query) if regex else None
 
     for i, cell in enumerate(nb.cells):
         source = cell.source
@@ -166,8 +286,8 @@ def search_notebook(path: str, query: str, regex: bool = False) -> str:
 
         for line_idx, line in enumerate(lines):
             found = False
-            if regex:
-                if re.search(query, line):
+            if pattern:
+                if pattern.search(line):
                     found = True
             else:
                 if query in line:
@@ -182,7 +302,53 @@ def search_notebook(path: str, query: str, regex: bool = False) -> str:
     return "Matches found:\n" + "\n".join(matches)
 
 
-def _atomic_write_notebook(nb: nbformat.NotebookNode, path: Path) -> None:
+def search_workspace(
+    query: str, regex: bool = False, limit: int = 50, root: Optional[str] = None
+) -> str:
+    """
+    Search cell sources across every notebook under `root` (default: CWD).
+
+    Backed by the persistent FTS index in search_index.py; only notebooks
+    changed since the last lookup are re-read.
+    """
+    root = root or os.environ.get("MCP_ALLOWED_ROOT") or os.getcwd()
+    try:
+        index = search_index.get_search_index()
+        index.refresh(root)
+        hits = index.search(query, regex=regex, limit=limit, root=root)
+    except re.error as e:
+        return f"Invalid regex '{query}': {e}"
+    except Exception as e:
+        return f"Error searching workspace: {e}"
+
+    if not hits:
+        return f"No matches found for query: '{query}'"
+
+    lines = []
+    for hit in hits:
+        try:
+            shown = os.path.relpath(hit["path"], root)
+        except ValueError:
+            shown = hit["path"]
+        lines.append(
+            f"{shown} Cell {hit['cell_index']} (Line {hit['line']}): {hit['text']}"
+        )
+    header = "Matches found:"
+    if len(hits) >= limit:
+        header = f"Matches found (first {limit}):"
+    return header + "\n" + "\n".join(lines)
+
+
+def _flush_pending_results(path: Union[str, Path]) -> None:
+    """Write buffered execution results (keyed by index) before indices shift."""
+    from mcp_server_jupyter import write_behind
+
+    write_behind.flush_pending_sync(str(path))
+
+
+def _atomic_write_notebook(
+    nb: nbformat.NotebookNode, path: Path, id_index=None
+) -> None:
     """
     Write notebook atomically to prevent corruption from crashes or concurrent writes.
 
@@ -191,6 +357,8 @@ def _atomic_write_notebook(nb: nbformat.NotebookNode, path: Path) -> None:
     Args:
         nb: Notebook node to write
         path: Target path for the notebook file
+        id_index: Optional CellIdIndex already in sync with `nb`; cached
+                  with the document so the next id lookup skips a rebuild
 
     Raises:
         OSError: If write fails or path is inaccessible
@@ -200,10 +368,22 @@ def _atomic_write_notebook(nb: nbformat.NotebookNode, path: Path) -> None:
         dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
     )
 
+    spans = None
     try:
-        # Write to temp file
-        with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
-            nbformat.write(nb, f)
+        # Large notebooks: copy unchanged cells from the current file
+        try:
+            spans = notebook_splice.try_splice_write(nb, str(path), temp_fd)
+        except OSError as e:
+            logger.debug(f"Splice write failed for {path}, doing a full write: {e}")
+            os.ftruncate(temp_fd, 0)
+            os.lseek(temp_fd, 0, os.SEEK_SET)
+
+        if spans is None:
+            # Write to temp file
+            with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+                nbformat.write(nb, f)
+        else:
+            os.close(temp_fd)
 
         # Atomic rename (replaces target if exists)
         # os.replace() is atomic on POSIX and Windows
@@ -216,9 +396,19 @@ def _atomic_write_notebook(nb: nbformat.NotebookNode, path: Path) -> None:
                 os.unlink(temp_path)
         except OSError:
             pass  # Best effort cleanup
+        notebook_cache.invalidate(path)
         raise
 
+    # Remember what we just wrote so the next read doesn't reparse it
+    notebook_cache.store(path, nb, id_index)
+    if spans is not None:
+        notebook_cache.derive(
+            path, nb, "cell_spans", lambda: spans, size=lambda v: 16 * len(v)
+        )
+    search_index.notify_write(path, nb)
 
+
+@on_notebook_lane
 def create_notebook(
     notebook_path: str,
     kernel_name: str = "python3",
@@ -307,6 +497,7 @@ def create_notebook(
     return f"Notebook created at {notebook_path} with kernel '{kernel_display_name}'"
 
 
+@on_notebook_lane
 def get_notebook_outline(notebook_path: str) -> List[Dict[str, Any]]:
     """
     Returns a low-token overview of the file with Cell IDs.
@@ -320,8 +511,7 @@ def get_notebook_outline(notebook_path: str) -> List[Dict[str, Any]]:
     from mcp_server_jupyter.cell_id_manager import ensure_cell_ids
 
     path = Path(notebook_path)
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _load_skeleton(path)
 
     # [IIRB P0 FIX #3] Persist Cell IDs for git-safety
     # OLD BEHAVIOR: Generated IDs in-memory only, causing Heisenbug:
@@ -335,6 +525,8 @@ def get_notebook_outline(notebook_path: str) -> List[Dict[str, Any]]:
     # - Ensures stable IDs across server restarts
     # - Migrates notebooks to nbformat 4.5 for ID support
     # - Complies with git-safe cell addressing promise
+    if any(not cell.get("id") for cell in nb.cells):
+        nb = _checkout_notebook(path)
     was_modified, cells_updated = ensure_cell_ids(nb)
     if was_modified:
         # Upgrade nbformat version if needed
@@ -355,7 +547,9 @@ def get_notebook_outline(notebook_path: str) -> List[Dict[str, Any]]:
         )
         state = (
             "executed"
-            if cell.get("outputs") or cell.get("execution_count")
+            if cell.get("outputs")
+            or cell.get("output_count")
+            or cell.get("execution_count")
             else "fresh"
         )
         cell_id = getattr(cell, "id", f"legacy-{i}")  # Fallback for safety
@@ -400,6 +594,7 @@ def format_outline(structure_override: List[Dict]) -> List[Dict]:
     return outline
 
 
+@on_notebook_lane
 def append_cell(notebook_path: str, content: str, cell_type: str = "code") -> str:
     """Adds new logic to the end. Automatically clears output."""
     path = Path(notebook_path)
@@ -408,8 +603,7 @@ def append_cell(notebook_path: str, content: str, cell_type: str = "code") -> st
     if not path.exists():
         nb = nbformat.v4.new_notebook()
     else:
-        with open(path, "r", encoding="utf-8") as f:
-            nb = nbformat.read(f, as_version=4)
+        nb = _checkout_notebook(path)
 
     if cell_type == "code":
         new_cell = nbformat.v4.new_code_cell(source=content)
@@ -423,14 +617,14 @@ def append_cell(notebook_path: str, content: str, cell_type: str = "code") -> st
     return f"Cell appended at index {len(nb.cells) - 1}"
 
 
+@on_notebook_lane
 def edit_cell(notebook_path: str, index: int, content: str) -> str:
     """Replaces the Code. Crucially: Automatically clears the output."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     if 0 <= index < len(nb.cells):
         nb.cells[index].source = content
@@ -444,6 +638,7 @@ def edit_cell(notebook_path: str, index: int, content: str) -> str:
         raise IndexError(f"Cell index {index} out of range (0-{len(nb.cells)-1})")
 
 
+@on_notebook_lane
 def insert_cell(
     notebook_path: str, index: int, content: str, cell_type: str = "code"
 ) -> str:
@@ -455,9 +650,9 @@ def insert_cell(
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     if cell_type == "code":
         new_cell = nbformat.v4.new_code_cell(source=content)
@@ -465,21 +660,25 @@ def insert_cell(
         new_cell = nbformat.v4.new_markdown_cell(source=content)
 
     # Python insert handles negative indices and out of bounds gracefully automatically
+    total = len(nb.cells)
     nb.cells.insert(index, new_cell)
+    position = max(0, total + index) if index < 0 else min(index, total)
+    id_index.inserted(position, new_cell.get("id"))
 
-    _atomic_write_notebook(nb, path)
+    _atomic_write_notebook(nb, path, id_index=id_index)
 
     return f"Cell inserted at index {index}."
 
 
+@on_notebook_lane
 def delete_cell(notebook_path: str, index: int) -> str:
     """Deletes a cell at a specific position. Supports -1 for last cell."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     total = len(nb.cells)
 
@@ -489,8 +688,9 @@ def delete_cell(notebook_path: str, index: int) -> str:
         actual_index = total + index
 
     if 0 <= actual_index < total:
-        nb.cells.pop(actual_index)
-        _atomic_write_notebook(nb, path)
+        cell = nb.cells.pop(actual_index)
+        id_index.deleted(actual_index, cell.get("id"))
+        _atomic_write_notebook(nb, path, id_index=id_index)
         return f"Cell {actual_index} (was {index}) deleted. Remaining: {len(nb.cells)}"
     else:
         raise IndexError(f"Cell index {index} out of range (Total cells: {total})")
@@ -499,15 +699,14 @@ def delete_cell(notebook_path: str, index: int) -> str:
 def read_cell(notebook_path: str, index: int) -> Dict[str, Any]:
     """Reads a specific cell content and type."""
     path = Path(notebook_path)
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _load_notebook(path)
 
     # Support negative indexing
     if index < 0:
         index += len(nb.cells)
 
     if 0 <= index < len(nb.cells):
-        return dict(nb.cells[index])
+        return copy.deepcopy(dict(nb.cells[index]))
     raise IndexError("Cell index out of range")
 
 
@@ -529,32 +728,75 @@ def save_cell_execution(
         metadata_update: Optional metadata to inject into cell (e.g., provenance tracking)
                         Will be stored under cell.metadata['mcp_trace']
     """
+    save_cell_executions(
+        notebook_path,
+        {
+            index: {
+                "outputs": outputs,
+                "execution_count": execution_count,
+                "metadata_update": metadata_update,
+            }
+        },
+    )
+
+
+@on_notebook_lane
+def save_cell_executions(notebook_path: str, updates: Dict[int, Dict[str, Any]]):
+    """
+    Updates several cells with execution results in a single write.
+
+    Args:
+        notebook_path: Path to the notebook file
+        updates: Maps cell index -> {"outputs", "execution_count", "metadata_update"}
+                 (same meaning as the save_cell_execution arguments).
+                 Out-of-range indices are ignored.
+    """
     path = Path(notebook_path)
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
+
+    changed = False
+    blobs_added: List[str] = []
+    blobs_removed: List[str] = []
+    for index, update in updates.items():
+        if not (0 <= index < len(nb.cells)):
+            continue
+        cell = nb.cells[index]
 
-    if 0 <= index < len(nb.cells):
         # Update execution results
-        nb.cells[index].outputs = outputs
-        nb.cells[index].execution_count = execution_count
+        # Copy the list: the caller may keep appending to it after we return,
+        # and the written document is retained by the notebook cache.
+        # Spilled outputs stay on disk (stub + asset file), never in the document.
+        outputs = output_spill.persistable_outputs(update.get("outputs"), path)
+        if output_store.is_enabled():
+            outputs = output_store.externalize_outputs(path, outputs)
+            blobs_added += output_store.output_blob_refs(outputs)
+        blobs_removed += output_store.output_blob_refs(cell.get("outputs", []))
+        cell.outputs = outputs
+        cell.execution_count = update.get("execution_count")
 
         # Inject provenance metadata if provided
+        metadata_update = update.get("metadata_update")
         if metadata_update:
-            if "mcp" not in nb.cells[index].metadata:
-                nb.cells[index].metadata["mcp"] = {}
-            nb.cells[index].metadata["mcp"].update(metadata_update)
+            if "mcp" not in cell.metadata:
+                cell.metadata["mcp"] = {}
+            cell.metadata["mcp"].update(metadata_update)
+        changed = True
 
+    if changed:
         _atomic_write_notebook(nb, path)
+        if blobs_added or blobs_removed:
+            output_store.get_store(path).adjust(blobs_added, blobs_removed)
 
 
+@on_notebook_lane
 def move_cell(notebook_path: str, from_index: int, to_index: int) -> str:
     """Moves a cell from one position to another."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb, id_index = notebook_cache.checkout_indexed(path)
 
     total = len(nb.cells)
 
@@ -572,12 +814,14 @@ def move_cell(notebook_path: str, from_index: int, to_index: int) -> str:
     # Move the cell
     cell = nb.cells.pop(from_index)
     nb.cells.insert(to_index, cell)
+    id_index.moved(from_index, to_index, cell.get("id"))
 
-    _atomic_write_notebook(nb, path)
+    _atomic_write_notebook(nb, path, id_index=id_index)
 
     return f"Cell moved from index {from_index} to {to_index}"
 
 
+@on_notebook_lane
 def copy_cell(
     notebook_path: str, index: int, target_index: Optional[int] = None
 ) -> str:
@@ -585,9 +829,9 @@ def copy_cell(
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
 
@@ -634,6 +878,7 @@ def copy_cell(
     return f"Cell {index} copied to index {target_index}"
 
 
+@on_notebook_lane
 def merge_cells(
     notebook_path: str, start_index: int, end_index: int, separator: str = "\n\n"
 ) -> str:
@@ -641,9 +886,9 @@ def merge_cells(
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
 
@@ -689,14 +934,15 @@ def merge_cells(
     return f"Merged cells {start_index} to {end_index} into cell {start_index}"
 
 
+@on_notebook_lane
 def split_cell(notebook_path: str, index: int, split_at_line: int) -> str:
     """Splits a cell at the specified line number into two cells."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    _flush_pending_results(path)
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
 
@@ -741,6 +987,7 @@ def split_cell(notebook_path: str, index: int, split_at_line: int) -> str:
     return f"Cell {index} split at line {split_at_line}. New cell created at index {index + 1}"
 
 
+@on_notebook_lane
 def change_cell_type(notebook_path: str, index: int, new_type: str) -> str:
     """Changes the type of a cell (code, markdown, or raw)."""
     path = Path(notebook_path)
@@ -752,8 +999,7 @@ def change_cell_type(notebook_path: str, index: int, new_type: str) -> str:
             f"Invalid cell type: {new_type}. Must be 'code', 'markdown', or 'raw'"
         )
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
 
@@ -801,20 +1047,19 @@ def get_notebook_metadata(notebook_path: str) -> Dict[str, Any]:
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _load_notebook(path)
 
-    return dict(nb.metadata)
+    return copy.deepcopy(dict(nb.metadata))
 
 
+@on_notebook_lane
 def set_notebook_metadata(notebook_path: str, metadata: Dict[str, Any]) -> str:
     """Sets the notebook-level metadata."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     # Update metadata
     nb.metadata.update(metadata)
@@ -824,6 +1069,7 @@ def set_notebook_metadata(notebook_path: str, metadata: Dict[str, Any]) -> str:
     return "Notebook metadata updated"
 
 
+@on_notebook_lane
 def update_kernelspec(
     notebook_path: str,
     kernel_name: str,
@@ -835,8 +1081,7 @@ def update_kernelspec(
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     # Update kernelspec
     if "kernelspec" not in nb.metadata:
@@ -859,8 +1104,7 @@ def get_cell_metadata(notebook_path: str, index: int) -> Dict[str, Any]:
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _load_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -870,17 +1114,17 @@ def get_cell_metadata(notebook_path: str, index: int) -> Dict[str, Any]:
         raise IndexError(f"Index {index} out of range (0-{total-1})")
 
     cell = nb.cells[index]
-    return dict(cell.metadata) if hasattr(cell, "metadata") else {}
+    return copy.deepcopy(dict(cell.metadata)) if hasattr(cell, "metadata") else {}
 
 
+@on_notebook_lane
 def set_cell_metadata(notebook_path: str, index: int, metadata: Dict[str, Any]) -> str:
     """Sets metadata for a specific cell."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -897,14 +1141,14 @@ def set_cell_metadata(notebook_path: str, index: int, metadata: Dict[str, Any])
     return f"Cell {index} metadata updated"
 
 
+@on_notebook_lane
 def add_cell_tags(notebook_path: str, index: int, tags: List[str]) -> str:
     """Adds tags to a cell's metadata."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -933,14 +1177,14 @@ def add_cell_tags(notebook_path: str, index: int, tags: List[str]) -> str:
     return f"Tags {tags} added to cell {index}"
 
 
+@on_notebook_lane
 def remove_cell_tags(notebook_path: str, index: int, tags: List[str]) -> str:
     """Removes tags from a cell's metadata."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -966,14 +1210,14 @@ def remove_cell_tags(notebook_path: str, index: int, tags: List[str]) -> str:
 
 
 # Output operations
+@on_notebook_lane
 def clear_cell_outputs(notebook_path: str, index: int) -> str:
     """Clears outputs from a specific cell."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -985,33 +1229,40 @@ def clear_cell_outputs(notebook_path: str, index: int) -> str:
     cell = nb.cells[index]
 
     if cell.cell_type == "code":
+        blobs_removed = output_store.output_blob_refs(cell.get("outputs", []))
         cell.outputs = []
         cell.execution_count = None
 
         _atomic_write_notebook(nb, path)
+        if blobs_removed:
+            output_store.get_store(path).adjust([], blobs_removed)
 
         return f"Cell {index} outputs cleared"
     else:
         return f"Cell {index} is not a code cell"
 
 
+@on_notebook_lane
 def clear_all_outputs(notebook_path: str) -> str:
     """Clears outputs from all code cells in the notebook."""
     path = Path(notebook_path)
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _checkout_notebook(path)
 
     count = 0
+    blobs_removed: List[str] = []
     for cell in nb.cells:
         if cell.cell_type == "code":
+            blobs_removed += output_store.output_blob_refs(cell.get("outputs", []))
             cell.outputs = []
             cell.execution_count = None
             count += 1
 
     _atomic_write_notebook(nb, path)
+    if blobs_removed:
+        output_store.get_store(path).adjust([], blobs_removed)
 
     return f"Cleared outputs from {count} code cells"
 
@@ -1022,8 +1273,7 @@ def get_cell_outputs(notebook_path: str, index: int) -> List[Dict[str, Any]]:
     if not path.exists():
         raise FileNotFoundError(f"Notebook not found: {notebook_path}")
 
-    with open(path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+    nb = _load_notebook(path)
 
     total = len(nb.cells)
     if index < 0:
@@ -1035,7 +1285,8 @@ def get_cell_outputs(notebook_path: str, index: int) -> List[Dict[str, Any]]:
     cell = nb.cells[index]
 
     if cell.cell_type == "code":
-        return [dict(output) for output in cell.get("outputs", [])]
+        outputs = [copy.deepcopy(dict(output)) for output in cell.get("outputs", [])]
+        return output_store.hydrate_outputs(path, outputs)
     else:
         return []
 
@@ -1051,8 +1302,7 @@ def validate_notebook(notebook_path: str) -> Dict[str, Any]:
     warnings = []
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            nb = nbformat.read(f, as_version=4)
+        nb = _load_skeleton(path)
 
         # Check nbformat version
         if nb.nbformat != 4:
@@ -1074,7 +1324,7 @@ def validate_notebook(notebook_path: str) -> Dict[str, Any]:
                 issues.append(f"Cell {i} missing source")
 
             if cell.cell_type == "code":
-                if not hasattr(cell, "outputs"):
+                if "outputs" not in cell and "output_count" not in cell:
                     issues.append(f"Code cell {i} missing outputs field")
 
         return {
@@ -1095,3 +1345,199 @@ def validate_notebook(notebook_path: str) -> Dict[str, Any]:
             "nbformat_minor": None,
             "cell_count": 0,
         }
+
+
+# Cell ID addressed operations (see cell_id_manager)
+def edit_cell_by_id(
+    notebook_path: str, cell_id: str, content: str, expected_index: Optional[int] = None
+) -> str:
+    """Edits the cell with the given Cell ID. Clears outputs for code cells."""
+    from mcp_server_jupyter import cell_id_manager
+
+    return cell_id_manager.edit_cell_by_id(
+        notebook_path, cell_id, content, expected_index
+    )
+
+
+def delete_cell_by_id(
+    notebook_path: str, cell_id: str, expected_index: Optional[int] = None
+) -> str:
+    """Deletes the cell with the given Cell ID."""
+    from mcp_server_jupyter import cell_id_manager
+
+    return cell_id_manager.delete_cell_by_id(notebook_path, cell_id, expected_index)
+
+
+def insert_cell_by_id(
+    notebook_path: str,
+    after_cell_id: Optional[str],
+    content: str,
+    cell_type: str = "code",
+) -> str:
+    """Inserts a new cell after the given Cell ID (None = at the start)."""
+    from mcp_server_jupyter import cell_id_manager
+
+    return cell_id_manager.insert_cell_by_id(
+        notebook_path, after_cell_id, content, cell_type
+    )
+
+
+# Batched edits
+def _resolve_op_index(
+    nb: nbformat.NotebookNode, op: Dict[str, Any], key: str = "index", id_index=None
+) -> int:
+    """Resolve an op's target cell from `cell_id` or a (possibly negative) index."""
+    from mcp_server_jupyter.cell_id_manager import find_cell_by_id
+
+    total = len(nb.cells)
+    if key == "index" and op.get("cell_id"):
+        found = find_cell_by_id(nb, op["cell_id"], id_index)
+        if not found:
+            raise KeyError(f"Cell ID {op['cell_id']} not found")
+        return found[0]
+
+    if key not in op:
+        raise ValueError(f"missing '{key}'")
+    index = int(op[key])
+    if index < 0:
+        index = total + index
+    if not (0 <= index < total):
+        raise IndexError(f"Index {op[key]} out of range (0-{total-1})")
+    return index
+
+
+def _apply_edit_op(nb: nbformat.NotebookNode, op: Dict[str, Any], id_index=None) -> str:
+    """
+    Apply a single edit op to an in-memory notebook. Returns a short summary.
+
+    When `id_index` (a CellIdIndex for `nb`) is given, cell_id lookups use it
+    and structural ops keep it in sync.
+    """
+    if not isinstance(op, dict):
+        raise TypeError("each op must be a dict")
+    kind = op.get("op")
+
+    if kind == "insert":
+        cell_type = op.get("cell_type", "code")
+        content = op.get("content", "")
+        if cell_type == "code":
+            new_cell = nbformat.v4.new_code_cell(source=content)
+        elif cell_type == "markdown":
+            new_cell = nbformat.v4.new_markdown_cell(source=content)
+        elif cell_type == "raw":
+            new_cell = nbformat.v4.new_raw_cell(source=content)
+        else:
+            raise ValueError(f"Invalid cell type: {cell_type}")
+        index = op.get("index")
+        if index is None:
+            nb.cells.append(new_cell)
+            if id_index is not None:
+                id_index.inserted(len(nb.cells) - 1, new_cell.get("id"))
+            return f"insert@{len(nb.cells) - 1}"
+        # Same semantics as insert_cell: list.insert handles negatives/overflow
+        total = len(nb.cells)
+        position = int(index)
+        position = max(0, total + position) if position < 0 else min(position, total)
+        nb.cells.insert(position, new_cell)
+        if id_index is not None:
+            id_index.inserted(position, new_cell.get("id"))
+        return f"insert@{index}"
+
+    if kind == "edit":
+        index = _resolve_op_index(nb, op, id_index=id_index)
+        cell = nb.cells[index]
+        cell.source = op.get("content", "")
+        if cell.cell_type == "code":
+            cell.outputs = []
+            cell.execution_count = None
+        return f"edit@{index}"
+
+    if kind == "delete":
+        index = _resolve_op_index(nb, op, id_index=id_index)
+        cell = nb.cells.pop(index)
+        if id_index is not None:
+            id_index.deleted(index, cell.get("id"))
+        return f"delete@{index}"
+
+    if kind == "move":
+        from_index = _resolve_op_index(
+            nb, op, "index" if op.get("cell_id") else "from_index", id_index
+        )
+        to_index = _resolve_op_index(nb, op, "to_index")
+        cell = nb.cells.pop(from_index)
+        nb.cells.insert(to_index, cell)
+        if id_index is not None:
+            id_index.moved(from_index, to_index, cell.get("id"))
+        return f"move@{from_index}->{to_index}"
+
+    if kind == "tag":
+        index = _resolve_op_index(nb, op, id_index=id_index)
+        tags = nb.cells[index].metadata.setdefault("tags", [])
+        for tag in op.get("add", []):
+            if tag not in tags:
+                tags.append(tag)
+        for tag in op.get("remove", []):
+            if tag in tags:
+                tags.remove(tag)
+        return f"tag@{index}"
+
+    if kind == "metadata":
+        metadata = op.get("metadata")
+        if not isinstance(metadata, dict):
+            raise ValueError("'metadata' must be a dict")
+        if "index" in op or op.get("cell_id"):
+            index = _resolve_op_index(nb, op, id_index=id_index)
+            nb.cells[index].metadata.update(metadata)
+            return f"metadata@{index}"
+        nb.metadata.update(metadata)
+        return "metadata@notebook"
+
+    raise ValueError(
+        f"Unknown op '{kind}'. Must be one of: insert, edit, delete, move, tag, metadata"
+    )
+
+
+@on_notebook_lane
+def apply_notebook_edits(notebook_path: str, ops: List[Dict[str, Any]]) -> str:
+    """
+    Applies a list of edit ops to the notebook and writes it once.
+
+    Ops are applied in order to a single in-memory document, so indices in
+    later ops refer to the notebook as modified by earlier ops. If any op
+    fails, nothing is written.
+
+    Supported ops (cells may be addressed by `index` or `cell_id`):
+        {"op": "insert", "index": 2, "content": "...", "cell_type": "code"}
+            (omit index to append)
+        {"op": "edit", "index": 0, "content": "..."}  (clears outputs)
+        {"op": "delete", "cell_id": "abc"}
+        {"op": "move", "from_index": 3, "to_index": 0}
+        {"op": "tag", "index": 1, "add": ["slow"], "remove": ["todo"]}
+        {"op": "metadata", "index": 1, "metadata": {...}}
+            (omit index/cell_id for notebook-level metadata)
+    """
+    path = Path(notebook_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Notebook not found: {notebook_path}")
+    if not ops:
+        return "No edits to apply"
+    _flush_pending_results(path)
+
+    nb, id_index = notebook_cache.checkout_indexed(path)
+
+    applied = []
+    for i, op in enumerate(ops):
+        try:
+            applied.append(_apply_edit_op(nb, op, id_index))
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            raise ValueError(
+                f"Edit op {i} ({op.get('op') if isinstance(op, dict) else op!r}) failed: {e}. "
+                "No changes were written."
+            ) from e
+
+    _atomic_write_notebook(nb, path, id_index=id_index)
+
+    return (
+        f"Applied {len(applied)} edits in one write ({', '.join(applied)}). "
+        f"Total cells: {len(nb.cells)}"
+    )
@@ -0,0 +1,332 @@
+"""
+Notebook Document Cache
+=======================
+
+In-process cache of parsed notebooks shared by every helper in notebook.py
+and cell_id_manager.py.
+
+Agents issue dozens of read_cell / search_notebook / get_notebook_outline
+calls per minute against the same 20-50 MB notebook. Without a cache each
+call pays a full JSON parse plus nbformat validation.
+
+Design:
+1. Keyed by resolved path, validated by (st_mtime_ns, st_size, st_ino).
+   Any external write (VS Code save, git checkout) changes the signature
+   and forces a reparse on the next access.
+2. LRU eviction bounded by a byte budget (file size is the cost estimate).
+3. Readers share the cached document and must treat it as read-only.
+   Writers call checkout() and get a copy-on-write view: notebook and cell
+   nodes, metadata and the cell list are private, while the heavy output
+   payloads stay shared until the writer replaces them.
+4. After an atomic write, store() records the written document under the
+   new file signature so the next read does not reparse what we just wrote.
+5. Each entry can carry a cell id -> index map (cell_id_manager.CellIdIndex),
+   built once per document and handed to writers with checkout_indexed() so
+   they can update it incrementally instead of rebuilding it.
+6. derive() memoizes other values computed from a cached document (e.g.
+   per-cell output line offsets for read_cell_smart). They are dropped with
+   the entry and count against the byte budget.
+"""
+
+import copy
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+import nbformat
+
+from mcp_server_jupyter.config import settings
+
+if TYPE_CHECKING:
+    from mcp_server_jupyter.cell_id_manager import CellIdIndex
+
+logger = logging.getLogger(__name__)
+
+# (st_mtime_ns, st_size, st_ino)
+FileSignature = Tuple[int, int, int]
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _file_signature(path: str) -> FileSignature:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _cow_cell(cell: nbformat.NotebookNode) -> nbformat.NotebookNode:
+    """Copy a cell, sharing output payloads with the original."""
+    clone = nbformat.NotebookNode()
+    for key, value in cell.items():
+        if key == "outputs":
+            # New list so appends/pops stay private; output dicts are shared
+            clone[key] = list(value)
+        elif key == "source" or not isinstance(value, (dict, list)):
+            clone[key] = value
+        else:
+            clone[key] = copy.deepcopy(value)
+    return clone
+
+
+def cow_copy(nb: nbformat.NotebookNode) -> nbformat.NotebookNode:
+    """
+    Return a copy-on-write view of a notebook.
+
+    Everything a writer can mutate in place (metadata, cell list, cell
+    fields) is copied. Output dicts are shared: writers must assign a new
+    outputs list rather than editing an existing output in place.
+    """
+    clone = nbformat.NotebookNode()
+    for key, value in nb.items():
+        if key == "cells":
+            clone[key] = [_cow_cell(cell) for cell in value]
+        elif isinstance(value, (dict, list)):
+            clone[key] = copy.deepcopy(value)
+        else:
+            clone[key] = value
+    return clone
+
+
+class _CacheEntry:
+    """One cached document plus data derived from it."""
+
+    __slots__ = ("signature", "nb", "id_index", "derived", "derived_bytes")
+
+    def __init__(self, signature: FileSignature, nb: nbformat.NotebookNode, id_index):
+        self.signature = signature
+        self.nb = nb
+        self.id_index = id_index
+        # Memoized per-document values (see NotebookDocumentCache.derive)
+        self.derived: Dict[Hashable, Any] = {}
+        self.derived_bytes = 0
+
+    @property
+    def cost(self) -> int:
+        return self.signature[1] + self.derived_bytes
+
+
+class NotebookDocumentCache:
+    """
+    LRU cache of parsed notebooks bounded by a byte budget.
+
+    Thread-safe: notebook helpers run in executor threads, so all bookkeeping
+    happens under a lock. Parsing happens outside the lock so a large read
+    does not block lookups for other notebooks.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return str(Path(path).resolve())
+
+    def get(self, path: Union[str, Path]) -> nbformat.NotebookNode:
+        """
+        Return the parsed notebook at `path`, reparsing only if it changed.
+
+        The returned node is shared with other readers. Do not mutate it;
+        use checkout() when the document is going to be modified.
+
+        Raises:
+            FileNotFoundError: If the notebook does not exist
+        """
+        key = self._key(path)
+        signature = _file_signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.nb
+            self.misses += 1
+
+        with open(key, "r", encoding="utf-8") as f:
+            nb = nbformat.read(f, as_version=4)
+
+        # Re-stat after parsing: if the file changed mid-read, don't cache a
+        # document under a signature it might not match.
+        if _file_signature(key) == signature:
+            self._put(key, signature, nb)
+        return nb
+
+    def peek(
+        self, path: Union[str, Path]
+    ) -> Optional[Tuple[FileSignature, nbformat.NotebookNode]]:
+        """
+        Return (signature, shared document) if the cached copy is current.
+
+        Never parses: returns None on a miss or when the file has changed.
+        """
+        key = self._key(path)
+        try:
+            signature = _file_signature(key)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                return signature, entry.nb
+        return None
+
+    def checkout(self, path: Union[str, Path]) -> nbformat.NotebookNode:
+        """Return a private, mutable copy-on-write view of the notebook."""
+        return cow_copy(self.get(path))
+
+    def _entry_for(self, key: str, nb: nbformat.NotebookNode) -> Optional[_CacheEntry]:
+        """Cache entry still holding `nb` (caller holds the lock)."""
+        entry = self._entries.get(key)
+        return entry if entry is not None and entry.nb is nb else None
+
+    def get_indexed(
+        self, path: Union[str, Path]
+    ) -> Tuple[nbformat.NotebookNode, "CellIdIndex"]:
+        """
+        Return the shared document and its cell id index (both read-only).
+
+        The index is built on first use and kept with the cache entry.
+        """
+        from mcp_server_jupyter.cell_id_manager import CellIdIndex
+
+        nb = self.get(path)
+        key = self._key(path)
+        with self._lock:
+            entry = self._entry_for(key, nb)
+            if entry is not None and entry.id_index is not None:
+                return nb, entry.id_index
+
+        id_index = CellIdIndex(nb.cells)
+        with self._lock:
+            entry = self._entry_for(key, nb)
+            if entry is not None:
+                entry.id_index = id_index
+        return nb, id_index
+
+    def checkout_indexed(
+        self, path: Union[str, Path]
+    ) -> Tuple[nbformat.NotebookNode, "CellIdIndex"]:
+        """
+        Return a private copy of the notebook plus a private copy of its index.
+
+        Writers update the index alongside structural edits and pass it to
+        store() (via _atomic_write_notebook) so it never has to be rebuilt.
+        """
+        nb, id_index = self.get_indexed(path)
+        return cow_copy(nb), id_index.copy()
+
+    def derive(
+        self,
+        path: Union[str, Path],
+        nb: nbformat.NotebookNode,
+        name: Hashable,
+        build: Callable[[], Any],
+        size: Callable[[Any], int] = lambda value: 0,
+    ) -> Any:
+        """
+        Compute a value from a shared document once and keep it with the entry.
+
+        `nb` must be the document returned by get(path); if the entry has
+        since been replaced, the value is built but not memoized. `size`
+        estimates the value's bytes, which count against the cache budget.
+        """
+        key = self._key(path)
+        with self._lock:
+            entry = self._entry_for(key, nb)
+            if entry is not None and name in entry.derived:
+                return entry.derived[name]
+
+        value = build()
+        with self._lock:
+            entry = self._entry_for(key, nb)
+            if entry is not None and name not in entry.derived:
+                nbytes = size(value)
+                entry.derived[name] = value
+                entry.derived_bytes += nbytes
+                self._total_bytes += nbytes
+                self._evict_over_budget()
+        return value
+
+    def store(
+        self,
+        path: Union[str, Path],
+        nb: nbformat.NotebookNode,
+        id_index: Optional["CellIdIndex"] = None,
+    ) -> None:
+        """
+        Record `nb` as the current contents of `path` (call after writing it).
+
+        Pass `id_index` only if it is in sync with `nb`.
+        """
+        key = self._key(path)
+        try:
+            signature = _file_signature(key)
+        except OSError:
+            self.invalidate(key)
+            return
+        self._put(key, signature, nb, id_index)
+
+    def invalidate(self, path: Optional[Union[str, Path]] = None) -> None:
+        """Drop one notebook (or everything when path is None)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            entry = self._entries.pop(self._key(path), None)
+            if entry is not None:
+                self._total_bytes -= entry.cost
+
+    def _put(
+        self,
+        key: str,
+        signature: FileSignature,
+        nb: nbformat.NotebookNode,
+        id_index: Optional["CellIdIndex"] = None,
+    ) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.cost
+
+            if signature[1] > self.max_bytes:
+                # A single notebook larger than the budget is never cached
+                return
+
+            entry = _CacheEntry(signature, nb, id_index)
+            self._entries[key] = entry
+            self._total_bytes += entry.cost
+            self._evict_over_budget()
+
+    def _evict_over_budget(self) -> None:
+        """Drop least recently used entries until within budget (lock held)."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= evicted.cost
+            logger.debug(f"[NB CACHE] Evicted {evicted_key}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache_bytes = int(
+    os.getenv("MCP_NOTEBOOK_CACHE_BYTES")
+    or getattr(settings, "MCP_NOTEBOOK_CACHE_BYTES", DEFAULT_CACHE_BYTES)
+)
+
+# Process-wide cache shared by notebook.py and cell_id_manager.py
+notebook_cache = NotebookDocumentCache(max_bytes=_cache_bytes)
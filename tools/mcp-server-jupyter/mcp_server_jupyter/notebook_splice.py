@@ -0,0 +1,282 @@
+"""
+Splice Writer for Large Notebooks
+=================================
+
+Editing one cell of a 50 MB notebook through nbformat.write deep-copies,
+validates and re-serializes every cell, including megabytes of base64
+outputs that did not change.
+
+The splice writer instead builds the new file from:
+1. Unchanged cells: byte ranges copied straight from the current file with
+   os.copy_file_range / os.sendfile (kernel-side copy, no decoding).
+2. Changed cells, the header and the trailing metadata: serialized exactly
+   the way nbformat does (split lines, sorted keys, indent=1), so the
+   result is byte-identical to a full nbformat.write.
+
+A cell counts as unchanged when it matches the cached document's cell with
+the same id and still shares its output objects (see cow_copy in
+notebook_cache.py: writers replace output lists rather than edit outputs).
+The cached document is what nbformat.read made of the file, which may fill
+in missing ids or repair duplicate ones, so the id on disk must match too.
+
+Byte offsets and the on-disk id of each cell come from a one-off scan of
+the file and are cached with the document. After a splice the new offsets are known and
+cached directly. Any unexpected layout falls back to a full write (the
+caller's normal path), and the caller keeps temp file + os.replace
+semantics either way.
+"""
+
+import copy
+import json
+import logging
+import mmap
+import os
+from typing import List, Optional, Tuple
+
+import nbformat
+from nbformat.v4.nbjson import BytesEncoder
+from nbformat.v4.rwbase import split_lines, strip_transient
+
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.notebook_cache import _file_signature, notebook_cache
+from mcp_server_jupyter.notebook_stream import _Scanner
+
+logger = logging.getLogger(__name__)
+
+# (start, end, id as written in the file or None if the cell has no id)
+CellSpans = List[Tuple[int, int, Optional[str]]]
+
+DEFAULT_MIN_BYTES = 4 * 1024 * 1024
+
+# Files smaller than this are written with nbformat.write (0 disables splicing)
+SPLICE_MIN_BYTES = int(
+    os.getenv("MCP_SPLICE_WRITE_MIN_BYTES")
+    or getattr(settings, "MCP_SPLICE_WRITE_MIN_BYTES", DEFAULT_MIN_BYTES)
+)
+
+_JSON_KWARGS = dict(
+    cls=BytesEncoder,
+    indent=1,
+    sort_keys=True,
+    separators=(",", ": "),
+    ensure_ascii=False,
+)
+_CELL_PREFIX = b"\n  "
+
+
+def scan_cell_spans(path: str) -> Optional[CellSpans]:
+    """
+    Byte range and on-disk id of every cell object in the file at `path`.
+
+    Returns None if the file is not laid out the way nbformat writes it
+    (each cell starting on its own line at two-space indent), in which case
+    copying cells verbatim would mix formatting styles.
+    """
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+        try:
+            scanner = _Scanner(buf)
+            spans: CellSpans = []
+
+            def on_cell(pos: int) -> int:
+                disk_id = None
+
+                def on_cell_member(key: str, vpos: int) -> int:
+                    nonlocal disk_id
+                    if key == "id":
+                        disk_id, end = scanner.value(vpos)
+                        return end
+                    return scanner.skip_value(vpos)
+
+                end = scanner.object(pos, on_cell_member)
+                spans.append((pos, end, disk_id))
+                return end
+
+            def on_member(key: str, vpos: int) -> int:
+                if key == "cells":
+                    return scanner.array(vpos, on_cell)
+                return scanner.skip_value(vpos)
+
+            scanner.object(0, on_member)
+
+            for start, _, _ in spans:
+                if buf[start - len(_CELL_PREFIX) : start] != _CELL_PREFIX:
+                    return None
+            return spans
+        except (ValueError, IndexError):
+            return None
+        finally:
+            buf.close()
+
+
+def _serialize_cell(cell: nbformat.NotebookNode) -> bytes:
+    """One cell exactly as nbformat.write lays it out inside "cells"."""
+    # from_dict: freshly saved outputs may still be plain dicts
+    cell = nbformat.from_dict(copy.deepcopy(cell))
+    wrapper = nbformat.NotebookNode(metadata=nbformat.NotebookNode(), cells=[cell])
+    wrapper = strip_transient(split_lines(wrapper))
+    text = json.dumps(wrapper.cells[0], **_JSON_KWARGS)
+    return "\n".join("  " + line for line in text.split("\n")).encode("utf-8")
+
+
+def _serialize_tail(nb: nbformat.NotebookNode) -> Optional[bytes]:
+    """Everything after the cell list, or None if "cells" is not the first key."""
+    rest = {key: value for key, value in nb.items() if key != "cells"}
+    if any(key < "cells" for key in rest):
+        return None
+    rest["metadata"] = copy.deepcopy(rest.get("metadata", {}))
+    strip_transient(nbformat.NotebookNode(metadata=rest["metadata"], cells=[]))
+    if not rest:
+        return b"\n ]\n}\n"
+    text = json.dumps(rest, **_JSON_KWARGS)
+    # Drop the opening "{\n" - the cell list already opened the object
+    return b"\n ],\n" + text[2:].encode("utf-8") + b"\n"
+
+
+def _same_cell(new: nbformat.NotebookNode, old: nbformat.NotebookNode) -> bool:
+    if new.keys() != old.keys():
+        return False
+    for key, value in new.items():
+        if key == "outputs":
+            old_outputs = old[key]
+            if len(value) != len(old_outputs) or any(
+                a is not b for a, b in zip(value, old_outputs)
+            ):
+                return False
+        elif value != old[key]:
+            return False
+    return True
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """Append src[offset:offset+count] to dst using a kernel-side copy."""
+    while count > 0:
+        copied = 0
+        try:
+            if hasattr(os, "copy_file_range"):
+                copied = os.copy_file_range(src_fd, dst_fd, count, offset)
+            else:
+                copied = os.sendfile(dst_fd, src_fd, offset, count)
+        except (OSError, AttributeError):
+            copied = 0
+        if copied <= 0:
+            # Unsupported filesystem pair: plain read/write
+            chunk = os.pread(src_fd, min(count, 1 << 20), offset)
+            if not chunk:
+                raise OSError("Unexpected end of file while splicing")
+            os.write(dst_fd, chunk)
+            copied = len(chunk)
+        offset += copied
+        count -= copied
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def try_splice_write(
+    nb: nbformat.NotebookNode, path: str, temp_fd: int
+) -> Optional[CellSpans]:
+    """
+    Write `nb` to `temp_fd` by splicing unchanged cells from `path`.
+
+    Nothing is written unless splicing applies. Returns the cell spans of
+    the new file on success, or None if the caller should do a full write.
+    """
+    if SPLICE_MIN_BYTES <= 0 or not nb.get("cells"):
+        return None
+
+    try:
+        peeked = notebook_cache.peek(path)
+        if peeked is None:
+            return None
+        signature, base = peeked
+        if signature[1] < SPLICE_MIN_BYTES:
+            return None
+
+        cached, id_index = notebook_cache.get_indexed(path)
+        if cached is not base:
+            return None
+
+        def build_spans() -> Optional[CellSpans]:
+            spans = scan_cell_spans(path)
+            # Only valid if the file did not change while scanning
+            return spans if _file_signature(path) == signature else None
+
+        spans = notebook_cache.derive(
+            path,
+            base,
+            "cell_spans",
+            build_spans,
+            size=lambda value: 16 * len(value or ()),
+        )
+        if spans is None or len(spans) != len(base.cells):
+            return None
+
+        tail = _serialize_tail(nb)
+        if tail is None:
+            return None
+
+        # Plan: for each new cell, an old span to copy or fresh bytes
+        plan = []
+        reused = 0
+        for cell in nb.cells:
+            cell_id = cell.get("id")
+            old_index = id_index.lookup(base.cells, cell_id) if cell_id else None
+            if (
+                old_index is not None
+                and spans[old_index][2] == cell_id
+                and _same_cell(cell, base.cells[old_index])
+            ):
+                plan.append(spans[old_index])
+                reused += 1
+            else:
+                plan.append(_serialize_cell(cell))
+        if not reused:
+            return None
+
+        src_fd = os.open(path, os.O_RDONLY)
+    except (OSError, ValueError, TypeError) as e:
+        logger.debug(f"[SPLICE] Falling back to full write for {path}: {e}")
+        return None
+
+    try:
+        # The file must still be the one the spans were computed for
+        st = os.fstat(src_fd)
+        if (st.st_mtime_ns, st.st_size, st.st_ino) != signature:
+            return None
+
+        new_spans: CellSpans = []
+        position = 0
+
+        def emit(data: bytes) -> None:
+            nonlocal position
+            _write_all(temp_fd, data)
+            position += len(data)
+
+        emit(b'{\n "cells": [')
+        for i, item in enumerate(plan):
+            emit(b"\n  " if i == 0 else b",\n  ")
+            start = position
+            if isinstance(item, bytes):
+                # Serialized cells carry their own two-space prefix
+                emit(item[2:])
+            else:
+                old_start, old_end, _ = item
+                _copy_range(src_fd, temp_fd, old_start, old_end - old_start)
+                position += old_end - old_start
+            new_spans.append((start, position, nb.cells[i].get("id")))
+        emit(tail)
+
+        logger.debug(
+            f"[SPLICE] {os.path.basename(path)}: copied {reused}/{len(plan)} cells"
+        )
+        return new_spans
+    finally:
+        os.close(src_fd)
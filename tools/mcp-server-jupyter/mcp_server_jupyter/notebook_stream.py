@@ -0,0 +1,255 @@
+"""
+Streaming Notebook Skeleton Reader
+==================================
+
+Outline, search and validate only need cell types, ids and sources. A full
+nbformat.read of a plot-heavy notebook materializes every base64 image in
+`outputs` just to throw it away: a 100 MB notebook costs seconds and
+hundreds of MB of heap.
+
+This module scans the raw JSON instead:
+1. The file is memory-mapped, so resident memory is bounded by the page
+   cache rather than the Python heap.
+2. A small hand-rolled scanner walks the document structure. Strings are
+   skipped with mmap.find (C speed, no decoding) and nested values with a
+   regex that jumps between structural characters.
+3. Cell fields are decoded with json.loads on their byte span, except
+   `outputs`, which is only counted.
+
+The result is a "skeleton" NotebookNode: same shape as nbformat's, but each
+cell carries `output_count` instead of `outputs`. Content inside skipped
+outputs is not validated.
+"""
+
+import json
+import mmap
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Tuple, Union
+
+import nbformat
+
+from mcp_server_jupyter.notebook_cache import FileSignature, _file_signature
+
+_WS = re.compile(rb"[ \t\n\r]*")
+_STRUCT = re.compile(rb'["\[\]{}]')
+_SCALAR = re.compile(rb"[^,\]}\s]*")
+
+_BACKSLASH = ord("\\")
+_OPENERS = (ord("{"), ord("["))
+_CLOSERS = (ord("}"), ord("]"))
+_QUOTE = ord('"')
+
+
+class _Scanner:
+    """Minimal JSON structure walker over a bytes-like buffer."""
+
+    def __init__(self, buf):
+        self.buf = buf
+
+    def ws(self, pos: int) -> int:
+        return _WS.match(self.buf, pos).end()
+
+    def expect(self, pos: int, char: bytes) -> int:
+        pos = self.ws(pos)
+        if self.buf[pos : pos + 1] != char:
+            raise ValueError(f"Expected {char.decode()!r} at byte {pos}")
+        return pos + 1
+
+    def skip_string(self, pos: int) -> int:
+        """pos is at an opening quote; return the offset after the closing one."""
+        buf = self.buf
+        while True:
+            end = buf.find(b'"', pos + 1)
+            if end < 0:
+                raise ValueError("Unterminated string")
+            # Quote is escaped if preceded by an odd number of backslashes
+            k = end - 1
+            while buf[k] == _BACKSLASH:
+                k -= 1
+            if (end - 1 - k) % 2 == 0:
+                return end + 1
+            pos = end
+
+    def skip_value(self, pos: int) -> int:
+        """Return the offset just past the value starting at pos."""
+        buf = self.buf
+        pos = self.ws(pos)
+        c = buf[pos]
+        if c == _QUOTE:
+            return self.skip_string(pos)
+        if c not in _OPENERS:
+            return _SCALAR.match(buf, pos).end()
+
+        depth = 1
+        pos += 1
+        while True:
+            m = _STRUCT.search(buf, pos)
+            if m is None:
+                raise ValueError("Unterminated container")
+            c = buf[m.start()]
+            if c == _QUOTE:
+                pos = self.skip_string(m.start())
+            elif c in _OPENERS:
+                depth += 1
+                pos = m.end()
+            else:
+                depth -= 1
+                pos = m.end()
+                if depth == 0:
+                    return pos
+
+    def load(self, start: int, end: int):
+        return json.loads(self.buf[start:end])
+
+    def value(self, pos: int) -> Tuple[object, int]:
+        pos = self.ws(pos)
+        end = self.skip_value(pos)
+        return self.load(pos, end), end
+
+    def object(self, pos: int, on_member: Callable[[str, int], int]) -> int:
+        """Walk an object; on_member(key, value_pos) returns the value's end."""
+        pos = self.expect(pos, b"{")
+        pos = self.ws(pos)
+        if self.buf[pos : pos + 1] == b"}":
+            return pos + 1
+        while True:
+            pos = self.ws(pos)
+            key_end = self.skip_string(pos)
+            key = self.load(pos, key_end)
+            pos = self.ws(self.expect(key_end, b":"))
+            pos = self.ws(on_member(key, pos))
+            c = self.buf[pos : pos + 1]
+            if c == b",":
+                pos += 1
+            elif c == b"}":
+                return pos + 1
+            else:
+                raise ValueError(f"Expected ',' or '}}' at byte {pos}")
+
+    def array(self, pos: int, on_item: Callable[[int], int]) -> int:
+        """Walk an array; on_item(value_pos) returns the item's end."""
+        pos = self.expect(pos, b"[")
+        pos = self.ws(pos)
+        if self.buf[pos : pos + 1] == b"]":
+            return pos + 1
+        while True:
+            pos = self.ws(on_item(self.ws(pos)))
+            c = self.buf[pos : pos + 1]
+            if c == b",":
+                pos += 1
+            elif c == b"]":
+                return pos + 1
+            else:
+                raise ValueError(f"Expected ',' or ']' at byte {pos}")
+
+
+def _parse_cell(scanner: _Scanner, pos: int) -> Tuple[nbformat.NotebookNode, int]:
+    cell = nbformat.NotebookNode()
+
+    def on_member(key: str, vpos: int) -> int:
+        if key == "outputs":
+            count = 0
+
+            def on_output(opos: int) -> int:
+                nonlocal count
+                count += 1
+                return scanner.skip_value(opos)
+
+            end = scanner.array(vpos, on_output)
+            cell["output_count"] = count
+            return end
+
+        value, end = scanner.value(vpos)
+        if key == "source" and isinstance(value, list):
+            value = "".join(value)
+        cell[key] = nbformat.from_dict(value)
+        return end
+
+    end = scanner.object(pos, on_member)
+    return cell, end
+
+
+def _parse_skeleton(buf) -> nbformat.NotebookNode:
+    scanner = _Scanner(buf)
+    nb = nbformat.NotebookNode(metadata=nbformat.NotebookNode(), cells=[])
+
+    def on_cell(pos: int) -> int:
+        cell, end = _parse_cell(scanner, pos)
+        nb.cells.append(cell)
+        return end
+
+    def on_member(key: str, vpos: int) -> int:
+        if key == "cells":
+            return scanner.array(vpos, on_cell)
+        value, end = scanner.value(vpos)
+        nb[key] = nbformat.from_dict(value)
+        return end
+
+    scanner.object(0, on_member)
+    return nb
+
+
+def scan_notebook_skeleton(path: Union[str, Path]) -> nbformat.NotebookNode:
+    """
+    Parse a notebook without materializing cell outputs.
+
+    Raises:
+        FileNotFoundError: If the notebook does not exist
+        ValueError: If the file is not a JSON object
+    """
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: mmap cannot map zero bytes
+            raise ValueError(f"Notebook is empty: {path}")
+        try:
+            return _parse_skeleton(buf)
+        finally:
+            buf.close()
+
+
+class SkeletonCache:
+    """
+    Small LRU of skeletons validated by file signature.
+
+    Skeletons are tiny compared to full documents, so the bound is an entry
+    count rather than a byte budget.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[FileSignature, nbformat.NotebookNode]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> nbformat.NotebookNode:
+        """Return the (shared, read-only) skeleton for `path`."""
+        key = str(Path(path).resolve())
+        signature = _file_signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        skeleton = scan_notebook_skeleton(key)
+
+        if _file_signature(key) == signature:
+            with self._lock:
+                self._entries[key] = (signature, skeleton)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return skeleton
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+skeleton_cache = SkeletonCache()
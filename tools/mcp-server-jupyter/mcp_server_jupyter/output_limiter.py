@@ -0,0 +1,264 @@
+"""
+Output Rate Limiter
+===================
+
+Per-execution token buckets for `notebook/output` broadcasts.
+
+ConnectionManager used to drop any output message arriving within 100 ms
+of the previous one, across all executions. Clients silently lost output
+(often the last lines of a cell), and one chatty cell starved the others.
+
+Design:
+1. Each execution (task_id / exec_id, else notebook path) has a bucket of
+   `burst` tokens refilled at `rate` per second. A message that finds a
+   token is sent at once.
+2. Without a token the message joins the execution's pending tail and a
+   timer is armed for the next refill. Nothing is dropped.
+3. When the timer fires, consecutive stream chunks of the same stream in
+   the tail are merged into one message; other outputs keep their own.
+   Every message sent costs a token, so the flush sends as many as the
+   bucket holds and re-arms for the rest. A merged message carries
+   `coalesced: N` (the number of original messages it stands for) so
+   clients know they got a batch.
+4. A non-output message for a notebook (status, completion) first flushes
+   that notebook's whole tail, still one token per message sent, even if
+   that leaves the bucket in debt. Flushes of a bucket take its lock, so a
+   forced flush waits for a timer flush that is still sending and then
+   sends what is left. The final output always precedes the status.
+5. rate <= 0 disables limiting (every message sent as-is).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from mcp_server_jupyter.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_PER_SECOND = 10.0
+DEFAULT_BURST = 10
+# Idle buckets are swept once this many are tracked
+_SWEEP_THRESHOLD = 256
+
+Sender = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "notebook_path", "pending", "timer", "lock")
+
+    def __init__(self, burst: float, now: float, notebook_path: Optional[str]):
+        self.tokens = burst
+        self.updated = now
+        self.notebook_path = notebook_path
+        self.pending: List[Dict[str, Any]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Held while a flush sends; later output queues behind it
+        self.lock = asyncio.Lock()
+
+
+def _execution_key(params: Dict[str, Any]) -> Any:
+    return (
+        params.get("task_id")
+        or params.get("exec_id")
+        or (params.get("notebook_path"), params.get("cell_index"))
+    )
+
+
+def _stream_of(params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The stream output dict inside a notebook/output message, if any."""
+    output = params.get("output")
+    if isinstance(output, dict) and output.get("output_type") == "stream":
+        return output
+    content = params.get("content")
+    if params.get("type") == "stream" and isinstance(content, dict):
+        return content
+    return None
+
+
+def coalesce(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge runs of same-stream chunks; mark merged messages with `coalesced`."""
+    merged: List[Dict[str, Any]] = []
+    counts: List[int] = []
+    for message in messages:
+        params = message.get("params") or {}
+        stream = _stream_of(params)
+        # A message re-queued by a partial flush may already be a merge
+        count = params.get("coalesced", 1)
+        if merged and stream is not None:
+            last_params = merged[-1]["params"]
+            last_stream = _stream_of(last_params)
+            if last_stream is not None and last_stream.get("name") == stream.get("name"):
+                last_stream["text"] = last_stream.get("text", "") + stream.get("text", "")
+                if "seq_end" in params:
+                    last_params["seq_end"] = params["seq_end"]
+                counts[-1] += count
+                continue
+        if stream is not None:
+            # Copy the parts we may append to; the caller's message is shared
+            params = dict(params)
+            if "output" in params:
+                params["output"] = dict(params["output"])
+            else:
+                params["content"] = dict(params["content"])
+            message = {**message, "params": params}
+        merged.append(message)
+        counts.append(count)
+
+    for message, count in zip(merged, counts):
+        if count > 1:
+            message["params"]["coalesced"] = count
+    return merged
+
+
+class OutputRateLimiter:
+    """Token-bucket limiter with a pending tail per execution."""
+
+    def __init__(
+        self,
+        send: Sender,
+        rate: float = DEFAULT_RATE_PER_SECOND,
+        burst: float = DEFAULT_BURST,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.send = send
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.clock = clock
+        self._buckets: Dict[Any, _Bucket] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.messages_in = 0
+        self.messages_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, bucket: _Bucket, now: float) -> None:
+        bucket.tokens = min(
+            self.burst, bucket.tokens + (now - bucket.updated) * self.rate
+        )
+        bucket.updated = now
+
+    async def submit(self, message: Dict[str, Any]) -> None:
+        """Send a notebook/output message now, or queue it for the next token."""
+        self.messages_in += 1
+        if not self.enabled:
+            self.messages_out += 1
+            await self.send(message)
+            return
+
+        params = message.get("params") or {}
+        key = _execution_key(params)
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= _SWEEP_THRESHOLD:
+                self._sweep(now)
+            bucket = _Bucket(self.burst, now, params.get("notebook_path"))
+            self._buckets[key] = bucket
+        else:
+            self._refill(bucket, now)
+
+        # While a tail is pending or being sent, later messages queue behind it
+        flushing = bucket.lock.locked()
+        if not bucket.pending and not flushing and bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self.messages_out += 1
+            await self.send(message)
+            return
+
+        bucket.pending.append(message)
+        if not flushing:
+            self._arm(bucket)
+
+    def _arm(self, bucket: _Bucket) -> None:
+        if bucket.timer is None:
+            delay = max(0.0, (1 - bucket.tokens) / self.rate)
+            bucket.timer = asyncio.get_running_loop().call_later(
+                delay, self._fire, bucket
+            )
+
+    def _fire(self, bucket: _Bucket) -> None:
+        bucket.timer = None
+        task = asyncio.get_running_loop().create_task(
+            self._flush_bucket(bucket, force=False)
+        )
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_bucket(self, bucket: _Bucket, force: bool = True) -> None:
+        # A forced flush waits here for a timer flush still sending its part
+        # of the tail, then sends the rest
+        async with bucket.lock:
+            if not bucket.pending:
+                return
+            if bucket.timer is not None:
+                bucket.timer.cancel()
+                bucket.timer = None
+            messages = coalesce(bucket.pending)
+            self._refill(bucket, self.clock())
+            if not force:
+                # The timer fires once a token is available
+                budget = max(1, int(bucket.tokens))
+                messages, bucket.pending = messages[:budget], messages[budget:]
+            else:
+                bucket.pending = []
+            # A forced flush (before a status message) may run the bucket negative
+            bucket.tokens -= len(messages)
+            for message in messages:
+                self.messages_out += 1
+                try:
+                    await self.send(message)
+                except Exception as e:
+                    logger.warning(
+                        f"[OUTPUT-LIMIT] Failed to send coalesced output: {e}"
+                    )
+        # The rest of the tail, and output that arrived while sending, waits
+        # for the next token
+        if bucket.pending and not bucket.lock.locked():
+            self._arm(bucket)
+
+    async def flush(self, notebook_path: Optional[str] = None) -> None:
+        """Send pending tails now (only the notebook's, if a path is given)."""
+        for bucket in list(self._buckets.values()):
+            if notebook_path is None or bucket.notebook_path == notebook_path:
+                await self._flush_bucket(bucket)
+
+    def _sweep(self, now: float) -> None:
+        """Forget buckets that are idle and full again."""
+        for key, bucket in list(self._buckets.items()):
+            if not bucket.pending and not bucket.lock.locked():
+                self._refill(bucket, now)
+                if bucket.tokens >= self.burst:
+                    del self._buckets[key]
+
+    def pending_count(self) -> int:
+        return sum(len(bucket.pending) for bucket in self._buckets.values())
+
+    def stats(self) -> dict:
+        return {
+            "executions": len(self._buckets),
+            "pending": self.pending_count(),
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+        }
+
+
+def create_output_limiter(send: Sender) -> OutputRateLimiter:
+    """Build a limiter from MCP_OUTPUT_RATE_* settings."""
+    return OutputRateLimiter(
+        send,
+        rate=float(
+            os.getenv("MCP_OUTPUT_RATE_PER_SECOND")
+            or getattr(settings, "MCP_OUTPUT_RATE_PER_SECOND", DEFAULT_RATE_PER_SECOND)
+        ),
+        burst=float(
+            os.getenv("MCP_OUTPUT_RATE_BURST")
+            or getattr(settings, "MCP_OUTPUT_RATE_BURST", DEFAULT_BURST)
+        ),
+    )
@@ -0,0 +1,288 @@
+"""
+Spill-to-Disk Output Accumulator
+================================
+
+Bounds the server memory used by one execution's outputs.
+
+exec_data["outputs"] used to be a plain list that grew for as long as the
+cell kept printing. A cell that prints gigabytes took the server process
+down with it, not just the kernel.
+
+Design:
+1. SpillableOutputs behaves like the list it replaces: append, len,
+   iteration, indexing, clear. save_cell_execution, sanitize_outputs and
+   the write-behind buffer consume it unchanged.
+2. Outputs are kept in memory until their estimated size reaches
+   `memory_limit_bytes`. Every later output is appended, one JSON line
+   each, to assets/spill/<id>.jsonl next to the notebook. Order is
+   preserved: the in-memory head always precedes the spilled tail.
+3. Iteration streams the tail from disk one output at a time; indexing
+   seeks to a recorded line offset.
+4. The spill file is deleted on clear() and when the accumulator is
+   garbage collected. The asset pruners only look at top-level files in
+   assets/, so they never touch it.
+5. memory_limit_bytes <= 0 disables spilling (a plain in-memory list).
+6. Saving to the notebook never reads the spilled tail back:
+   persistable_outputs() keeps the in-memory head, links (or streams a
+   copy of) the spill file to assets/outputs_<id>.jsonl and appends one
+   stream output pointing at it, the same stub-and-asset pattern used
+   for large text outputs.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from array import array
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Union
+
+import nbformat
+
+from mcp_server_jupyter import json_codec
+from mcp_server_jupyter.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_LIMIT_BYTES = 32 * 1024 * 1024
+
+SPILL_DIR_NAME = "spill"
+
+
+def _output_size(output: Any) -> int:
+    """Cheap estimate of an output's size in bytes (text lengths, no JSON)."""
+    if not isinstance(output, dict):
+        return len(str(output))
+    size = 0
+    for key in ("text", "traceback", "data"):
+        value = output.get(key)
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            for item in value.values():
+                size += len(item) if isinstance(item, str) else len(json_codec.dumpb(item))
+        elif isinstance(value, list):
+            size += sum(len(item) for item in value if isinstance(item, str))
+        else:
+            size += len(str(value))
+    return size
+
+
+def _close_spill(state: dict) -> None:
+    handle = state.get("handle")
+    if handle is not None:
+        try:
+            handle.close()
+        except OSError:
+            pass
+        state["handle"] = None
+    path = state.get("path")
+    if path is not None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class SpillableOutputs:
+    """List of nbformat outputs that overflows to an append-only file."""
+
+    def __init__(
+        self,
+        spill_dir: Union[str, Path],
+        memory_limit_bytes: int = DEFAULT_MEMORY_LIMIT_BYTES,
+        name: Optional[str] = None,
+    ):
+        self.spill_dir = Path(spill_dir)
+        self.memory_limit_bytes = memory_limit_bytes
+        self.name = name or uuid.uuid4().hex
+
+        self._head: List[Any] = []
+        self._head_bytes = 0
+        # Byte offset of each spilled output's line in the spill file
+        self._offsets = array("q")
+        self._spilled_bytes = 0
+        # Shared with the finalizer so a dropped accumulator removes its file
+        self._spill = {"path": None, "handle": None}
+        self._finalizer = weakref.finalize(self, _close_spill, self._spill)
+
+    # -- list interface ----------------------------------------------------
+
+    def append(self, output: Any) -> None:
+        if self._offsets or self._over_limit(output):
+            self._write(output)
+        else:
+            self._head.append(output)
+            self._head_bytes += _output_size(output)
+
+    def extend(self, outputs) -> None:
+        for output in outputs:
+            self.append(output)
+
+    def clear(self) -> None:
+        self._head = []
+        self._head_bytes = 0
+        self._offsets = array("q")
+        self._spilled_bytes = 0
+        _close_spill(self._spill)
+        self._spill["path"] = None
+
+    def __len__(self) -> int:
+        return len(self._head) + len(self._offsets)
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from list(self._head)
+        if not self._offsets:
+            return
+        count = len(self._offsets)
+        self._spill["handle"].flush()
+        with open(self._spill["path"], "rb") as f:
+            for _ in range(count):
+                yield self._decode(f.readline())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("output index out of range")
+        if index < len(self._head):
+            return self._head[index]
+        self._spill["handle"].flush()
+        with open(self._spill["path"], "rb") as f:
+            f.seek(self._offsets[index - len(self._head)])
+            return self._decode(f.readline())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, SpillableOutputs)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return (
+            f"SpillableOutputs(len={len(self)}, in_memory={len(self._head)}, "
+            f"spilled={len(self._offsets)})"
+        )
+
+    # -- spilling ----------------------------------------------------------
+
+    @property
+    def spilled(self) -> bool:
+        return bool(self._offsets)
+
+    @property
+    def spill_path(self) -> Optional[str]:
+        return self._spill["path"]
+
+    def _over_limit(self, output: Any) -> bool:
+        if self.memory_limit_bytes <= 0:
+            return False
+        return self._head_bytes + _output_size(output) > self.memory_limit_bytes
+
+    def _write(self, output: Any) -> None:
+        handle = self._spill["handle"]
+        if handle is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self.spill_dir / f"{self.name}.jsonl"
+            handle = open(path, "ab")
+            self._spill.update(path=str(path), handle=handle)
+            logger.info(
+                f"[SPILL] Outputs exceeded {self.memory_limit_bytes} bytes, "
+                f"spilling to {path}"
+            )
+        line = json_codec.dumpb(output) + b"\n"
+        self._offsets.append(handle.tell())
+        handle.write(line)
+        self._spilled_bytes += len(line)
+
+    def head(self) -> List[Any]:
+        """The outputs held in memory (all of them unless spilled)."""
+        return list(self._head)
+
+    def export_tail(self, path: Union[str, Path]) -> None:
+        """Make the spilled outputs (one JSON line each) available at `path`."""
+        self._spill["handle"].flush()
+        try:
+            os.link(self._spill["path"], path)
+        except OSError:
+            # Different filesystem or no hard links: stream a copy
+            shutil.copyfile(self._spill["path"], path)
+
+    @staticmethod
+    def _decode(line: bytes) -> Any:
+        return nbformat.from_dict(json_codec.loads(line))
+
+    def stats(self) -> dict:
+        return {
+            "outputs": len(self),
+            "in_memory": len(self._head),
+            "in_memory_bytes": self._head_bytes,
+            "spilled": len(self._offsets),
+            "spilled_bytes": self._spilled_bytes,
+        }
+
+
+def spill_dir_for(notebook_path: Optional[Union[str, Path]]) -> Path:
+    """assets/spill/ next to the notebook (temp dir when there is none)."""
+    if not notebook_path:
+        return Path(tempfile.gettempdir()) / "mcp-jupyter" / SPILL_DIR_NAME
+    return Path(notebook_path).resolve().parent / "assets" / SPILL_DIR_NAME
+
+
+def create_output_buffer(
+    notebook_path: Optional[Union[str, Path]], name: Optional[str] = None
+) -> SpillableOutputs:
+    """Build an accumulator from MCP_OUTPUT_MEMORY_LIMIT_BYTES."""
+    return SpillableOutputs(
+        spill_dir_for(notebook_path),
+        memory_limit_bytes=int(
+            os.getenv("MCP_OUTPUT_MEMORY_LIMIT_BYTES")
+            or getattr(
+                settings, "MCP_OUTPUT_MEMORY_LIMIT_BYTES", DEFAULT_MEMORY_LIMIT_BYTES
+            )
+        ),
+        name=name,
+    )
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def persistable_outputs(
+    outputs: Any, notebook_path: Union[str, Path]
+) -> List[Any]:
+    """
+    Outputs to store in the notebook document, without loading spilled ones.
+
+    A spilled accumulator contributes its in-memory head plus a stub
+    stream output naming the asset file that holds the rest. Anything
+    else is copied into a plain list.
+    """
+    if not isinstance(outputs, SpillableOutputs) or not outputs.spilled:
+        return list(outputs or [])
+
+    asset_dir = Path(notebook_path).resolve().parent / "assets"
+    asset_dir.mkdir(parents=True, exist_ok=True)
+    asset_name = f"outputs_{outputs.name}.jsonl"
+    asset_path = asset_dir / asset_name
+    if not asset_path.exists():
+        outputs.export_tail(asset_path)
+
+    stats = outputs.stats()
+    stub = nbformat.v4.new_output(
+        "stream",
+        name="stdout",
+        text=(
+            f"\n[{stats['spilled']} more outputs ({_format_bytes(stats['spilled_bytes'])}) "
+            f"not stored in the notebook; full output in assets/{asset_name}, "
+            f"one JSON output per line]\n"
+        ),
+    )
+    return outputs.head() + [stub]
@@ -0,0 +1,349 @@
+"""
+Content-Addressed Output Blob Store
+===================================
+
+Opt-in (MCP_OUTPUT_BLOB_STORE=1) storage for large output payloads.
+
+Re-running a plotting cell normally rewrites the same multi-MB base64 PNG
+into the .ipynb every time, and identical figures in several cells are
+stored once per cell. With the blob store enabled, save_cell_execution
+moves every mime payload of at least MCP_OUTPUT_BLOB_MIN_BYTES into
+assets/blobs/<sha256[:2]>/<sha256>.<ext> and leaves a reference behind:
+
+    output.metadata["mcp_blobs"][mime] = {"sha256", "size", "encoding", "path"}
+
+Design:
+1. The address is the sha256 of the stored bytes, so identical outputs
+   dedupe across cells, re-runs and notebooks sharing an assets/ folder.
+   base64 image payloads are stored decoded (a real, viewable .png) when
+   they round-trip exactly; everything else is stored as UTF-8 text/JSON.
+2. assets/blobs/refs.json keeps a reference count per blob. Counts are
+   adjusted when a cell's outputs are replaced or cleared.
+3. collect_garbage() recounts references from the notebooks next to
+   assets/ (mark) before deleting unreferenced blobs (sweep), so refs
+   leaked by deleted cells or external edits are corrected instead of
+   trusted. Blobs newer than a grace period are kept, covering a blob
+   written just before the notebook that references it. put() refreshes
+   the mtime of a blob it reuses, so a dedupe hit is covered too.
+4. The time-based asset pruners only look at top-level files in assets/,
+   so blobs are managed exclusively here.
+5. hydrate_outputs() restores the original mime bundle for readers.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import nbformat
+
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.notebook_cache import notebook_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_BYTES = 64 * 1024
+DEFAULT_GC_GRACE_SECONDS = 3600
+
+BLOB_METADATA_KEY = "mcp_blobs"
+BLOB_DIR_NAME = "blobs"
+REFS_FILE_NAME = "refs.json"
+
+_ENABLED = str(
+    os.getenv("MCP_OUTPUT_BLOB_STORE")
+    or getattr(settings, "MCP_OUTPUT_BLOB_STORE", False)
+).lower() in ("1", "true", "yes", "on")
+
+MIN_BLOB_BYTES = int(
+    os.getenv("MCP_OUTPUT_BLOB_MIN_BYTES")
+    or getattr(settings, "MCP_OUTPUT_BLOB_MIN_BYTES", DEFAULT_MIN_BYTES)
+)
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+class OutputBlobStore:
+    """Blob directory plus reference counts for one assets/ folder."""
+
+    def __init__(self, assets_dir: Union[str, Path]):
+        self.assets_dir = Path(assets_dir)
+        self.blob_dir = self.assets_dir / BLOB_DIR_NAME
+        self.refs_path = self.blob_dir / REFS_FILE_NAME
+        self._lock = threading.Lock()
+        self._refs: Optional[Dict[str, int]] = None
+
+    # -- blobs -------------------------------------------------------------
+
+    def _blob_path(self, sha: str, ext: str) -> Path:
+        return self.blob_dir / sha[:2] / f"{sha}{ext}"
+
+    def put(self, payload: bytes, ext: str) -> Path:
+        """Store payload (no-op if already present) and return its path."""
+        sha = hashlib.sha256(payload).hexdigest()
+        target = self._blob_path(sha, ext)
+        with self._lock:
+            try:
+                # The new reference is not counted until the notebook is
+                # saved: restart the GC grace period
+                os.utime(target)
+                return target
+            except FileNotFoundError:
+                pass
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=".blob.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, target)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return target
+
+    def get(self, ref: Dict[str, Any]) -> bytes:
+        path = self.assets_dir.parent / ref["path"]
+        with open(path, "rb") as f:
+            payload = f.read()
+        if hashlib.sha256(payload).hexdigest() != ref["sha256"]:
+            raise ValueError(f"Blob {ref['path']} does not match its hash")
+        return payload
+
+    # -- reference counts --------------------------------------------------
+
+    def _load_refs(self) -> Dict[str, int]:
+        if self._refs is None:
+            try:
+                with open(self.refs_path, encoding="utf-8") as f:
+                    self._refs = {k: int(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                self._refs = {}
+        return self._refs
+
+    def _save_refs(self) -> None:
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.blob_dir, prefix=".refs.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._refs, f, sort_keys=True)
+        os.replace(temp_path, self.refs_path)
+
+    def adjust(self, added: Iterable[str], removed: Iterable[str]) -> None:
+        """Apply reference count changes for blobs gained and lost."""
+        added, removed = list(added), list(removed)
+        if not added and not removed:
+            return
+        with self._lock:
+            refs = self._load_refs()
+            for sha in added:
+                refs[sha] = refs.get(sha, 0) + 1
+            for sha in removed:
+                refs[sha] = max(0, refs.get(sha, 0) - 1)
+            self._save_refs()
+
+    def refcount(self, sha: str) -> int:
+        with self._lock:
+            return self._load_refs().get(sha, 0)
+
+    def collect_garbage(
+        self,
+        notebooks: Optional[Iterable[Union[str, Path]]] = None,
+        grace_seconds: float = DEFAULT_GC_GRACE_SECONDS,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Recount references and delete blobs nothing points to.
+
+        Args:
+            notebooks: Notebooks that may reference this store (default: every
+                       .ipynb next to the assets folder)
+            grace_seconds: Keep unreferenced blobs younger than this
+            dry_run: Report without deleting
+        """
+        if notebooks is None:
+            notebooks = self.assets_dir.parent.glob("*.ipynb")
+
+        counts: Dict[str, int] = {}
+        for nb_path in notebooks:
+            try:
+                nb = notebook_cache.get(nb_path)
+            except Exception as e:
+                # An unreadable notebook might hold references: don't sweep
+                logger.warning(f"[BLOBS] Skipping GC, cannot read {nb_path}: {e}")
+                return {"deleted": [], "freed_bytes": 0, "error": str(e)}
+            for cell in nb.cells:
+                for sha in output_blob_refs(cell.get("outputs", [])):
+                    counts[sha] = counts.get(sha, 0) + 1
+
+        deleted: List[str] = []
+        freed = 0
+        now = time.time()
+        with self._lock:
+            if self.blob_dir.exists():
+                for blob in self.blob_dir.glob("*/*"):
+                    sha = blob.stem
+                    try:
+                        stat = blob.stat()
+                    except FileNotFoundError:
+                        # Removed since the listing (e.g. a temp file renamed)
+                        continue
+                    if counts.get(sha) or now - stat.st_mtime < grace_seconds:
+                        continue
+                    freed += stat.st_size
+                    deleted.append(blob.name)
+                    if not dry_run:
+                        blob.unlink(missing_ok=True)
+            if not dry_run:
+                self._refs = counts
+                self._save_refs()
+
+        return {"deleted": deleted, "freed_bytes": freed, "referenced": len(counts)}
+
+
+_stores: Dict[str, OutputBlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(notebook_path: Union[str, Path]) -> OutputBlobStore:
+    """Blob store shared by every notebook in the same directory."""
+    assets_dir = Path(notebook_path).resolve().parent / "assets"
+    key = str(assets_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = OutputBlobStore(assets_dir)
+        return store
+
+
+def _encode(mime: str, value: Any):
+    """(payload bytes, encoding, extension) for a mime bundle value."""
+    if isinstance(value, list):
+        value = "".join(value)
+    if isinstance(value, str):
+        if mime.startswith("image/") and not mime.endswith("svg+xml"):
+            try:
+                raw = base64.b64decode(value, validate=True)
+            except (binascii.Error, ValueError):
+                raw = None
+            # Only store decoded if we can reproduce the exact string
+            if raw is not None and base64.b64encode(raw).decode("ascii") == value:
+                ext = mimetypes.guess_extension(mime) or ".bin"
+                return raw, "base64", ext
+        return value.encode("utf-8"), "text", ".txt"
+    return (
+        json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8"),
+        "json",
+        ".json",
+    )
+
+
+def _decode(payload: bytes, encoding: str) -> Any:
+    if encoding == "base64":
+        return base64.b64encode(payload).decode("ascii")
+    if encoding == "json":
+        return json.loads(payload)
+    return payload.decode("utf-8")
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, list):
+        return sum(len(v) for v in value if isinstance(v, str))
+    return len(json.dumps(value))
+
+
+def output_blob_refs(outputs: Iterable[Any]) -> List[str]:
+    """sha256 of every blob referenced by a list of outputs."""
+    shas = []
+    for output in outputs:
+        refs = (output.get("metadata") or {}).get(BLOB_METADATA_KEY) or {}
+        shas.extend(ref["sha256"] for ref in refs.values() if "sha256" in ref)
+    return shas
+
+
+def externalize_outputs(
+    notebook_path: Union[str, Path],
+    outputs: List[Any],
+    min_bytes: Optional[int] = None,
+) -> List[Any]:
+    """
+    Move large mime payloads into the blob store.
+
+    Returns a new output list; outputs without large payloads are passed
+    through unchanged (same objects).
+    """
+    min_bytes = MIN_BLOB_BYTES if min_bytes is None else min_bytes
+    store = None
+    result = []
+    for output in outputs:
+        data = output.get("data") if isinstance(output, dict) else None
+        large = [
+            mime for mime, value in (data or {}).items()
+            if _value_size(value) >= min_bytes
+        ]
+        if not large:
+            result.append(output)
+            continue
+
+        if store is None:
+            store = get_store(notebook_path)
+        output = dict(output)
+        data = dict(data)
+        metadata = dict(output.get("metadata") or {})
+        refs = dict(metadata.get(BLOB_METADATA_KEY) or {})
+        for mime in large:
+            payload, encoding, ext = _encode(mime, data.pop(mime))
+            blob = store.put(payload, ext)
+            refs[mime] = {
+                "sha256": blob.stem,
+                "size": len(payload),
+                "encoding": encoding,
+                "path": blob.relative_to(store.assets_dir.parent).as_posix(),
+            }
+        if not data:
+            # Keep the bundle displayable in viewers that don't know about blobs
+            data["text/plain"] = f"[Output stored in {refs[large[0]]['path']}]"
+            refs[large[0]]["placeholder"] = True
+        metadata[BLOB_METADATA_KEY] = refs
+        output["data"] = data
+        output["metadata"] = metadata
+        result.append(nbformat.from_dict(output))
+    return result
+
+
+def hydrate_outputs(
+    notebook_path: Union[str, Path], outputs: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Inverse of externalize_outputs: inline blob payloads again (in place)."""
+    store = None
+    for output in outputs:
+        metadata = output.get("metadata") or {}
+        refs = metadata.get(BLOB_METADATA_KEY)
+        if not refs:
+            continue
+        if store is None:
+            store = get_store(notebook_path)
+        data = output.setdefault("data", {})
+        for mime, ref in refs.items():
+            try:
+                data[mime] = _decode(store.get(ref), ref.get("encoding", "text"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"[BLOBS] Cannot hydrate {ref.get('path')}: {e}")
+                continue
+            if ref.get("placeholder"):
+                data.pop("text/plain", None)
+        metadata.pop(BLOB_METADATA_KEY, None)
+    return outputs
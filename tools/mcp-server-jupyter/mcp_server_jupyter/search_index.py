@@ -0,0 +1,383 @@
+"""
+Workspace Search Index
+======================
+
+SQLite FTS5 index over cell sources for search_workspace.
+
+Agents search the same project repeatedly ("where is df_clean defined?").
+Re-reading and line-scanning every notebook per query does not scale to a
+workspace with thousands of cells.
+
+Design:
+1. One FTS5 table with the trigram tokenizer (case-sensitive), so substring
+   queries of 3+ characters are answered from the index via GLOB. Shorter
+   queries fall back to a scan of the indexed sources, still without
+   touching the notebooks.
+2. Each notebook's (st_mtime_ns, st_size) is stored alongside its rows.
+   A lookup first re-stats the workspace (throttled to RESCAN_INTERVAL) and
+   reindexes only notebooks whose signature changed.
+3. _atomic_write_notebook calls notify_write() so our own edits are indexed
+   from the in-memory document without a reparse. This is a no-op until the
+   index has been opened in this process.
+4. Regex queries are compiled once. When the pattern contains a required
+   literal of 3+ characters it is used as an index prefilter.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import nbformat
+
+logger = logging.getLogger(__name__)
+
+RESCAN_INTERVAL = 5.0
+_SKIP_DIRS = {"node_modules", "__pycache__", "venv", "site-packages"}
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def _glob_escape(text: str) -> str:
+    return "".join(f"[{c}]" if c in "*?[" else c for c in text)
+
+
+def _escape_length(pattern: str, i: int) -> int:
+    """Length of the escape sequence starting with the backslash at pattern[i]."""
+    nxt = pattern[i + 1]
+    width = {"x": 2, "u": 4, "U": 8}.get(nxt)
+    if width is not None:
+        return 2 + width
+    if nxt == "N" and pattern[i + 2 : i + 3] == "{":
+        close = pattern.find("}", i + 3)
+        return len(pattern) - i if close < 0 else close + 1 - i
+    if nxt.isdigit():
+        # Octal escape (up to 3 digits) or backreference (up to 2)
+        end = i + 2
+        while end < min(i + 4, len(pattern)) and pattern[end].isdigit():
+            end += 1
+        return end - i
+    return 2
+
+
+def _class_end(pattern: str, i: int) -> int:
+    """Index of the `]` closing the character class opened at pattern[i]."""
+    j = i + 1
+    if j < len(pattern) and pattern[j] == "^":
+        j += 1
+    # A `]` right after `[` or `[^` is a literal member
+    if j < len(pattern) and pattern[j] == "]":
+        j += 1
+    while j < len(pattern):
+        if pattern[j] == "\\":
+            j += 2
+            continue
+        if pattern[j] == "]":
+            return j
+        j += 1
+    return len(pattern)
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """
+    Longest literal every match of `pattern` must contain, or None.
+
+    Deliberately conservative: alternation and inline flags disable the
+    prefilter, and group or character-class contents are never used.
+    """
+    if "|" in pattern or "(?" in pattern:
+        return None
+
+    best, current = "", ""
+
+    def cut(keep: Optional[str] = None):
+        nonlocal best, current
+        candidate = current if keep is None else keep
+        if len(candidate) > len(best):
+            best = candidate
+        current = ""
+
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if nxt.isalnum():
+                # \d, \w, \b ... are classes/anchors; \x41, \101, \N{...} and
+                # backreferences are not taken apart either
+                cut()
+                i += _escape_length(pattern, i)
+            else:
+                current += nxt
+                i += 2
+            continue
+        if c in "?*{":
+            # Quantifier: the previous char is optional
+            cut(current[:-1])
+            if c == "{":
+                close = pattern.find("}", i)
+                i = len(pattern) if close < 0 else close
+        elif c == "[":
+            cut()
+            i = _class_end(pattern, i)
+        elif c == "(":
+            # Skip the whole group: it may be optional or repeated
+            cut()
+            depth = 0
+            while i < len(pattern):
+                if pattern[i] == "\\":
+                    i += 1
+                elif pattern[i] == "[":
+                    # Parentheses inside a class do not nest
+                    i = _class_end(pattern, i)
+                elif pattern[i] == "(":
+                    depth += 1
+                elif pattern[i] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+        elif c in _REGEX_META:
+            cut()
+        else:
+            current += c
+        i += 1
+
+    cut()
+    return best if len(best) >= 3 else None
+
+
+class WorkspaceSearchIndex:
+    """FTS5-backed index of notebook cell sources, keyed by absolute path."""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_scan: Dict[str, float] = {}
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_notebooks (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS cell_sources USING fts5(
+                    path UNINDEXED,
+                    cell_index UNINDEXED,
+                    cell_id UNINDEXED,
+                    source,
+                    tokenize = 'trigram case_sensitive 1'
+                )
+                """
+            )
+            conn.commit()
+
+    # --- Maintenance ---
+
+    def index_notebook(
+        self, path: Union[str, Path], nb: Optional[nbformat.NotebookNode] = None
+    ) -> int:
+        """
+        (Re)index one notebook. Uses `nb` when given, else a skeleton read.
+
+        Returns:
+            Number of cells indexed
+        """
+        from mcp_server_jupyter.notebook_stream import skeleton_cache
+
+        key = str(Path(path).resolve())
+        st = os.stat(key)
+        if nb is None:
+            nb = skeleton_cache.get(key)
+
+        rows = [
+            (key, i, cell.get("id") or "", cell.get("source", ""))
+            for i, cell in enumerate(nb.cells)
+        ]
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM cell_sources WHERE path = ?", (key,))
+            conn.executemany(
+                "INSERT INTO cell_sources (path, cell_index, cell_id, source) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_notebooks (path, mtime_ns, size) "
+                "VALUES (?, ?, ?)",
+                (key, st.st_mtime_ns, st.st_size),
+            )
+            conn.commit()
+        return len(rows)
+
+    def remove_notebook(self, path: Union[str, Path]) -> None:
+        key = str(Path(path).resolve())
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM cell_sources WHERE path = ?", (key,))
+            conn.execute("DELETE FROM indexed_notebooks WHERE path = ?", (key,))
+            conn.commit()
+
+    def is_indexed(self, path: Union[str, Path]) -> bool:
+        key = str(Path(path).resolve())
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM indexed_notebooks WHERE path = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def refresh(self, root: Union[str, Path], force: bool = False) -> int:
+        """
+        Bring the index for everything under `root` up to date.
+
+        Only notebooks whose (mtime, size) changed are reindexed; vanished
+        ones are dropped. Throttled to once per RESCAN_INTERVAL per root.
+
+        Returns:
+            Number of notebooks reindexed
+        """
+        root_key = str(Path(root).resolve())
+        now = time.monotonic()
+        last = self._last_scan.get(root_key)
+        if not force and last is not None and now - last < RESCAN_INTERVAL:
+            return 0
+
+        on_disk: Dict[str, Tuple[int, int]] = {}
+        for dirpath, dirnames, filenames in os.walk(root_key):
+            dirnames[:] = [
+                d for d in dirnames if not d.startswith(".") and d not in _SKIP_DIRS
+            ]
+            for name in filenames:
+                if name.endswith(".ipynb") and not name.startswith("."):
+                    full = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    on_disk[full] = (st.st_mtime_ns, st.st_size)
+
+        prefix = root_key.rstrip(os.sep) + os.sep
+        with self._connect() as conn:
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in conn.execute(
+                    "SELECT path, mtime_ns, size FROM indexed_notebooks "
+                    "WHERE substr(path, 1, ?) = ?",
+                    (len(prefix), prefix),
+                )
+            }
+
+        reindexed = 0
+        for path, signature in on_disk.items():
+            if known.get(path) != signature:
+                try:
+                    self.index_notebook(path)
+                    reindexed += 1
+                except Exception as e:
+                    logger.warning(f"[SEARCH INDEX] Skipping {path}: {e}")
+        for path in known.keys() - on_disk.keys():
+            self.remove_notebook(path)
+
+        self._last_scan[root_key] = now
+        return reindexed
+
+    # --- Queries ---
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        limit: int = 50,
+        root: Optional[Union[str, Path]] = None,
+    ) -> List[Dict]:
+        """
+        Find matching source lines across indexed notebooks.
+
+        Returns:
+            Up to `limit` dicts: path, cell_index, cell_id, line, text
+
+        Raises:
+            re.error: If regex=True and the pattern is invalid
+        """
+        pattern = re.compile(query) if regex else None
+        literal = _required_literal(query) if regex else query
+
+        sql = "SELECT path, cell_index, cell_id, source FROM cell_sources"
+        clauses, params = [], []
+        if literal and len(literal) >= 3:
+            clauses.append("source GLOB ?")
+            params.append(f"*{_glob_escape(literal)}*")
+        if root is not None:
+            prefix = str(Path(root).resolve()).rstrip(os.sep) + os.sep
+            clauses.append("substr(path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY path, cell_index"
+
+        matches: List[Dict] = []
+        with self._connect() as conn:
+            for path, cell_index, cell_id, source in conn.execute(sql, params):
+                for line_idx, line in enumerate(source.split("\n")):
+                    found = pattern.search(line) if pattern else query in line
+                    if found:
+                        matches.append(
+                            {
+                                "path": path,
+                                "cell_index": cell_index,
+                                "cell_id": cell_id,
+                                "line": line_idx + 1,
+                                "text": line.strip(),
+                            }
+                        )
+                        if len(matches) >= limit:
+                            return matches
+        return matches
+
+
+_index: Optional[WorkspaceSearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> WorkspaceSearchIndex:
+    """Open (once per process) the index in the server data directory."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from mcp_server_jupyter.config import load_and_validate_settings
+
+            data_dir = load_and_validate_settings().get_data_dir()
+            _index = WorkspaceSearchIndex(data_dir / "workspace_index.db")
+        return _index
+
+
+def notify_write(path: Union[str, Path], nb: nbformat.NotebookNode) -> None:
+    """
+    Reindex a notebook we just wrote, if it is already tracked.
+
+    Called from _atomic_write_notebook. Cheap no-op until search_workspace
+    has opened the index; untracked notebooks are picked up by the next
+    refresh() of their workspace.
+    """
+    index = _index
+    if index is None:
+        return
+    try:
+        if index.is_indexed(path):
+            index.index_notebook(path, nb)
+    except Exception as e:
+        logger.warning(f"[SEARCH INDEX] Failed to update {path}: {e}")
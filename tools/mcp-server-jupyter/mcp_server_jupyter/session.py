@@ -8,13 +8,21 @@ import nbformat
 import datetime
 
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 from jupyter_client.manager import AsyncKernelManager
 from mcp_server_jupyter import notebook, utils
 from mcp_server_jupyter.observability import get_logger, get_tracer
 from mcp_server_jupyter.kernel_startup import get_startup_code
 from mcp_server_jupyter.kernel_lifecycle import KernelLifecycle
 from mcp_server_jupyter.io_multiplexer import IOMultiplexer
+from mcp_server_jupyter.execution_scheduler import (
+    LANE_INTERACTIVE,
+    LANE_INTROSPECTION,
+    ExecutionScheduler,
+    create_execution_queue,
+)
+from mcp_server_jupyter.kernel_poller import KernelChannelPoller
+from mcp_server_jupyter.write_behind import create_write_behind
 
 # Configure logging
 logger = get_logger()
@@ -50,6 +58,23 @@ def _get_kernel_process(km):
     return None
 
 
+def _outputs_text(outputs) -> str:
+    """Plain text of an execution's outputs (streams, text/plain, errors)."""
+    parts = []
+    for out in outputs:
+        output_type = out.get("output_type")
+        if output_type == "stream":
+            text = out.get("text", "")
+        elif output_type in ("execute_result", "display_data"):
+            text = out.get("data", {}).get("text/plain", "")
+        elif output_type == "error":
+            text = f"{out.get('ename')}: {out.get('evalue')}\n"
+        else:
+            continue
+        parts.append("".join(text) if isinstance(text, list) else text)
+    return "".join(parts)
+
+
 class SessionManager:
     def __init__(
         self, default_execution_timeout: int = 300, input_request_timeout: int = 60
@@ -83,6 +108,17 @@ class SessionManager:
             max_concurrent=self.max_concurrent_kernels
         )
         self.io_multiplexer = IOMultiplexer(input_request_timeout=input_request_timeout)
+        self.execution_scheduler = ExecutionScheduler(
+            default_timeout=default_execution_timeout,
+            io_multiplexer=self.io_multiplexer,
+        )
+        # One reader task for every kernel's IOPub + stdin sockets
+        self.kernel_poller = KernelChannelPoller()
+        # One health check task for every kernel
+        self._health_check_task = None
+
+        # Coalesces per-cell result writes (one rewrite per burst, not per cell)
+        self.write_behind = create_write_behind()
 
         # [PHASE 2.3] Asset cleanup task - deferred to avoid "no running event loop" error
         # [IIRB OPS FIX P1] "Infinite Disk" - continuous asset pruning
@@ -146,69 +182,79 @@ class SessionManager:
         # Asset cleanup is now triggered explicitly by the client via asset_tools.py
         pass
 
-    async def _health_check_loop(self, nb_path: str):
+    async def _health_check_loop(self, check_interval: float = 30):
         """
         [FIX #4] Background health check to detect and recover from frozen kernels.
 
+        One task checks every running kernel each interval (instead of one task
+        per kernel), so the task count stays flat as kernels are added.
+        """
+        try:
+            while self.sessions:
+                await asyncio.sleep(check_interval)
+                for nb_path in list(self.sessions):
+                    try:
+                        await self._check_kernel_health(nb_path)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"[HEALTH CHECK] Unhandled error for {nb_path}: {e}")
+        except asyncio.CancelledError:
+            logger.info("[HEALTH CHECK] Task cancelled")
+        finally:
+            self._health_check_task = None
+
+    def _ensure_health_check(self):
+        if self._health_check_task is None or self._health_check_task.done():
+            self._health_check_task = asyncio.create_task(self._health_check_loop())
+
+    async def _check_kernel_health(self, nb_path: str):
+        """
         Monitors kernel responsiveness via heartbeat channel. If kernel hangs
         (e.g., infinite C-extension loop), this will detect it and restart.
         """
-        check_interval = 30  # Check every 30 seconds
-        await asyncio.sleep(check_interval)  # Initial delay
+        session = self.sessions.get(nb_path)
+        if not session or session.get("health_check_disabled"):
+            return
 
-        while True:
-            try:
-                session = self.sessions.get(nb_path)
-                if not session:
-                    # Session was stopped
-                    break
+        kc = session.get("kc")
+        if not kc:
+            return
 
-                kc = session.get("kc")
-                if not kc:
-                    break
+        # Check if kernel is alive via heartbeat
+        try:
+            is_alive = kc.is_alive()
+            if hasattr(is_alive, '__await__') or hasattr(is_alive, '__iter__'):
+                is_alive = await is_alive
+        except Exception:
+            is_alive = False
 
-                # Check if kernel is alive via heartbeat
-                try:
-                    is_alive = kc.is_alive()
-                    if hasattr(is_alive, '__await__') or hasattr(is_alive, '__iter__'):
-                        is_alive = await is_alive
-                except Exception:
-                    is_alive = False
-
-                if not is_alive:
-                    logger.error(
-                        f"[HEALTH CHECK] Kernel {nb_path} died. Attempting restart..."
-                    )
-                    try:
-                        await self.restart_kernel(nb_path)
-                    except Exception as e:
-                        logger.error(f"[HEALTH CHECK] Failed to restart kernel: {e}")
-                        break
+        if not is_alive:
+            logger.error(
+                f"[HEALTH CHECK] Kernel {nb_path} died. Attempting restart..."
+            )
+            try:
+                await self.restart_kernel(nb_path)
+            except Exception as e:
+                logger.error(f"[HEALTH CHECK] Failed to restart kernel: {e}")
+                # Stop checking this kernel, as the per-kernel loop used to
+                session["health_check_disabled"] = True
+        else:
+            # Optional: Send lightweight info request for deeper check
+            try:
+                info_call = kc.kernel_info()
+                # Handle both sync and async kernel_info implementations
+                if hasattr(info_call, "__await__") or hasattr(info_call, "__iter__"):
+                    await asyncio.wait_for(info_call, timeout=5.0)
                 else:
-                    # Optional: Send lightweight info request for deeper check
-                    try:
-                        info_call = kc.kernel_info()
-                        # Handle both sync and async kernel_info implementations
-                        if hasattr(info_call, "__await__") or hasattr(info_call, "__iter__"):
-                            await asyncio.wait_for(info_call, timeout=5.0)
-                        else:
-                            # Synchronous implementation - call directly (fast path)
-                            _ = info_call
-                    except asyncio.TimeoutError:
-                        logger.warning(
-                            f"[HEALTH CHECK] Kernel {nb_path} unresponsive to info request"
-                        )
-                    except Exception as e:
-                        logger.warning(f"[HEALTH CHECK] Error checking kernel: {e}")
-
-                await asyncio.sleep(check_interval)
-
-            except asyncio.CancelledError:
-                logger.info(f"[HEALTH CHECK] Task cancelled for {nb_path}")
-                break
+                    # Synchronous implementation - call directly (fast path)
+                    _ = info_call
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"[HEALTH CHECK] Kernel {nb_path} unresponsive to info request"
+                )
             except Exception as e:
-                logger.error(f"[HEALTH CHECK] Unhandled error: {e}")
-                await asyncio.sleep(check_interval)
+                logger.warning(f"[HEALTH CHECK] Error checking kernel: {e}")
 
     def get_python_path(self, venv_path: Optional[str]) -> str:
         """Cross-platform venv resolver"""
@@ -563,7 +609,10 @@ class SessionManager:
             "cwd": kernel_info.get("notebook_dir", str(notebook_dir)),
             "listener_task": None,
             "exec_lock": asyncio.Lock(),
+            # Scheduled executions by kernel msg_id, kept current from IOPub
+            "executions": {},
             "execution_timeout": execution_timeout,
+            "venv_path": venv_path,
             "start_time": time.time(),
             "env_info": {
                 "python_path": py_exe,
@@ -572,22 +621,25 @@ class SessionManager:
             },
         }
 
-        # Start the background listener
-        session_data["listener_task"] = asyncio.create_task(
-            self._kernel_listener(abs_path, kc)
-        )
-
-        # Start the stdin listener (Handles input() requests)
-        session_data["stdin_listener_task"] = asyncio.create_task(
-            self._stdin_listener(abs_path, session_data)
-        )
+        if self.kernel_poller.supports(kc):
+            # IOPub and stdin (input() requests) are read by the shared poller
+            self._register_kernel_channels(abs_path, kc, session_data)
+        else:
+            # Start the background listener
+            session_data["listener_task"] = asyncio.create_task(
+                self._kernel_listener(abs_path, kc)
+            )
 
-        # [FIX #4] Start health check loop for this kernel
-        session_data["health_check_task"] = asyncio.create_task(
-            self._health_check_loop(abs_path)
-        )
+            # Start the stdin listener (Handles input() requests)
+            session_data["stdin_listener_task"] = asyncio.create_task(
+                self._stdin_listener(abs_path, session_data)
+            )
 
         self.sessions[abs_path] = session_data
+        self._start_execution_queue(abs_path, session_data)
+
+        # [FIX #4] Shared health check loop covers this kernel too
+        self._ensure_health_check()
 
         # Safely get PID and connection file
         pid = "unknown"
@@ -604,6 +656,109 @@ class SessionManager:
 
         return f"Kernel started (PID: {pid}). CWD set to: {notebook_dir}"
 
+    def _start_execution_queue(self, nb_path: str, session_data: Dict):
+        """
+        Give a session its lane queue and the task that feeds the kernel.
+
+        Queued work reaches the kernel one execution at a time, so a probe
+        in the introspection lane waits for the running cell only, not for
+        every batch cell queued behind it.
+        """
+        session_data.setdefault("executions", {})
+        session_data.setdefault("queued_executions", {})
+        session_data.setdefault("executed_indices", set())
+        session_data["execution_queue"] = create_execution_queue()
+
+        async def dispatch(item):
+            msg_id = await self.execute_cell_async(
+                item.get("notebook_path", nb_path),
+                item["cell_index"],
+                item["code"],
+                exec_id=item["exec_id"],
+            )
+            if not msg_id:
+                raise RuntimeError(f"Kernel did not accept execution {item['exec_id']}")
+            return msg_id
+
+        session_data["queue_task"] = asyncio.create_task(
+            self.execution_scheduler.process_queue(
+                nb_path,
+                session_data,
+                None,
+                dispatch_callback=dispatch,
+                # Results go to the write-behind buffer, flushed when idle
+                finalize_callback=self._finalize_execution_async,
+                drain_callback=self.write_behind.flush,
+            )
+        )
+
+    async def enqueue_execution(
+        self,
+        nb_path: str,
+        cell_index: int,
+        code: str,
+        lane: str = LANE_INTERACTIVE,
+        exec_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Queue code for the kernel in a lane (see execution_scheduler.LANES).
+
+        Returns:
+            exec_id (str): Reported in notebook/cell_execution_started with
+                the kernel msg_id once the execution is dispatched
+            None: If kernel is not running
+
+        Raises:
+            RuntimeError: If the execution queue is full
+        """
+        abs_path = str(Path(nb_path).resolve())
+        session = self.sessions.get(abs_path)
+        if session is None:
+            return None
+        queue = session.get("execution_queue")
+        if queue is None or session.get("queue_task") is None:
+            # Sessions without a queue worker execute directly
+            return await self.execute_cell_async(nb_path, cell_index, code, exec_id)
+
+        exec_id = exec_id or str(uuid.uuid4())
+        item = {
+            "notebook_path": nb_path,
+            "cell_index": cell_index,
+            "code": code,
+            "exec_id": exec_id,
+            "lane": lane,
+        }
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            raise RuntimeError(f"Execution queue for {nb_path} is full")
+        session["queued_executions"][exec_id] = item
+        return exec_id
+
+    def _register_kernel_channels(self, nb_path: str, kc, session_data: Dict):
+        """Hand a kernel's IOPub and stdin channels to the shared poller."""
+
+        async def on_iopub(msgs):
+            await self.io_multiplexer.forward_iopub_batch(
+                nb_path,
+                msgs,
+                notification_callback=self._send_notification,
+                executions=session_data["executions"],
+            )
+
+        async def on_stdin(msgs):
+            await self.io_multiplexer.dispatch_stdin_batch(
+                nb_path,
+                kc,
+                msgs,
+                session_data,
+                notification_callback=self._send_notification,
+                interrupt_callback=self.interrupt_kernel,
+            )
+
+        self.kernel_poller.register(nb_path, kc, on_iopub, on_stdin)
+        session_data["poller_key"] = nb_path
+
     async def _kernel_listener(self, nb_path: str, kc):
         """
         Background loop that drains the IOPub channel for a specific kernel.
@@ -616,6 +771,7 @@ class SessionManager:
             nb_path=nb_path,
             kc=kc,
             notification_callback=self._send_notification,
+            executions=session_data.get("executions"),
         )
 
     async def _broadcast_output(self, message: Dict):
@@ -657,7 +813,7 @@ class SessionManager:
         kc = session.get("kc")
         # If we don't have a kernel client (test mode or transient), just clear the flag
         if kc is None:
-            session["waiting_for_input"] = False
+            self._input_provided(session)
             logger.info(
                 f"No kernel client for {notebook_path}; cleared waiting_for_input flag"
             )
@@ -668,14 +824,31 @@ class SessionManager:
             logger.info(f"Sent input to {notebook_path}")
         finally:
             # Signal to any pending watchdog that input was provided
-            session["waiting_for_input"] = False
+            self._input_provided(session)
+
+    @staticmethod
+    def _input_provided(session: Dict):
+        """Clear waiting_for_input and wake the stdin watchdog waiting on it."""
+        session["waiting_for_input"] = False
+        input_event = session.get("input_event")
+        if input_event is not None:
+            input_event.set()
 
     async def execute_cell_async(
-        self, nb_path: str, cell_index: int, code: str, exec_id: Optional[str] = None
+        self,
+        nb_path: str,
+        cell_index: int,
+        code: str,
+        exec_id: Optional[str] = None,
+        on_sent: Optional[Callable[[str], None]] = None,
     ) -> Optional[str]:
         """
         Directly executes code and forwards ZMQ messages as MCP notifications.
 
+        on_sent(msg_id), if given, is called right after the request is sent
+        and before anything awaits, so an execution registered there cannot
+        miss its first IOPub messages.
+
         Returns:
             exec_id (str): Unique execution identifier
             None: If kernel is not running
@@ -711,6 +884,9 @@ class SessionManager:
             )
             return None
 
+        if on_sent is not None:
+            on_sent(msg_id)
+
         # Send MCP notification that execution started
         await self._send_notification(
             "notebook/cell_execution_started",
@@ -809,60 +985,136 @@ print(_inspect_var())
 """
         return await self._run_and_wait_internal(nb_path, code)
 
+    def _find_execution(self, session: Dict, exec_id: str):
+        """
+        Locate an execution by the id enqueue_execution returned.
+
+        Returns ("queued", item), ("record", ExecutionRecord) for a running
+        or recently finished execution, or (None, None).
+        """
+        queued = session.get("queued_executions") or {}
+        if exec_id in queued:
+            return "queued", queued[exec_id]
+        for msg_id, record in list((session.get("executions") or {}).items()):
+            if record.get("id") == exec_id or msg_id == exec_id:
+                return "record", record
+        record = (session.get("finished_executions") or {}).get(exec_id)
+        if record is not None:
+            return "record", record
+        return None, None
+
     def get_execution_status(self, nb_path: str, exec_id: str):
         """Get the status of an execution by its ID.
 
-        Since executions are now immediate and messages are forwarded directly,
-        we don't track execution status. The notebook file on disk contains the history.
+        Returns a dict with 'status' (queued/running/completed/error, or
+        unknown once the id has left the finished-execution history), the
+        outputs so far as 'outputs' and their text as 'output', and 'error'.
+        Timed-out and cancelled executions are reported as errors.
         """
         abs_path = str(Path(nb_path).resolve())
-        if abs_path not in self.sessions:
+        session = self.sessions.get(abs_path)
+        if session is None:
             return {"status": "error", "message": "Kernel not found"}
 
-        # Executions are immediate - no status tracking
-        return {"status": "completed", "message": "Execution completed (messages forwarded via notifications)"}
+        kind, entry = self._find_execution(session, exec_id)
+        if kind is None:
+            return {
+                "status": "unknown",
+                "message": f"No queued, running or recent execution {exec_id}",
+            }
+        if kind == "queued":
+            return {
+                "status": "queued",
+                "cell_index": entry.get("cell_index"),
+                "lane": entry.get("lane"),
+                "outputs": [],
+                "output": "",
+            }
+
+        outputs = list(entry.get("outputs") or [])
+        status = entry.get("status")
+        error = entry.get("error")
+        if status not in ("queued", "running", "completed"):
+            status = "error"
+        if status == "error" and not error:
+            error = next(
+                (
+                    f"{out.get('ename')}: {out.get('evalue')}"
+                    for out in outputs
+                    if out.get("output_type") == "error"
+                ),
+                "Execution failed",
+            )
+        return {
+            "status": status,
+            "cell_index": entry.get("cell_index"),
+            "execution_count": entry.get("execution_count"),
+            "outputs": outputs,
+            "output": _outputs_text(outputs),
+            "error": error,
+        }
 
     def is_kernel_busy(self, nb_path: str) -> bool:
         """
-        Check if the kernel is currently busy executing code.
-
-        Since executions are now immediate, we check if the kernel client reports busy.
+        Check if the kernel has queued work or an execution still running.
         """
         abs_path = str(Path(nb_path).resolve())
-        if abs_path not in self.sessions:
+        session = self.sessions.get(abs_path)
+        if session is None:
             return False
-
-        session = self.sessions[abs_path]
-        kc = session.get("kc")
-        if kc is not None and hasattr(kc, "is_alive"):
-            try:
-                import inspect
-                if inspect.iscoroutinefunction(getattr(kc, "is_alive")):
-                    # For async is_alive, assume not busy (can't call sync)
-                    return False
-                else:
-                    return kc.is_alive()
-            except Exception:
-                pass
-
-        return False
+        if session.get("queued_executions"):
+            return True
+        return any(
+            record.get("status") == "running"
+            for record in list((session.get("executions") or {}).values())
+        )
 
     async def _run_and_wait_internal(self, nb_path: str, code: str):
-        """Internal helper to run code via the async system.
+        """Internal helper: run a probe and return its sanitized outputs.
 
-        Since executions are immediate, we just execute and return success.
+        The probe goes ahead of queued cells (introspection lane), but still
+        waits for the cell that is running.
         """
         abs_path = str(Path(nb_path).resolve())
-        if abs_path not in self.sessions:
+        session = self.sessions.get(abs_path)
+        if session is None:
             return "Error: No kernel."
 
-        # Execute the code directly
-        exec_id = await self.execute_cell_async(nb_path, -1, code)
+        exec_id = await self.enqueue_execution(
+            nb_path, -1, code, lane=LANE_INTROSPECTION
+        )
         if not exec_id:
             return "Error starting internal execution."
 
-        # Since messages are forwarded immediately, we don't need to wait
-        return "Code executed (messages forwarded via notifications)"
+        timeout = session.get("execution_timeout", self.default_execution_timeout)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            kind, entry = self._find_execution(session, exec_id)
+            if kind == "record":
+                break
+            if kind is None:
+                # Dropped from the queue (stop_on_error) or never dispatched
+                return "Error: Internal execution did not start."
+            if loop.time() >= deadline:
+                return f"Error: Internal execution still queued after {timeout}s."
+            await asyncio.sleep(0.05)
+
+        try:
+            await asyncio.wait_for(
+                entry["completion_event"].wait(),
+                timeout=max(0.0, deadline - loop.time()),
+            )
+        except asyncio.TimeoutError:
+            return f"Error: Internal execution timed out after {timeout}s."
+
+        status = self.get_execution_status(nb_path, exec_id)
+        if status["status"] == "error" and not status["outputs"]:
+            return f"Error: {status['error']}"
+        asset_dir = str(Path(abs_path).parent / "assets")
+        return await asyncio.to_thread(
+            utils.sanitize_outputs, status["outputs"], asset_dir
+        )
 
     async def run_simple_code(self, nb_path: str, code: str):
         return await self._run_and_wait_internal(nb_path, code)
@@ -880,6 +1132,10 @@ print(_inspect_var())
 
         session = self.sessions[abs_path]
 
+        # Forced flush: buffered results must hit disk before the kernel goes
+        # away (and before asset pruning reads the notebook for references)
+        await self.write_behind.flush(abs_path)
+
         # [FIX #8] Session-scoped asset cleanup (GDPR compliance)
         if cleanup_assets:
             try:
@@ -920,11 +1176,21 @@ print(_inspect_var())
                 logger.info(
                     f"[ASSET CLEANUP] Prune result: {cleanup_result.get('message', 'completed')}"
                 )
+
+                # Output blobs are reference counted, not session scoped
+                from mcp_server_jupyter import output_store
+
+                if output_store.is_enabled():
+                    gc_result = output_store.get_store(abs_path).collect_garbage()
+                    logger.info(
+                        f"[ASSET CLEANUP] Collected {len(gc_result['deleted'])} unreferenced output blobs"
+                    )
             except Exception as e:
                 logger.warning(f"[ASSET CLEANUP] Failed: {e}")
 
         # Cancel all background tasks
         tasks_to_cancel = [
+            ("queue_task", False),
             ("listener_task", False),
             ("stdin_listener_task", False),
             ("health_check_task", False),
@@ -938,6 +1204,10 @@ print(_inspect_var())
                 except asyncio.CancelledError:
                     pass
 
+        # Stop reading the channels before their sockets are closed
+        if session.get("poller_key"):
+            self.kernel_poller.unregister(session["poller_key"])
+
         # Stop client channels
         session["kc"].stop_channels()
 
@@ -948,6 +1218,32 @@ print(_inspect_var())
         del self.sessions[abs_path]
 
         return "Kernel shutdown."
+
+    async def _finalize_execution_async(self, nb_path: str, exec_data: Dict):
+        """
+        Persist a finished execution's outputs to the notebook file.
+
+        Skipped while a client is connected: the editor buffer is the source of
+        truth then and a disk write would conflict with it. Otherwise the
+        result goes through the write-behind buffer, which coalesces writes.
+        """
+        if self.connection_manager and getattr(
+            self.connection_manager, "active_connections", None
+        ):
+            logger.debug(f"Client connected, skipping disk write for {nb_path}")
+            return
+
+        cell_index = exec_data.get("cell_index")
+        if cell_index is None or cell_index < 0:
+            return
+
+        await self.write_behind.save(
+            nb_path,
+            cell_index,
+            exec_data.get("outputs", []),
+            exec_data.get("execution_count"),
+        )
+
     async def cancel_execution(self, nb_path: str, exec_id: Optional[str] = None):
         """
         Cancel current execution by interrupting the kernel.
@@ -971,9 +1267,14 @@ print(_inspect_var())
 
     async def shutdown_all(self):
         """Kills all running kernels and cleans up persisted session files."""
+        await self.write_behind.flush_all()
+        await self.kernel_poller.close()
+        if self._health_check_task:
+            self._health_check_task.cancel()
         for abs_path, session in list(self.sessions.items()):
-            if session.get("listener_task"):
-                session["listener_task"].cancel()
+            for task_name in ("queue_task", "listener_task"):
+                if session.get(task_name):
+                    session[task_name].cancel()
             try:
                 await session["km"].shutdown_kernel(now=True)
                 # Session cleanup handled by clearing sessions dict
@@ -1016,7 +1317,9 @@ print(_inspect_var())
             # Best-effort: try to inject the invalidation code; if the session isn't fully
             # initialized (e.g., during unit tests), catch and log the error but still report success.
             try:
-                await self.execute_cell_async(nb_path, -1, invalidation_code)
+                await self.enqueue_execution(
+                    nb_path, -1, invalidation_code, lane=LANE_INTROSPECTION
+                )
             except Exception as e:
                 logger.info(f"Cache invalidation (best-effort) failed or skipped: {e}")
 
@@ -1070,6 +1373,12 @@ print(_inspect_var())
 
         # Clear session state
         session = self.sessions[abs_path]
+        queue = session.get("execution_queue")
+        if hasattr(queue, "drain"):
+            queue.drain()
+        # The running execution will never see its idle message; release it
+        for exec_data in list(session["executions"].values()):
+            exec_data["status"] = "cancelled"
         session["executions"].clear()
         session["queued_executions"].clear()
         session["executed_indices"].clear()
@@ -1205,19 +1514,25 @@ def _finalize_execution(self, nb_path: str, exec_data: Dict):
     If an event loop is present on this thread, the async finalizer is executed in a
     background thread using asyncio.run to prevent interfering with the running loop.
     Otherwise, it is executed inline with asyncio.run.
+
+    Callers of the synchronous path expect the result on disk when this returns,
+    so the write-behind buffer is flushed before the temporary loop exits.
     """
+
+    async def _finalize_and_flush():
+        await self._finalize_execution_async(nb_path, exec_data)
+        await self.write_behind.flush(nb_path)
+
     try:
         asyncio.get_running_loop()
         from concurrent.futures import ThreadPoolExecutor
 
         with ThreadPoolExecutor(max_workers=1) as ex:
-            fut = ex.submit(
-                asyncio.run, self._finalize_execution_async(nb_path, exec_data)
-            )
+            fut = ex.submit(asyncio.run, _finalize_and_flush())
             return fut.result()
     except RuntimeError:
         # No running loop — run synchronously
-        return asyncio.run(self._finalize_execution_async(nb_path, exec_data))
+        return asyncio.run(_finalize_and_flush())
 
 
 # Attach wrapper to class
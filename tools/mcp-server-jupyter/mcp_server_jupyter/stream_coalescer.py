@@ -0,0 +1,184 @@
+"""
+IOPub Stream Coalescer
+======================
+
+Merges consecutive `stream` chunks of one execution into a single output.
+
+Without it every IOPub stream message becomes its own nbformat output, its
+own WebSocket broadcast and its own MCP notification. A loop printing 100k
+lines produces 100k of each.
+
+Design:
+1. Pending text is kept per execution. A chunk with the same stream name is
+   appended; a chunk for the other stream (stdout vs stderr) flushes first,
+   so interleaving is preserved.
+2. A pending chunk is emitted when its window elapses (measured from its
+   first chunk, so latency is bounded), when it reaches `max_bytes`, or when
+   the execution produces any other output, clears, or goes idle.
+3. Each raw chunk carries a sequence number. The merged chunk reports the
+   first and last one, so clients can tell that nothing was skipped.
+4. Emits run under one lock, so a timer flush can't interleave with an
+   output emitted by the IOPub listener.
+5. window_seconds <= 0 disables coalescing (every chunk emitted as-is).
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from mcp_server_jupyter.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 0.05
+DEFAULT_MAX_BYTES = 64 * 1024
+
+# emit(name, text, seq_start, seq_end)
+StreamEmitter = Callable[[str, str, int, int], Awaitable[None]]
+
+
+class _PendingStream:
+    __slots__ = ("name", "parts", "size", "seq_start", "seq_end", "emit", "timer")
+
+    def __init__(self, name: str, seq: int, emit: StreamEmitter):
+        self.name = name
+        self.parts: List[str] = []
+        self.size = 0
+        self.seq_start = seq
+        self.seq_end = seq
+        self.emit = emit
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class StreamCoalescer:
+    """Per-execution buffer of stream text awaiting emission."""
+
+    def __init__(
+        self,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.window_seconds = window_seconds
+        self.max_bytes = max_bytes
+
+        # execution key -> pending chunk
+        self._pending: Dict[Any, _PendingStream] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._emit_lock: Optional[asyncio.Lock] = None
+
+        # Metrics
+        self.chunks_in = 0
+        self.chunks_out = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def _lock(self) -> asyncio.Lock:
+        # Created lazily so the coalescer can be built outside an event loop
+        if self._emit_lock is None:
+            self._emit_lock = asyncio.Lock()
+        return self._emit_lock
+
+    async def push(
+        self, key: Any, name: str, text: str, seq: int, emit: StreamEmitter
+    ) -> None:
+        """
+        Buffer one stream chunk.
+
+        Args:
+            key: Execution identity (chunks are only merged within one key)
+            name: Stream name (stdout/stderr)
+            text: Chunk text
+            seq: Sequence number of this chunk within the execution
+            emit: Coroutine called with the merged chunk when it is flushed
+        """
+        self.chunks_in += 1
+        if not self.enabled:
+            async with self._lock():
+                self.chunks_out += 1
+                await emit(name, text, seq, seq)
+            return
+
+        pending = self._pending.get(key)
+        if pending is not None and pending.name != name:
+            await self.flush(key)
+            pending = None
+
+        if pending is None:
+            pending = _PendingStream(name, seq, emit)
+            self._pending[key] = pending
+            loop = asyncio.get_running_loop()
+            pending.timer = loop.call_later(self.window_seconds, self._fire, key, pending)
+
+        pending.parts.append(text)
+        pending.size += len(text)
+        pending.seq_end = seq
+        pending.emit = emit
+
+        if pending.size >= self.max_bytes:
+            await self.flush(key)
+
+    def _fire(self, key: Any, pending: _PendingStream) -> None:
+        if self._pending.get(key) is not pending:
+            return
+        task = asyncio.get_running_loop().create_task(self.flush(key))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self, key: Any) -> None:
+        """Emit the pending chunk for an execution now, if there is one."""
+        async with self._lock():
+            await self._flush_locked(key)
+
+    async def _flush_locked(self, key: Any) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        self.chunks_out += 1
+        try:
+            await pending.emit(
+                pending.name, "".join(pending.parts), pending.seq_start, pending.seq_end
+            )
+        except Exception as e:
+            logger.warning(f"[STREAM-COALESCE] Failed to emit stream chunk: {e}")
+
+    async def emit_after(self, key: Any, emit: Callable[[], Awaitable[None]]) -> None:
+        """Flush the execution's pending chunk, then run `emit` in order after it."""
+        async with self._lock():
+            await self._flush_locked(key)
+            await emit()
+
+    async def flush_all(self) -> None:
+        """Emit every pending chunk (listener shutdown)."""
+        for key in list(self._pending):
+            await self.flush(key)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "pending_streams": len(self._pending),
+            "chunks_in": self.chunks_in,
+            "chunks_out": self.chunks_out,
+        }
+
+
+def create_stream_coalescer() -> StreamCoalescer:
+    """Build a coalescer from MCP_STREAM_COALESCE_* settings."""
+    return StreamCoalescer(
+        window_seconds=float(
+            os.getenv("MCP_STREAM_COALESCE_WINDOW_SECONDS")
+            or getattr(
+                settings, "MCP_STREAM_COALESCE_WINDOW_SECONDS", DEFAULT_WINDOW_SECONDS
+            )
+        ),
+        max_bytes=int(
+            os.getenv("MCP_STREAM_COALESCE_MAX_BYTES")
+            or getattr(settings, "MCP_STREAM_COALESCE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        ),
+    )
@@ -3,7 +3,7 @@ Cell Tools - Cell manipulation tools.
 
 Includes: append_cell, insert_cell, delete_cell, move_cell, copy_cell,
 merge_cells, split_cell, change_cell_type, read_cell_smart, search_notebook,
-edit_cell_by_id, delete_cell_by_id, insert_cell_by_id
+search_workspace, apply_notebook_edits, edit_cell_by_id, delete_cell_by_id, insert_cell_by_id
 """
 
 import json
@@ -63,6 +63,15 @@ def register_cell_tools(mcp, session_manager):
         """
         return notebook.search_notebook(notebook_path, query, regex)
 
+    @mcp.tool()
+    def search_workspace(query: str, regex: bool = False, limit: int = 50):
+        """
+        Search every notebook in the workspace at once (indexed, fast).
+        Use this instead of calling search_notebook on each file.
+        Returns: analysis/clean.ipynb Cell 3 (Line 4): df_clean = df.dropna()
+        """
+        return notebook.search_workspace(query, regex=regex, limit=int(limit))
+
     @mcp.tool()
     def move_cell(notebook_path: str, from_index: int, to_index: int):
         """Moves a cell from one position to another."""
@@ -93,6 +102,23 @@ def register_cell_tools(mcp, session_manager):
         """
         return notebook.change_cell_type(notebook_path, index, new_type)
 
+    @mcp.tool()
+    def apply_notebook_edits(notebook_path: str, ops: List[dict]):
+        """
+        Apply many cell edits with a single notebook write (all-or-nothing).
+        Prefer this over several insert/edit/delete calls on large notebooks.
+
+        ops: Ordered list. Later ops see the effect of earlier ones. Cells are
+        addressed by "index" or "cell_id". Examples:
+            {"op": "insert", "index": 2, "content": "x = 1", "cell_type": "code"}
+            {"op": "edit", "cell_id": "abc", "content": "y = 2"}
+            {"op": "delete", "index": -1}
+            {"op": "move", "from_index": 3, "to_index": 0}
+            {"op": "tag", "index": 1, "add": ["slow"], "remove": ["todo"]}
+            {"op": "metadata", "index": 1, "metadata": {"collapsed": true}}
+        """
+        return notebook.apply_notebook_edits(notebook_path, ops)
+
     @mcp.tool()
     def edit_cell_by_id(
         notebook_path: str,
@@ -5,6 +5,7 @@ Includes: install_package
 """
 
 import time
+from mcp_server_jupyter.execution_scheduler import LANE_INTROSPECTION
 from mcp_server_jupyter.utils import ToolResult
 from mcp_server_jupyter.validation import validated_tool
 from mcp_server_jupyter.models import InstallPackageArgs
@@ -53,23 +54,19 @@ def register_data_tools(mcp, session_manager):
         
         check_code = f"""
 import importlib.util
-import sys
 
 # Check if package is already installed
 try:
     spec = importlib.util.find_spec("{pkg_name}")
-    if spec is not None:
-        print("ALREADY_INSTALLED")
-        sys.exit(0)
 except (ImportError, ValueError, ModuleNotFoundError):
-    pass
-print("NOT_FOUND")
+    spec = None
+print("ALREADY_INSTALLED" if spec is not None else "NOT_FOUND")
 """
 
-        # Execute check using SessionManager's queue
+        # Execute check using SessionManager's queue (introspection lane)
         try:
-            check_exec_id = await session_manager.execute_cell_async(
-                notebook_path, -1, check_code
+            check_exec_id = await session_manager.enqueue_execution(
+                notebook_path, -1, check_code, lane=LANE_INTROSPECTION
             )
         except RuntimeError:
             # If queue is full, proceed to install (best effort)
@@ -90,7 +87,9 @@ print("NOT_FOUND")
                             error_msg=None,
                         ).to_json()
                     break
-            await asyncio.sleep(0.1)
+                if status.get("status") in ("error", "unknown"):
+                    break
+                await asyncio.sleep(0.1)
 
         # Install command using sys.executable (correct Python for kernel)
         install_code = f"""
@@ -110,7 +109,7 @@ print("RETURNCODE:", result.returncode)
 
         # Execute installation using SessionManager's queue (index -1 = internal tool)
         try:
-            exec_id = await session_manager.execute_cell_async(
+            exec_id = await session_manager.enqueue_execution(
                 notebook_path, -1, install_code
             )
         except RuntimeError as e:
@@ -6,9 +6,9 @@ check_kernel_resources, run_all_cells, cancel_execution, submit_input
 """
 
 import json
-import nbformat
 from typing import Optional
 from mcp_server_jupyter import notebook
+from mcp_server_jupyter.execution_scheduler import LANE_BATCH
 from mcp_server_jupyter.observability import get_logger
 from mcp_server_jupyter.validation import validated_tool
 from mcp_server_jupyter.models import (
@@ -90,7 +90,7 @@ def register_execution_tools(mcp, session_manager):
 
         # 2. Submit (with backpressure handling)
         try:
-            exec_id = await session_manager.execute_cell_async(
+            exec_id = await session_manager.enqueue_execution(
                 notebook_path, index, code, exec_id=task_id_override
             )
             if not exec_id:
@@ -112,7 +112,8 @@ def register_execution_tools(mcp, session_manager):
     def get_execution_status(notebook_path: str, task_id: str):
         """
         Checks the status of a background cell execution.
-        Returns: JSON with 'status' (running/completed/error) and 'output' (so far).
+        Returns: JSON with 'status' (queued/running/completed/error) and
+        'output' (so far).
         """
         status = session_manager.get_execution_status(notebook_path, task_id)
         return json.dumps(status, indent=2)
@@ -152,7 +153,7 @@ def register_execution_tools(mcp, session_manager):
                     active_count = sum(
                         1
                         for data in session["executions"].values()
-                        if data["status"] in ["busy", "queued"]
+                        if data["status"] == "running"
                     )
                     if active_count > 0:
                         result["reason"] = f"{active_count} executions running"
@@ -187,11 +188,18 @@ def register_execution_tools(mcp, session_manager):
 
     @mcp.tool()
     @validated_tool(RunAllCellsArgs)
-    async def run_all_cells(notebook_path: str, force: bool = False):
+    async def run_all_cells(
+        notebook_path: str, force: bool = False, fanout: bool = False
+    ):
         """
         Execute all code cells in the notebook sequentially.
         Returns: List of execution IDs for status tracking.
         Agent Use Case: Instead of 20 separate run_cell_async calls, use this single tool.
+
+        With fanout=True, independent branches of the cell dependency graph run
+        concurrently on replica kernels and their definitions are merged back
+        into this kernel. Waits for the run to finish and returns a report with
+        the plan and the wall-clock speedup over a sequential run.
         """
         session = session_manager.get_session(notebook_path)
         if not session:
@@ -199,12 +207,13 @@ def register_execution_tools(mcp, session_manager):
 
         # Read notebook
         try:
-            nb = nbformat.read(notebook_path, as_version=4)
+            nb = notebook._load_notebook(notebook_path)
         except Exception as e:
             return f"Error reading notebook: {e}"
 
         # Queue all code cells
         exec_ids = []
+        fanout_cells = []
         queue_full_count = 0
         skipped_count = 0
 
@@ -230,9 +239,14 @@ def register_execution_tools(mcp, session_manager):
                     logger.info(f"Skipping cell {idx} due to tag: {skip_reason}")
                     continue
 
+                if fanout:
+                    fanout_cells.append((idx, cell.source))
+                    continue
+
                 try:
-                    exec_id = await session_manager.execute_cell_async(
-                        notebook_path, idx, cell.source
+                    # One cell at a time, behind probes and interactive cells
+                    exec_id = await session_manager.enqueue_execution(
+                        notebook_path, idx, cell.source, lane=LANE_BATCH
                     )
                     if exec_id:
                         exec_ids.append({"cell_index": idx, "exec_id": exec_id})
@@ -245,6 +259,13 @@ def register_execution_tools(mcp, session_manager):
                         )
                     break
 
+        if fanout:
+            from mcp_server_jupyter.fanout import run_fanout
+
+            report = await run_fanout(session_manager, notebook_path, fanout_cells)
+            report["skipped_count"] = skipped_count
+            return json.dumps(report, indent=2)
+
         if queue_full_count > 0:
             return json.dumps(
                 {
@@ -104,6 +104,11 @@ def register_kernel_tools(mcp, session_manager):
                         if "execution_queue" in session
                         else 0
                     ),
+                    "queue_lanes": (
+                        session["execution_queue"].lane_sizes()
+                        if hasattr(session.get("execution_queue"), "lane_sizes")
+                        else None
+                    ),
                     "stop_on_error": session.get("stop_on_error", False),
                 }
             )
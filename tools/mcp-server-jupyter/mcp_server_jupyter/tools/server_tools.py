@@ -50,6 +50,8 @@ def register_server_tools(mcp, session_manager, connection_manager):
     @mcp.tool()
     def get_server_status():
         """Check how many humans are connected to this session."""
+        from mcp_server_jupyter.io_lanes import notebook_io_lanes
+
         return json.dumps(
             {
                 "active_connections": len(connection_manager.active_connections),
@@ -58,6 +60,8 @@ def register_server_tools(mcp, session_manager, connection_manager):
                     if len(connection_manager.active_connections) > 1
                     else "solo"
                 ),
+                # Per-notebook I/O queue depth and wait times
+                "notebook_io": notebook_io_lanes.stats(),
             }
         )
 
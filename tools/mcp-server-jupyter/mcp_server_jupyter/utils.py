@@ -10,6 +10,8 @@ from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import List, Any, Optional
 
+from mcp_server_jupyter import json_codec
+
 # Global thread pool for CPU-bound tasks (JSON serialization, Pydantic validation)
 # Size is configurable via Settings (pydantic-settings). Update via environment variable MCP_IO_POOL_SIZE.
 from mcp_server_jupyter.config import settings
@@ -191,7 +193,7 @@ def compress_traceback(traceback_lines: List[str]) -> List[str]:
 
 async def offload_json_dumps(data: Any) -> str:
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(io_pool, lambda: json.dumps(data))
+    return await loop.run_in_executor(io_pool, lambda: json_codec.dumps(data))
 
 
 def _is_pydantic_model(obj: Any) -> bool:
@@ -276,10 +278,10 @@ def offload_to_thread(func):
         def _serialize():
             try:
                 serializable = _as_serializable(result)
-                return json.dumps(serializable, default=str)
+                return json_codec.dumps(serializable, default=str)
             except Exception:
                 try:
-                    return json.dumps(str(result))
+                    return json_codec.dumps(str(result))
                 except Exception:
                     return '"<unserializable result>"'
 
@@ -338,7 +340,7 @@ class ToolResult:
 
     def to_json(self) -> str:
         """Convert to JSON string."""
-        return json.dumps(asdict(self), indent=2)
+        return json_codec.dumps(asdict(self), indent=True)
 
 
 def get_cell_hash(cell_source: str) -> str:
@@ -471,6 +473,7 @@ async def _sanitize_outputs_async(outputs: List[Any], asset_dir: str) -> str:
     Internal async implementation of sanitize_outputs. Use the public wrapper `sanitize_outputs`
     which is backward-compatible with synchronous callers.
     """
+    logger = logging.getLogger(__name__)
 
     llm_summary = []
     raw_outputs = []
@@ -640,8 +643,6 @@ async def _sanitize_outputs_async(outputs: List[Any], asset_dir: str) -> str:
             # Save the best asset found
             if best_asset:
                 mime_type, ext, is_binary, content = best_asset
-                import logging
-                logger = logging.getLogger(__name__)
                 logger.info(f"[ASSET DEBUG] Detected asset: mime={mime_type}, ext={ext}, is_binary={is_binary}, content_len={len(content) if hasattr(content, '__len__') else 'N/A'}")
                 try:
                     if is_binary:
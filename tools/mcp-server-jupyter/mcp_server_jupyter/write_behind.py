@@ -0,0 +1,262 @@
+"""
+Notebook Write-Behind Buffer
+============================
+
+Coalesces save_cell_execution calls so that run_all_cells on an N-cell
+notebook costs a handful of notebook rewrites instead of N.
+
+Without it every finished cell re-reads, patches and atomically rewrites the
+whole .ipynb. For a 200-cell, 30 MB notebook that is 200 full serializations
+and 200 fsyncs for one "run all".
+
+Design:
+1. Pending results are kept per notebook, keyed by cell index. A later
+   result for the same cell replaces the earlier one (last write wins).
+2. A flush rewrites the notebook once for all pending cells. Flushes happen:
+   - after a short debounce once cells stop finishing,
+   - at the latest `max_unflushed_seconds` after the oldest pending result
+     (the durability window: a crash loses at most this much output),
+   - when the execution queue drains (ExecutionScheduler drain callback),
+   - when the kernel stops or the server shuts down (forced flush).
+3. max_unflushed_seconds <= 0 disables buffering (write-through).
+4. Writes run on the notebook's I/O lane (io_lanes.py), which serializes
+   them, so two overlapping flushes can't read-modify-write over each other.
+5. Results are keyed by index, so they must land before the indices
+   shift: insert/delete/move/merge/split (and their by-id and batched
+   forms) call flush_pending_sync() first, on the same lane.
+6. A failed write is re-queued for the next flush while the notebook file
+   still exists, and is counted in stats() either way; a flush ahead of a
+   structural edit drops it instead (its indices are about to go stale).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from mcp_server_jupyter import notebook
+from mcp_server_jupyter.config import settings
+from mcp_server_jupyter.io_lanes import notebook_io_lanes
+from mcp_server_jupyter.output_spill import SpillableOutputs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 0.25
+DEFAULT_MAX_UNFLUSHED_SECONDS = 2.0
+
+# Every live buffer, for flush_pending_sync()
+_buffers: "weakref.WeakSet[NotebookWriteBehind]" = weakref.WeakSet()
+
+
+class NotebookWriteBehind:
+    """Per-notebook buffer of finished cell executions awaiting a disk write."""
+
+    def __init__(
+        self,
+        debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_unflushed_seconds: float = DEFAULT_MAX_UNFLUSHED_SECONDS,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.max_unflushed_seconds = max_unflushed_seconds
+
+        # notebook path -> {cell index -> update}
+        self._pending: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        # notebook path -> monotonic time of the oldest unflushed result
+        self._first_pending_at: Dict[str, float] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.saves = 0
+        self.flushes = 0
+        self.failed_writes = 0
+        self.dropped_cells = 0
+        self.last_error: Optional[str] = None
+
+        _buffers.add(self)
+
+    @staticmethod
+    def _key(nb_path: str) -> str:
+        return str(Path(nb_path).resolve())
+
+    async def save(
+        self,
+        nb_path: str,
+        index: int,
+        outputs: List[Any],
+        execution_count: Optional[int] = None,
+        metadata_update: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Queue a cell's execution results for writing.
+
+        Same arguments as notebook.save_cell_execution. Returns once the
+        result is buffered (or written, in write-through mode).
+        """
+        key = self._key(nb_path)
+        now = time.monotonic()
+
+        with self._lock:
+            pending = self._pending.setdefault(key, {})
+            previous = pending.get(index)
+            if previous and previous.get("metadata_update") and metadata_update:
+                metadata_update = {**previous["metadata_update"], **metadata_update}
+            elif previous and not metadata_update:
+                metadata_update = previous.get("metadata_update")
+            pending[index] = {
+                # A finished execution's spilled outputs stay on disk; the
+                # write stores its head and links the tail as an asset
+                "outputs": (
+                    outputs if isinstance(outputs, SpillableOutputs) else list(outputs)
+                ),
+                "execution_count": execution_count,
+                "metadata_update": metadata_update,
+            }
+            first = self._first_pending_at.setdefault(key, now)
+            self.saves += 1
+
+        deadline = first + self.max_unflushed_seconds
+        if self.max_unflushed_seconds <= 0 or now >= deadline:
+            await self.flush(key)
+            return
+
+        self._schedule(key, min(self.debounce_seconds, deadline - now))
+
+    def _schedule(self, key: str, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+        def _fire():
+            self._timers.pop(key, None)
+            task = loop.create_task(self.flush(key))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+        self._timers[key] = loop.call_later(delay, _fire)
+
+    def pending_count(self, nb_path: str) -> int:
+        """Number of cells buffered for a notebook."""
+        with self._lock:
+            return len(self._pending.get(self._key(nb_path), {}))
+
+    async def flush(self, nb_path: str) -> int:
+        """
+        Write all buffered results for a notebook now.
+
+        Returns:
+            Number of cells written (0 when nothing was pending)
+        """
+        key = self._key(nb_path)
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+        with self._lock:
+            updates = self._pending.pop(key, None)
+            self._first_pending_at.pop(key, None)
+        if not updates:
+            return 0
+
+        written = await notebook_io_lanes.run(key, self._write, key, updates)
+        return len(updates) if written else 0
+
+    def flush_sync(self, nb_path: str) -> int:
+        """
+        Write a notebook's buffered results from the calling thread.
+
+        For notebook helpers about to shift cell indices; they already run
+        on the notebook's lane. A pending timer finds nothing left to write.
+        """
+        key = self._key(nb_path)
+        with self._lock:
+            updates = self._pending.pop(key, None)
+            self._first_pending_at.pop(key, None)
+        if not updates:
+            return 0
+        return len(updates) if self._write(key, updates, requeue=False) else 0
+
+    async def flush_all(self) -> int:
+        """Flush every notebook (server shutdown)."""
+        with self._lock:
+            keys = list(self._pending)
+        written = 0
+        for key in keys:
+            written += await self.flush(key)
+        return written
+
+    def _write(
+        self, key: str, updates: Dict[int, Dict[str, Any]], requeue: bool = True
+    ) -> bool:
+        try:
+            if len(updates) == 1:
+                (index, update), = updates.items()
+                notebook.save_cell_execution(key, index, **update)
+            else:
+                notebook.save_cell_executions(key, updates)
+            self.flushes += 1
+            logger.debug(
+                f"[WRITE-BEHIND] Flushed {len(updates)} cells to {Path(key).name}"
+            )
+            return True
+        except Exception as e:
+            with self._lock:
+                self.failed_writes += 1
+                self.last_error = f"{Path(key).name}: {type(e).__name__}: {e}"
+                if requeue and os.path.exists(key):
+                    # Retried by the next flush; newer results for a cell win
+                    pending = self._pending.setdefault(key, {})
+                    for index, update in updates.items():
+                        pending.setdefault(index, update)
+                    self._first_pending_at.setdefault(key, time.monotonic())
+                    action = "re-queued"
+                else:
+                    self.dropped_cells += len(updates)
+                    action = "dropped"
+            logger.error(
+                f"[WRITE-BEHIND] Failed to write {key} ({len(updates)} cells {action}): {e}"
+            )
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_notebooks": len(self._pending),
+                "pending_cells": sum(len(p) for p in self._pending.values()),
+                "saves": self.saves,
+                "flushes": self.flushes,
+                "failed_writes": self.failed_writes,
+                "dropped_cells": self.dropped_cells,
+                "last_error": self.last_error,
+            }
+
+
+def flush_pending_sync(nb_path: str) -> int:
+    """Write every buffer's pending results for a notebook (see flush_sync)."""
+    return sum(buffer.flush_sync(nb_path) for buffer in list(_buffers))
+
+
+def create_write_behind() -> NotebookWriteBehind:
+    """Build a write-behind buffer from MCP_WRITE_BEHIND_* settings."""
+    return NotebookWriteBehind(
+        debounce_seconds=float(
+            os.getenv("MCP_WRITE_BEHIND_DEBOUNCE_SECONDS")
+            or getattr(
+                settings, "MCP_WRITE_BEHIND_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS
+            )
+        ),
+        max_unflushed_seconds=float(
+            os.getenv("MCP_WRITE_BEHIND_MAX_UNFLUSHED_SECONDS")
+            or getattr(
+                settings,
+                "MCP_WRITE_BEHIND_MAX_UNFLUSHED_SECONDS",
+                DEFAULT_MAX_UNFLUSHED_SECONDS,
+            )
+        ),
+    )
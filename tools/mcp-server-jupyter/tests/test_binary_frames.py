@@ -0,0 +1,197 @@
+"""
+Tests for the binary output lane
+================================
+
+Large image mime data is offered to binary WebSocket clients as raw bytes
+in one shared frame; text clients and the stored output are unchanged.
+"""
+
+import base64
+from unittest.mock import AsyncMock, patch
+
+import nbformat
+import pytest
+
+from src.binary_frames import (
+    BinaryOutputMessage,
+    binary_message,
+    decode_frame,
+    split_output,
+)
+from src.io_multiplexer import IOMultiplexer
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+PNG_B64 = base64.b64encode(PNG).decode("ascii")
+
+
+def _image_output():
+    return nbformat.v4.new_output(
+        "display_data",
+        data={"image/png": PNG_B64, "text/plain": "<Figure>"},
+        metadata={},
+    )
+
+
+def test_split_output_decodes_large_images_only():
+    output = _image_output()
+
+    stripped, parts = split_output(output, min_bytes=100)
+
+    assert parts == [("image/png", PNG)]
+    assert stripped["data"] == {"image/png": None, "text/plain": "<Figure>"}
+    # The stored output keeps its base64
+    assert output["data"]["image/png"] == PNG_B64
+    assert split_output(output, min_bytes=len(PNG_B64) + 1) is None
+    assert split_output(output, min_bytes=0) is None
+
+
+def test_frame_round_trip():
+    message = {"jsonrpc": "2.0", "method": "notebook/output", "params": {"output": {}}}
+    binary = BinaryOutputMessage(message, *split_output(_image_output(), 100))
+
+    header, parts = decode_frame(binary.frame())
+
+    assert binary.frame() is binary.frame()
+    assert header["method"] == "notebook/output"
+    assert header["params"]["output"]["data"]["image/png"] is None
+    assert header["buffers"] == [{"mime": "image/png", "offset": 0, "length": len(PNG)}]
+    assert bytes(parts["image/png"]) == PNG
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_broadcasts_binary_message():
+    mux = IOMultiplexer(binary_min_bytes=100)
+    exec_data = {"id": "t1", "cell_index": 0, "outputs": []}
+    broadcast = AsyncMock()
+
+    await mux._emit_output(
+        "test.ipynb",
+        exec_data,
+        "display_data",
+        {"data": {"image/png": PNG_B64}, "metadata": {}},
+        broadcast,
+        None,
+    )
+
+    message = broadcast.call_args[0][0]
+    assert isinstance(message, BinaryOutputMessage)
+    # Text clients still see the full JSON output
+    assert message["params"]["output"]["data"]["image/png"] == PNG_B64
+    assert exec_data["outputs"][0]["data"]["image/png"] == PNG_B64
+
+
+@pytest.mark.asyncio
+async def test_connection_manager_sends_frame_to_binary_clients():
+    from src.main import ConnectionManager
+
+    manager = ConnectionManager()
+    text_client = AsyncMock()
+    binary_client = AsyncMock()
+    await manager.connect(text_client)
+    await manager.connect(binary_client, binary=True)
+
+    message = {"jsonrpc": "2.0", "method": "notebook/output", "params": {"output": {}}}
+    binary = BinaryOutputMessage(message, *split_output(_image_output(), 100))
+    await manager.broadcast(binary)
+
+    binary_client.send_bytes.assert_called_once_with(binary.frame())
+    binary_client.send_text.assert_not_called()
+    text_client.send_text.assert_called_once()
+    text_client.send_bytes.assert_not_called()
+
+
+def _iopub(msg_type, content):
+    return {
+        "msg_type": msg_type,
+        "parent_header": {"msg_id": "m1"},
+        "content": content,
+    }
+
+
+def test_binary_message_wraps_forwarded_iopub_images():
+    message = {
+        "jsonrpc": "2.0",
+        "method": "notebook/iopub_message",
+        "params": {
+            "msg_type": "display_data",
+            "content": {"data": {"image/png": PNG_B64}, "metadata": {}},
+        },
+    }
+
+    binary = binary_message(message, 100)
+    header, parts = decode_frame(binary.frame())
+
+    assert binary == message
+    assert header["params"]["content"]["data"]["image/png"] is None
+    assert bytes(parts["image/png"]) == PNG
+    assert binary_message(message, len(PNG_B64) + 1) is message
+    status = {"method": "notebook/iopub_message", "params": {"msg_type": "status"}}
+    assert binary_message(status, 100) is status
+
+
+@pytest.mark.asyncio
+async def test_direct_forwarding_sends_images_outside_batches():
+    mux = IOMultiplexer(binary_min_bytes=100)
+    notify = AsyncMock()
+    msgs = [
+        _iopub("stream", {"name": "stdout", "text": "a"}),
+        _iopub("stream", {"name": "stdout", "text": "b"}),
+        _iopub("display_data", {"data": {"image/png": PNG_B64}, "metadata": {}}),
+        _iopub("status", {"execution_state": "idle"}),
+    ]
+
+    await mux.forward_iopub_batch("test.ipynb", msgs, notify)
+
+    calls = [(c.args[0], c.args[1]) for c in notify.call_args_list]
+    assert [method for method, _ in calls] == [
+        "notebook/iopub_batch",
+        "notebook/iopub_message",
+        "notebook/iopub_message",
+    ]
+    assert len(calls[0][1]["messages"]) == 2
+    assert calls[1][1]["msg_type"] == "display_data"
+
+
+@pytest.mark.asyncio
+async def test_connection_manager_frames_iopub_for_binary_clients():
+    from src.main import ConnectionManager
+
+    manager = ConnectionManager()
+    manager.binary_min_bytes = 100
+    text_client = AsyncMock()
+    binary_client = AsyncMock()
+    await manager.connect(text_client)
+    await manager.connect(binary_client, binary=True)
+
+    await manager.broadcast(
+        {
+            "jsonrpc": "2.0",
+            "method": "notebook/iopub_message",
+            "params": {
+                "msg_type": "display_data",
+                "content": {"data": {"image/png": PNG_B64}, "metadata": {}},
+            },
+        }
+    )
+
+    header, parts = decode_frame(binary_client.send_bytes.call_args[0][0])
+    assert bytes(parts["image/png"]) == PNG
+    assert PNG_B64 in text_client.send_text.call_args[0][0]
+
+
+def test_ws_binary_query_param_opts_in():
+    from starlette.testclient import TestClient
+
+    from src import main
+
+    with patch.object(
+        main.kernel_manager, "start_kernel_for_session", AsyncMock()
+    ):
+        client = TestClient(main.app)
+        for query, expected in (("?binary=1", 1), ("", 0)):
+            with client.websocket_connect("/ws" + query) as ws:
+                ws.send_text('{"jsonrpc": "2.0", "id": 1, "method": "initialize"}')
+                ws.receive_text()
+                assert len(main.connection_manager.active_connections) == 1
+                assert len(main.connection_manager.binary_connections) == expected
+        assert main.connection_manager.active_connections == []
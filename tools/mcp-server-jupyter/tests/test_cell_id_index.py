@@ -0,0 +1,177 @@
+"""
+Tests for CellIdIndex and ID-addressed cell operations
+======================================================
+
+Verifies that the id -> index map stays in sync through inserts, deletes
+and moves (renumbered once per batch), that it is carried with the cached document across writes, and
+that batch resolution works.
+"""
+
+import random
+
+import nbformat
+import pytest
+
+from src import cell_id_manager, notebook
+from src.cell_id_manager import CellIdIndex, StaleStateError, find_cells_by_id
+from src.notebook_cache import notebook_cache
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(f"x = {i}") for i in range(4)]
+    for i, cell in enumerate(nb.cells):
+        cell.id = f"c{i}"
+    path = tmp_path / "ids.ipynb"
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+def _ids(path):
+    return [c["id"] for c in notebook.get_notebook_outline(path)]
+
+
+def _assert_index_matches_disk(path):
+    nb, id_index = notebook_cache.get_indexed(path)
+    expected = {cell.id: i for i, cell in enumerate(nb.cells)}
+    assert id_index.resolve_many(nb.cells, expected) == expected
+    assert len(id_index) == len(expected)
+
+
+class TestCellIdIndex:
+    def test_incremental_updates(self):
+        cells = [nbformat.v4.new_code_cell(str(i)) for i in range(3)]
+        for i, cell in enumerate(cells):
+            cell.id = f"c{i}"
+        index = CellIdIndex(cells)
+
+        new = nbformat.v4.new_code_cell("new")
+        new.id = "new"
+        cells.insert(1, new)
+        index.inserted(1, "new")
+        assert index.resolve_many(cells, ["c0", "new", "c1", "c2"]) == {
+            "c0": 0, "new": 1, "c1": 2, "c2": 3,
+        }
+
+        removed = cells.pop(0)
+        index.deleted(0, removed.id)
+        assert index.lookup(cells, "c0") is None
+        assert index.lookup(cells, "c2") == 2
+
+        cell = cells.pop(2)
+        cells.insert(0, cell)
+        index.moved(2, 0, cell.id)
+        assert index.resolve_many(cells, ["c2", "new", "c1"]) == {
+            "c2": 0, "new": 1, "c1": 2,
+        }
+
+    def test_stale_map_rebuilds_instead_of_lying(self):
+        cells = [nbformat.v4.new_code_cell(str(i)) for i in range(3)]
+        for i, cell in enumerate(cells):
+            cell.id = f"c{i}"
+        index = CellIdIndex(cells)
+
+        # Mutate without telling the index
+        cells.reverse()
+        assert index.lookup(cells, "c0") == 2
+
+    def test_batch_of_edits_matches_a_fresh_index(self, monkeypatch):
+        rng = random.Random(3)
+        cells = [nbformat.v4.new_code_cell(str(i)) for i in range(50)]
+        for i, cell in enumerate(cells):
+            cell.id = f"c{i}"
+        index = CellIdIndex(cells)
+
+        renumbered = []
+        original_sync = CellIdIndex._sync
+
+        def counting_sync(self):
+            renumbered.append(len(self._order) - self._synced)
+            return original_sync(self)
+
+        monkeypatch.setattr(CellIdIndex, "_sync", counting_sync)
+        for step in range(200):
+            op = rng.choice(["insert", "delete", "move"])
+            if op == "insert" or len(cells) < 2:
+                new = nbformat.v4.new_code_cell("new")
+                new.id = f"n{step}"
+                position = rng.randint(0, len(cells))
+                cells.insert(position, new)
+                index.inserted(position, new.id)
+            elif op == "delete":
+                position = rng.randrange(len(cells))
+                index.deleted(position, cells.pop(position).id)
+            else:
+                src, dst = rng.randrange(len(cells)), rng.randrange(len(cells))
+                cell = cells.pop(src)
+                cells.insert(dst, cell)
+                index.moved(src, dst, cell.id)
+        # Nothing is renumbered until the batch is looked up
+        assert renumbered == []
+
+        expected = {cell.id: i for i, cell in enumerate(cells)}
+        assert index.resolve_many(cells, expected) == expected
+        assert len(renumbered) == 1
+        assert len(index) == len(expected)
+
+    def test_find_cells_by_id_without_index(self, nb_path):
+        nb = notebook_cache.get(nb_path)
+        assert find_cells_by_id(nb, ["c3", "missing"]) == {"c3": 3, "missing": None}
+
+
+class TestIdAddressedOperations:
+    def test_insert_delete_keep_cached_index_in_sync(self, nb_path):
+        cell_id_manager.insert_cell_by_id(nb_path, "c1", "inserted")
+        _assert_index_matches_disk(nb_path)
+
+        cell_id_manager.delete_cell_by_id(nb_path, "c0")
+        _assert_index_matches_disk(nb_path)
+        assert _ids(nb_path)[:1] == ["c1"]
+
+        notebook.move_cell(nb_path, 0, 3)
+        _assert_index_matches_disk(nb_path)
+
+        result = cell_id_manager.edit_cell_by_id(nb_path, "c1", "edited")
+        assert "index 3" in result
+
+    def test_index_reused_across_writes(self, nb_path, monkeypatch):
+        notebook_cache.get_indexed(nb_path)
+        notebook.insert_cell(nb_path, 0, "first")
+
+        built = []
+        original_rebuild = CellIdIndex.rebuild
+
+        def counting_rebuild(self, cells):
+            built.append(len(cells))
+            return original_rebuild(self, cells)
+
+        monkeypatch.setattr(CellIdIndex, "rebuild", counting_rebuild)
+        assert cell_id_manager.resolve_cell_ids(nb_path, ["c0", "c3"]) == {
+            "c0": 1,
+            "c3": 4,
+        }
+        assert built == []
+
+    def test_expected_index_mismatch_is_stale(self, nb_path):
+        with pytest.raises(StaleStateError):
+            cell_id_manager.edit_cell_by_id(nb_path, "c2", "x", expected_index=0)
+
+    def test_notebook_module_delegates(self, nb_path):
+        notebook.edit_cell_by_id(nb_path, "c0", "y = 1")
+        assert notebook.read_cell(nb_path, 0)["source"] == "y = 1"
+
+    def test_apply_notebook_edits_tracks_ids(self, nb_path):
+        notebook.apply_notebook_edits(
+            nb_path,
+            [
+                {"op": "insert", "index": 0, "content": "head"},
+                {"op": "delete", "cell_id": "c2"},
+                {"op": "move", "cell_id": "c3", "to_index": 1},
+                {"op": "edit", "cell_id": "c0", "content": "zero"},
+            ],
+        )
+        _assert_index_matches_disk(nb_path)
+        assert _ids(nb_path)[1:] == ["c3", "c0", "c1"]
+        assert notebook.read_cell(nb_path, 2)["source"] == "zero"
@@ -3,13 +3,22 @@ Tests for ExecutionScheduler Component
 ========================================
 
 Tests execution queue processing, linearity checking, timeout handling,
-and stop_on_error logic.
+stop_on_error logic and queue lanes.
 """
 
 import pytest
 import asyncio
-from unittest.mock import AsyncMock
-from src.execution_scheduler import ExecutionScheduler
+import nbformat
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+from src.execution_scheduler import (
+    LANE_BATCH,
+    ExecutionRecord,
+    ExecutionScheduler,
+    LaneQueue,
+)
+from src.io_multiplexer import IOMultiplexer
+from src.session import SessionManager
 
 
 @pytest.fixture
@@ -121,6 +130,38 @@ class TestExecutionLifecycle:
         # Verify finalization event was set
         assert exec_data["finalization_event"].is_set()
 
+    async def test_status_write_wakes_waiter_without_monitor_task(
+        self, scheduler, session_data
+    ):
+        """Waiting on a running cell spawns no polling task."""
+        execute_callback = AsyncMock(return_value="msg_push")
+
+        exec_task = asyncio.create_task(
+            scheduler._execute_cell(
+                nb_path="/test/nb.ipynb",
+                session_data=session_data,
+                cell_index=0,
+                code="import time; time.sleep(100)",
+                exec_id="exec_push",
+                execute_callback=execute_callback,
+            )
+        )
+        await asyncio.sleep(0.05)
+
+        # Nothing besides the execution (and its event wait) is running
+        coroutines = [t.get_coro().__qualname__ for t in asyncio.all_tasks()]
+        assert not any("_status_monitor" in name for name in coroutines)
+        assert len(coroutines) <= 3
+        exec_data = session_data["executions"]["msg_push"]
+        assert isinstance(exec_data, ExecutionRecord)
+        assert not exec_data["completion_event"].is_set()
+
+        exec_data["status"] = "error"
+        assert exec_data["completion_event"].is_set()
+
+        await asyncio.wait_for(exec_task, timeout=1)
+        assert exec_data["finalization_event"].is_set()
+
     async def test_execute_cell_increments_counter(self, scheduler, session_data):
         """Test execution counter increments."""
         execute_callback = AsyncMock(return_value="msg_1")
@@ -374,5 +415,337 @@ class TestMaxExecutedIndex:
         assert session_data["max_executed_index"] == 2
 
 
+
+def _iopub(msg_type, parent_id, content):
+    return {
+        "msg_type": msg_type,
+        "parent_header": {"msg_id": parent_id},
+        "content": content,
+        "header": {"msg_type": msg_type},
+    }
+
+
+class TestMultiplexerRegistration:
+    """Test executions registered through the IOMultiplexer."""
+
+    async def test_iopub_completes_and_retires_execution(self, session_data):
+        mux = IOMultiplexer()
+        scheduler = ExecutionScheduler(default_timeout=10, io_multiplexer=mux)
+        execute_callback = AsyncMock(return_value="sess_1_1")
+        executions = session_data["executions"]
+
+        exec_task = asyncio.create_task(
+            scheduler._execute_cell(
+                nb_path="/test/nb.ipynb",
+                session_data=session_data,
+                cell_index=0,
+                code="print('hi')",
+                exec_id="exec_mux",
+                execute_callback=execute_callback,
+            )
+        )
+        await asyncio.sleep(0.05)
+        exec_data = executions["sess_1_1"]
+        assert mux._index_for(executions).match("sess_1_9") == "sess_1_1"
+
+        # No auto-complete: the kernel's messages finish the execution
+        await asyncio.sleep(1.1)
+        assert exec_data["status"] == "running"
+
+        await mux.forward_iopub_batch(
+            "/test/nb.ipynb",
+            [
+                _iopub("stream", "sess_1_1", {"name": "stdout", "text": "hi\n"}),
+                _iopub("status", "sess_1_1", {"execution_state": "idle"}),
+            ],
+            executions=executions,
+        )
+        await asyncio.wait_for(exec_task, timeout=1)
+
+        assert exec_data["status"] == "completed"
+        assert [o["text"] for o in exec_data["outputs"]] == ["hi\n"]
+        assert "sess_1_1" not in executions
+        assert mux._index_for(executions).match("sess_1_9") is None
+
+
+def _item(exec_id, lane=None):
+    item = {"cell_index": 0, "code": "pass", "exec_id": exec_id}
+    if lane:
+        item["lane"] = lane
+    return item
+
+
+class TestLaneQueue:
+    """Test priority lanes and starvation protection."""
+
+    def test_higher_lanes_go_first(self):
+        q = LaneQueue()
+        q.put_nowait(_item("batch", "batch"))
+        q.put_nowait(_item("cell"))  # interactive by default
+        q.put_nowait(_item("probe", "introspection"))
+
+        assert q.qsize() == 3
+        assert [q.get_nowait()["exec_id"] for _ in range(3)] == ["probe", "cell", "batch"]
+        assert q.empty()
+
+    def test_passed_over_lane_is_served(self):
+        q = LaneQueue(starvation_limit=2)
+        for i in range(2):
+            q.put_nowait(_item(f"b{i}", "batch"))
+        for i in range(5):
+            q.put_nowait(_item(f"p{i}", "introspection"))
+
+        order = [q.get_nowait()["exec_id"] for _ in range(7)]
+
+        assert order == ["p0", "p1", "b0", "p2", "p3", "b1", "p4"]
+
+    def test_strict_priority_when_limit_is_zero(self):
+        q = LaneQueue(starvation_limit=0)
+        q.put_nowait(_item("b", "batch"))
+        for i in range(5):
+            q.put_nowait(_item(f"p{i}", "introspection"))
+
+        assert [q.get_nowait()["exec_id"] for _ in range(6)][-1] == "b"
+
+    async def test_probe_runs_between_batch_cells(self, scheduler, session_data):
+        """A probe queued behind batch work runs after the current cell."""
+        session_data["execution_queue"] = LaneQueue()
+        q = session_data["execution_queue"]
+        started = []
+
+        async def execute_callback(code):
+            started.append(code)
+            return f"msg_{len(started)}"
+
+        for i in range(3):
+            await q.put({"cell_index": i, "code": f"batch{i}", "exec_id": f"b{i}", "lane": "batch"})
+        processor = asyncio.create_task(
+            scheduler.process_queue("/test/nb.ipynb", session_data, execute_callback)
+        )
+        await asyncio.sleep(0.05)
+        await q.put({"cell_index": -1, "code": "probe", "exec_id": "p", "lane": "introspection"})
+        await q.put(None)
+
+        for n in range(1, 5):
+            while f"msg_{n}" not in session_data["executions"]:
+                await asyncio.sleep(0.01)
+            session_data["executions"][f"msg_{n}"]["status"] = "completed"
+        await asyncio.wait_for(processor, timeout=2)
+
+        assert started == ["batch0", "probe", "batch1", "batch2"]
+
+    async def test_stop_on_error_keeps_probes(self, scheduler, session_data):
+        session_data["execution_queue"] = LaneQueue()
+        session_data["stop_on_error"] = True
+        q = session_data["execution_queue"]
+        q.put_nowait(_item("cell", "batch"))
+        q.put_nowait(_item("probe", "introspection"))
+        session_data["queued_executions"] = {"cell": {}, "probe": {}}
+
+        await scheduler._clear_queue_on_error(session_data, "boom")
+
+        assert q.lane_sizes() == {"introspection": 1, "interactive": 0, "batch": 0}
+        assert list(session_data["queued_executions"]) == ["probe"]
+
+
+class _RecordingKernelClient:
+    """Kernel client double that records the code it is sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def execute(self, code, **kwargs):
+        self.sent.append(code)
+        return f"sess_1_{len(self.sent)}"
+
+
+class TestSessionQueue:
+    """Test the per-session queue that feeds the kernel."""
+
+    async def test_probe_is_dispatched_between_batch_cells(self, tmp_path):
+        manager = SessionManager()
+        manager._send_notification = AsyncMock()
+        nb_path = str(Path(tmp_path / "nb.ipynb").resolve())
+        kc = _RecordingKernelClient()
+        session = {"kc": kc, "km": MagicMock(), "execution_timeout": 10}
+        manager.sessions[nb_path] = session
+        manager._start_execution_queue(nb_path, session)
+        executions = session["executions"]
+
+        try:
+            for i in range(3):
+                await manager.enqueue_execution(nb_path, i, f"batch{i}", lane=LANE_BATCH)
+            await asyncio.sleep(0.05)
+            # Only the running cell has reached the kernel
+            assert kc.sent == ["batch0"]
+
+            # The probe waits for the running cell, then for its own result
+            probe = asyncio.create_task(manager.run_simple_code(nb_path, "probe"))
+
+            for n in range(1, 5):
+                msg_id = f"sess_1_{n}"
+                while msg_id not in executions:
+                    await asyncio.sleep(0.01)
+                msgs = [_iopub("status", msg_id, {"execution_state": "idle"})]
+                if n == 2:
+                    output = {"name": "stdout", "text": "probe output\n"}
+                    msgs.insert(0, _iopub("stream", msg_id, output))
+                await manager.io_multiplexer.forward_iopub_batch(
+                    nb_path, msgs, executions=executions
+                )
+                if n == 2:
+                    assert "probe output" in await probe
+
+            assert kc.sent == ["batch0", "probe", "batch1", "batch2"]
+            started = [
+                call.args[1]["cell_index"]
+                for call in manager._send_notification.call_args_list
+                if call.args[0] == "notebook/cell_execution_started"
+            ]
+            assert started == [0, -1, 1, 2]
+        finally:
+            session["queue_task"].cancel()
+
+    async def test_finished_cell_is_saved_when_queue_drains(self, tmp_path):
+        nb = nbformat.v4.new_notebook()
+        nb.cells = [nbformat.v4.new_code_cell("print('hi')")]
+        nb_path = str(Path(tmp_path / "saved.ipynb").resolve())
+        nbformat.write(nb, nb_path)
+
+        manager = SessionManager()
+        manager._send_notification = AsyncMock()
+        kc = _RecordingKernelClient()
+        session = {"kc": kc, "km": MagicMock(), "execution_timeout": 10}
+        flush = AsyncMock(wraps=manager.write_behind.flush)
+        manager.write_behind.flush = flush
+        manager.sessions[nb_path] = session
+        manager._start_execution_queue(nb_path, session)
+
+        try:
+            await manager.enqueue_execution(nb_path, 0, "print('hi')")
+            while "sess_1_1" not in session["executions"]:
+                await asyncio.sleep(0.01)
+            await manager.io_multiplexer.forward_iopub_batch(
+                nb_path,
+                [
+                    _iopub("execute_input", "sess_1_1", {"execution_count": 7}),
+                    _iopub("stream", "sess_1_1", {"name": "stdout", "text": "hi\n"}),
+                    _iopub("status", "sess_1_1", {"execution_state": "idle"}),
+                ],
+                executions=session["executions"],
+            )
+            while not flush.await_count:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+        finally:
+            session["queue_task"].cancel()
+
+        saved = nbformat.read(nb_path, as_version=4).cells[0]
+        assert saved.execution_count == 7
+        assert [o["text"] for o in saved.outputs] == ["hi\n"]
+        assert manager.write_behind.pending_count(nb_path) == 0
+
+    async def test_execution_status_follows_a_queued_cell(self, tmp_path):
+        manager = SessionManager()
+        manager._send_notification = AsyncMock()
+        nb_path = str(Path(tmp_path / "status.ipynb").resolve())
+        kc = _RecordingKernelClient()
+        session = {"kc": kc, "km": MagicMock(), "execution_timeout": 10}
+        manager.sessions[nb_path] = session
+        manager._start_execution_queue(nb_path, session)
+        executions = session["executions"]
+
+        try:
+            first = await manager.enqueue_execution(nb_path, 0, "first")
+            second = await manager.enqueue_execution(nb_path, 1, "second")
+            while "sess_1_1" not in executions:
+                await asyncio.sleep(0.01)
+
+            assert manager.get_execution_status(nb_path, first)["status"] == "running"
+            assert manager.get_execution_status(nb_path, second)["status"] == "queued"
+            assert manager.is_kernel_busy(nb_path)
+
+            await manager.io_multiplexer.forward_iopub_batch(
+                nb_path,
+                [
+                    _iopub("stream", "sess_1_1", {"name": "stdout", "text": "one\n"}),
+                    _iopub("status", "sess_1_1", {"execution_state": "idle"}),
+                ],
+                executions=executions,
+            )
+            while "sess_1_2" not in executions:
+                await asyncio.sleep(0.01)
+            error = {"ename": "ValueError", "evalue": "bad", "traceback": []}
+            await manager.io_multiplexer.forward_iopub_batch(
+                nb_path,
+                [
+                    _iopub("error", "sess_1_2", error),
+                    _iopub("status", "sess_1_2", {"execution_state": "idle"}),
+                ],
+                executions=executions,
+            )
+            while manager.is_kernel_busy(nb_path):
+                await asyncio.sleep(0.01)
+        finally:
+            session["queue_task"].cancel()
+
+        done = manager.get_execution_status(nb_path, first)
+        assert done["status"] == "completed"
+        assert done["output"] == "one\n"
+        assert [o["text"] for o in done["outputs"]] == ["one\n"]
+
+        failed = manager.get_execution_status(nb_path, second)
+        assert failed["status"] == "error"
+        assert failed["error"] == "ValueError: bad"
+
+        assert manager.get_execution_status(nb_path, "nope")["status"] == "unknown"
+
+    async def test_queue_waits_while_exec_lock_is_held(self, tmp_path):
+        manager = SessionManager()
+        manager._send_notification = AsyncMock()
+        nb_path = str(Path(tmp_path / "locked.ipynb").resolve())
+        kc = _RecordingKernelClient()
+        lock = asyncio.Lock()
+        session = {
+            "kc": kc,
+            "km": MagicMock(),
+            "execution_timeout": 10,
+            "exec_lock": lock,
+        }
+        manager.sessions[nb_path] = session
+        manager._start_execution_queue(nb_path, session)
+
+        try:
+            # A fan-out run holds the lock: queued cells must not interleave
+            await lock.acquire()
+            await manager.enqueue_execution(nb_path, 0, "queued", lane=LANE_BATCH)
+            await asyncio.sleep(0.05)
+            assert kc.sent == []
+
+            lock.release()
+            while "sess_1_1" not in session["executions"]:
+                await asyncio.sleep(0.01)
+            assert kc.sent == ["queued"]
+            await manager.io_multiplexer.forward_iopub_batch(
+                nb_path,
+                [_iopub("status", "sess_1_1", {"execution_state": "idle"})],
+                executions=session["executions"],
+            )
+            while lock.locked():
+                await asyncio.sleep(0.01)
+        finally:
+            if lock.locked():
+                lock.release()
+            session["queue_task"].cancel()
+
+    async def test_session_without_worker_executes_directly(self):
+        manager = SessionManager()
+        nb_path = str(Path("direct.ipynb").resolve())
+        manager.sessions[nb_path] = {"kc": MagicMock()}
+        manager.execute_cell_async = AsyncMock(return_value="msg-1")
+
+        assert await manager.enqueue_execution(nb_path, 0, "x = 1") == "msg-1"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,224 @@
+"""
+Tests for fan-out execution
+===========================
+
+FanoutRun against fake kernels: replica and primary outputs are saved and
+replicas shut down, a replica that cannot start falls back to the primary,
+the first failure cancels (and interrupts) the rest, and a primary timeout
+is reported instead of hanging.
+"""
+
+import asyncio
+from queue import Empty
+
+import nbformat
+import pytest
+
+from src.fanout import FanoutRun
+from src.io_multiplexer import IOMultiplexer
+
+# Branches [[0], [1]]; cell 1 defines `b`, so it is merged; cell 2 joins
+CELLS = ["a = 1", "b = 2", "c = a + b"]
+
+
+class _FakeShell:
+    """Primary kernel client: only the shell reply queue is used."""
+
+    def __init__(self):
+        self.replies: asyncio.Queue = asyncio.Queue()
+
+    async def get_shell_msg(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.replies.get(), timeout)
+        except asyncio.TimeoutError:
+            raise Empty
+
+
+class _FakeReplicaClient:
+    def __init__(self, lifecycle):
+        self.lifecycle = lifecycle
+
+    def start_channels(self):
+        pass
+
+    def stop_channels(self):
+        pass
+
+    async def wait_for_ready(self, timeout=None):
+        pass
+
+    def execute(self, code, silent=False):
+        pass
+
+    async def execute_interactive(self, code, output_hook=None, timeout=None):
+        if code in self.lifecycle.failing:
+            return {"content": {"status": "error", "ename": "ValueError", "evalue": "bad"}}
+        output_hook(
+            {
+                "header": {"msg_type": "stream"},
+                "content": {"name": "stdout", "text": f"ran {code}\n"},
+            }
+        )
+        return {"content": {"status": "ok", "execution_count": 7}}
+
+
+class _FakeKernelManager:
+    def __init__(self, lifecycle):
+        self.lifecycle = lifecycle
+
+    def client(self):
+        return _FakeReplicaClient(self.lifecycle)
+
+
+class _FakeLifecycle:
+    def __init__(self, start_fails=False, failing=()):
+        self.start_fails = start_fails
+        self.failing = set(failing)
+        self.started = []
+        self.stopped = []
+
+    async def start_kernel(self, kernel_id, notebook_dir, venv_path=None):
+        if self.start_fails:
+            raise RuntimeError("no kernel for you")
+        self.started.append(kernel_id)
+        return _FakeKernelManager(self)
+
+    async def stop_kernel(self, kernel_id):
+        self.stopped.append(kernel_id)
+
+
+class _FakeSessionManager:
+    def __init__(self, lifecycle, hang=(), timeout=5):
+        self.kernel_lifecycle = lifecycle
+        self.io_multiplexer = IOMultiplexer()
+        self.hang = set(hang)
+        self.kc = _FakeShell()
+        self.session = {
+            "kc": self.kc,
+            "exec_lock": asyncio.Lock(),
+            "execution_timeout": timeout,
+            "executions": {},
+        }
+        self.executed = []
+        self.interrupts = 0
+
+    def get_session(self, nb_path):
+        return self.session
+
+    async def execute_cell_async(self, nb_path, cell_index, code, on_sent=None):
+        self.executed.append(cell_index)
+        msg_id = f"msg-{len(self.executed)}"
+        if on_sent is not None:
+            on_sent(msg_id)
+        if cell_index not in self.hang:
+            count = len(self.executed)
+            self.kc.replies.put_nowait(
+                {
+                    "parent_header": {"msg_id": msg_id},
+                    "content": {"status": "ok", "execution_count": count},
+                }
+            )
+            # IOPub as the kernel poller would see it, after the shell reply
+            parent = {"msg_id": msg_id}
+            self.io_multiplexer.track_direct(
+                [
+                    {
+                        "msg_type": "stream",
+                        "parent_header": parent,
+                        "content": {"name": "stdout", "text": f"primary {code}\n"},
+                    },
+                    {
+                        "msg_type": "status",
+                        "parent_header": parent,
+                        "content": {"execution_state": "idle"},
+                    },
+                ],
+                self.session["executions"],
+            )
+        return msg_id
+
+    async def interrupt_kernel(self, nb_path):
+        self.interrupts += 1
+        return "Kernel interrupted (SIGINT sent)."
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    path = tmp_path / "fan.ipynb"
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(source) for source in CELLS]
+    nbformat.write(nb, str(path))
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_replica_outputs_are_saved_and_replicas_stopped(nb_path):
+    lifecycle = _FakeLifecycle()
+    sm = _FakeSessionManager(lifecycle)
+
+    report = await FanoutRun(sm, nb_path, list(enumerate(CELLS)), 1).run()
+
+    assert report["status"] == "ok"
+    assert report["replicas"] == 1
+    assert report["merged"] == [1]
+    # Branch 0 and the join on the primary, plus the merge re-execution
+    assert sorted(sm.executed) == [0, 1, 2]
+    assert lifecycle.stopped == lifecycle.started and len(lifecycle.started) == 1
+
+    cells = nbformat.read(nb_path, as_version=4).cells
+    assert cells[1].execution_count == 7
+    assert cells[1].outputs[0]["text"] == "ran b = 2\n"
+    # Primary cells are saved too; the merge re-run of cell 1 is not
+    assert cells[0].outputs[0]["text"] == "primary a = 1\n"
+    assert cells[2].outputs[0]["text"] == "primary c = a + b\n"
+    assert cells[2].execution_count is not None
+    assert sm.session["executions"] == {}
+
+
+@pytest.mark.asyncio
+async def test_replica_that_cannot_start_runs_on_the_primary(nb_path):
+    lifecycle = _FakeLifecycle(start_fails=True)
+    sm = _FakeSessionManager(lifecycle)
+
+    report = await FanoutRun(sm, nb_path, list(enumerate(CELLS)), 1).run()
+
+    assert report["status"] == "ok"
+    assert report["replica_fallback_cells"] == [1]
+    assert report["merged"] == []
+    assert sorted(sm.executed) == [0, 1, 2]
+    # Shut down even though it never came up
+    assert len(lifecycle.stopped) == 1
+
+
+@pytest.mark.asyncio
+async def test_replica_failure_cancels_and_interrupts_the_primary(nb_path):
+    lifecycle = _FakeLifecycle(failing={"b = 2"})
+    # Cell 0 never replies: it is still running when the replica fails
+    sm = _FakeSessionManager(lifecycle, hang={0})
+
+    report = await asyncio.wait_for(
+        FanoutRun(sm, nb_path, list(enumerate(CELLS)), 1).run(), timeout=5
+    )
+
+    assert report["status"] == "error"
+    assert report["failed_cell"] == 1
+    assert "ValueError: bad" in report["error"]
+    assert sm.interrupts == 1
+    # Later phases are skipped
+    assert sm.executed == [0]
+    assert len(lifecycle.stopped) == 1
+
+
+@pytest.mark.asyncio
+async def test_primary_timeout_is_reported_and_interrupted(nb_path):
+    sm = _FakeSessionManager(_FakeLifecycle(), hang={0}, timeout=0.2)
+
+    report = await asyncio.wait_for(
+        FanoutRun(sm, nb_path, list(enumerate(CELLS)), 0).run(), timeout=5
+    )
+
+    assert report["status"] == "error"
+    assert report["failed_cell"] == 0
+    assert "TimeoutError" in report["error"]
+    assert "primary kernel interrupted" in report["error"]
+    assert sm.interrupts == 1
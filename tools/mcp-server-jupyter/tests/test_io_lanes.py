@@ -0,0 +1,130 @@
+"""
+Tests for NotebookIOLanes
+=========================
+
+Verifies per-notebook ordering, that one busy notebook cannot take every
+worker, error propagation, queue-wait metrics, idle lane pruning and that
+the synchronous notebook writers run on their notebook's lane.
+"""
+
+import asyncio
+import threading
+import time
+
+import nbformat
+import pytest
+
+from src import notebook
+from src.io_lanes import NotebookIOLanes, notebook_io_lanes
+
+
+@pytest.fixture
+def lanes():
+    lanes = NotebookIOLanes(max_workers=2)
+    yield lanes
+    lanes.shutdown()
+
+
+class TestNotebookIOLanes:
+    async def test_jobs_on_one_notebook_run_in_order(self, lanes, tmp_path):
+        order = []
+
+        def job(i):
+            time.sleep(0.005)
+            order.append(i)
+
+        await asyncio.gather(
+            *(lanes.run(tmp_path / "a.ipynb", job, i) for i in range(10))
+        )
+        assert order == list(range(10))
+
+    async def test_busy_notebook_does_not_starve_others(self, lanes, tmp_path):
+        release = threading.Event()
+        busy = tmp_path / "busy.ipynb"
+
+        # Queue many slow jobs on one notebook; only one may run at a time
+        blocked = [lanes.submit(busy, release.wait, 5) for _ in range(5)]
+
+        started = time.monotonic()
+        result = await lanes.run(tmp_path / "other.ipynb", lambda: "fast")
+        assert result == "fast"
+        assert time.monotonic() - started < 1.0
+
+        release.set()
+        for fut in blocked:
+            fut.result(timeout=5)
+
+    async def test_exceptions_propagate_and_lane_continues(self, lanes, tmp_path):
+        def boom():
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError):
+            await lanes.run(tmp_path / "a.ipynb", boom)
+        assert await lanes.run(tmp_path / "a.ipynb", lambda: 1) == 1
+
+    async def test_wait_metrics(self, lanes, tmp_path):
+        path = tmp_path / "a.ipynb"
+        await asyncio.gather(*(lanes.run(path, time.sleep, 0.01) for _ in range(3)))
+
+        totals = lanes.stats()["totals"]
+        assert totals["completed"] == 3
+        # The last job waited behind the first two
+        assert totals["max_wait_ms"] >= 15
+
+    async def test_idle_lanes_are_dropped(self, lanes, tmp_path):
+        release = threading.Event()
+        busy = tmp_path / "busy.ipynb"
+        blocked = lanes.submit(busy, release.wait, 5)
+        await asyncio.gather(
+            *(lanes.run(tmp_path / f"{i}.ipynb", lambda: None) for i in range(20))
+        )
+
+        stats = lanes.stats()
+        assert list(stats["lanes"]) == [str(busy.resolve())]
+        assert stats["lanes"][str(busy.resolve())]["running"]
+
+        release.set()
+        blocked.result(timeout=5)
+        await lanes.run(busy, lambda: None)
+        assert lanes.stats()["lanes"] == {}
+        assert lanes.stats()["totals"]["completed"] == 22
+
+    async def test_call_from_a_lane_job_runs_inline(self, lanes, tmp_path):
+        path = tmp_path / "a.ipynb"
+        # Would deadlock if the nested call queued behind its own caller
+        result = await lanes.run(path, lanes.call, path, lambda: "nested")
+        assert result == "nested"
+
+
+def test_notebook_writers_wait_for_the_lane(tmp_path):
+    path = tmp_path / "w.ipynb"
+    notebook.create_notebook(str(path))
+
+    release = threading.Event()
+    blocked = notebook_io_lanes.submit(path, release.wait, 5)
+    done = threading.Event()
+
+    def edit():
+        notebook.append_cell(str(path), "x = 1")
+        done.set()
+
+    writer = threading.Thread(target=edit)
+    writer.start()
+    # Queued behind the job already on this notebook's lane
+    assert not done.wait(0.2)
+
+    release.set()
+    blocked.result(timeout=5)
+    writer.join(timeout=5)
+    assert done.is_set()
+    assert nbformat.read(str(path), as_version=4).cells[-1].source == "x = 1"
+
+
+async def test_async_notebook_io_roundtrip(tmp_path):
+    path = tmp_path / "rt.ipynb"
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("x = 1"))
+    await notebook.write_notebook_async(nb, str(path))
+
+    loaded = await notebook.read_notebook_async(str(path))
+    assert loaded.cells[0].source == "x = 1"
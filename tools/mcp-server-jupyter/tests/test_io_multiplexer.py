@@ -5,9 +5,12 @@ Phase 2.3: Validates I/O message routing extracted from SessionManager.
 """
 
 import asyncio
+from queue import Empty
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock
-from src.io_multiplexer import IOMultiplexer
+from src.io_multiplexer import IOMultiplexer, _Listener
+from src.stream_coalescer import StreamCoalescer
 
 
 class MockKernelClient:
@@ -439,6 +442,19 @@ class TestCircuitBreaker:
                 pass
 
 
+def _stdin_once(message):
+    """Awaitable get_msg() that yields one message, then waits forever."""
+    calls = [0]
+
+    async def get_msg(timeout=None):
+        calls[0] += 1
+        if calls[0] == 1:
+            return message
+        await asyncio.Event().wait()
+
+    return get_msg
+
+
 @pytest.mark.asyncio
 class TestStdinHandling:
     """Test input() request handling via stdin listener."""
@@ -454,18 +470,8 @@ class TestStdinHandling:
             "content": {"prompt": "Enter your name: ", "password": False},
         }
 
-        # Make stdin channel return our message once
-        call_count = [0]
-
-        async def mock_msg_ready():
-            call_count[0] += 1
-            return call_count[0] == 1
-
-        async def mock_get_msg(timeout):
-            return stdin_message
-
-        kc.stdin_channel.msg_ready = mock_msg_ready
-        kc.stdin_channel.get_msg = mock_get_msg
+        # Make stdin channel return our message once, then block like an idle socket
+        kc.stdin_channel.get_msg = _stdin_once(stdin_message)
 
         session_data = {"waiting_for_input": False}
 
@@ -512,17 +518,7 @@ class TestStdinHandling:
         }
 
         # Make stdin channel return message once
-        call_count = [0]
-
-        async def mock_msg_ready():
-            call_count[0] += 1
-            return call_count[0] == 1
-
-        async def mock_get_msg(timeout):
-            return stdin_message
-
-        kc.stdin_channel.msg_ready = mock_msg_ready
-        kc.stdin_channel.get_msg = mock_get_msg
+        kc.stdin_channel.get_msg = _stdin_once(stdin_message)
 
         session_data = {"waiting_for_input": False}
 
@@ -552,6 +548,29 @@ class TestStdinHandling:
         assert len(input_calls) == 1
         assert input_calls[0] == ""
 
+    async def test_submitted_input_wakes_watchdog(self):
+        """submit_input's event ends the wait without a timeout or empty input."""
+        mux = IOMultiplexer(input_request_timeout=30)
+        kc = MockKernelClient()
+        input_calls = []
+        kc.input = input_calls.append
+        session_data = {}
+
+        request = asyncio.create_task(
+            mux._handle_input_request(
+                "test.ipynb", kc, {"prompt": "? "}, session_data, None, None
+            )
+        )
+        await asyncio.sleep(0.01)
+        assert session_data["waiting_for_input"] is True
+
+        session_data["waiting_for_input"] = False
+        session_data["input_event"].set()
+        await asyncio.wait_for(request, timeout=1)
+
+        assert input_calls == []
+        assert "input_event" not in session_data
+
 
 @pytest.mark.asyncio
 class TestNotifications:
@@ -609,3 +628,346 @@ class TestNotifications:
         assert params["notebook_path"] == "test.ipynb"
         assert params["exec_id"] == "task-7"
         assert params["type"] == "stream"
+
+
+def _stream_msg(parent_id, text):
+    return {
+        "msg_type": "stream",
+        "parent_header": {"msg_id": parent_id},
+        "content": {"name": "stdout", "text": text},
+        "header": {"msg_type": "stream"},
+    }
+
+
+def _exec_entry(task_id):
+    return {"id": task_id, "cell_index": 0, "outputs": [], "status": "running"}
+
+
+@pytest.mark.asyncio
+class TestParentIdIndex:
+    """Test base-prefix routing over long-lived sessions."""
+
+    async def test_suffix_mismatch_routes_to_latest_execution(self):
+        mux = IOMultiplexer()
+        executions = {}
+        for i in range(2000):
+            mux.register_execution(executions, f"sess_42_{i}", _exec_entry(f"t{i}"))
+
+        await mux._route_message(
+            "test.ipynb", _stream_msg("sess_42_99999", "hi\n"), executions, {},
+            None, None, None,
+        )
+        await mux.stream_coalescer.flush_all()
+
+        assert executions["sess_42_1999"]["outputs"][0]["text"] == "hi\n"
+        assert not mux._message_buffer
+
+    async def test_index_follows_direct_dict_mutation(self):
+        mux = IOMultiplexer()
+        executions = {f"old_1_{i}": _exec_entry(f"o{i}") for i in range(20)}
+        await mux._route_message(
+            "test.ipynb", _stream_msg("old_1_x", "a\n"), executions, {},
+            None, None, None,
+        )
+        await mux.stream_coalescer.flush_all()
+        assert executions["old_1_19"]["outputs"]
+
+        # Executions added and removed without going through the multiplexer
+        executions["new_2_0"] = _exec_entry("n0")
+        del executions["old_1_19"]
+        await mux._route_message(
+            "test.ipynb", _stream_msg("old_1_x", "b\n"), executions, {},
+            None, None, None,
+        )
+        await mux._route_message(
+            "test.ipynb", _stream_msg("new_2_7", "c\n"), executions, {},
+            None, None, None,
+        )
+        await mux.stream_coalescer.flush_all()
+
+        assert executions["old_1_18"]["outputs"][0]["text"] == "b\n"
+        assert executions["new_2_0"]["outputs"][0]["text"] == "c\n"
+
+    async def test_retired_execution_is_not_matched(self):
+        mux = IOMultiplexer()
+        executions = {}
+        for i in range(20):
+            mux.register_execution(executions, f"s_1_{i}", _exec_entry(f"t{i}"))
+        for i in range(20):
+            mux.retire_execution(executions, f"s_1_{i}")
+
+        await mux._route_message(
+            "test.ipynb", _stream_msg("s_1_5", "late\n"), executions, {},
+            None, None, None,
+        )
+        assert "s_1_5" in mux._message_buffer
+
+
+@pytest.mark.asyncio
+class TestOrphanFlushing:
+    """Test event-driven flushing of messages that beat their registration."""
+
+    async def test_register_execution_flushes_orphans(self):
+        mux = IOMultiplexer()
+        kc = MockKernelClient()
+        executions = {}
+        kc.messages.append(_stream_msg("s_1_3", "early\n"))
+
+        async def get_iopub_msg():
+            if kc.messages:
+                return kc.messages.pop(0)
+            await asyncio.sleep(3600)
+
+        kc.get_iopub_msg = get_iopub_msg
+        listener_task = asyncio.create_task(
+            mux.listen_iopub("test.ipynb", kc, executions, {})
+        )
+        await asyncio.sleep(0.05)
+        assert "s_1_3" in mux._message_buffer
+
+        mux.register_execution(executions, "s_1_3", _exec_entry("t3"))
+        await asyncio.gather(*mux._flush_tasks)
+        await mux.stream_coalescer.flush_all()
+
+        assert executions["s_1_3"]["outputs"][0]["text"] == "early\n"
+        assert not mux._message_buffer
+        assert not mux._orphan_bases
+
+        listener_task.cancel()
+        await listener_task
+
+    async def test_messages_do_not_rescan_buffer(self):
+        mux = IOMultiplexer()
+        executions = {"s_1_0": _exec_entry("t0")}
+        for i in range(50):
+            await mux._route_message(
+                "test.ipynb", _stream_msg(f"other_{i}_0", "x\n"), executions, {},
+                None, None, None,
+            )
+        # Every orphan is armed exactly once, not revisited per message
+        assert len(mux._orphan_armed) == 50
+        assert sum(len(ids) for ids in mux._orphan_wheel.values()) == 50
+
+    async def test_expired_orphans_match_direct_registration(self, monkeypatch):
+        mux = IOMultiplexer()
+        executions = {}
+        await mux._route_message(
+            "test.ipynb", _stream_msg("s_1_3", "late\n"), executions, {},
+            None, None, None,
+        )
+        # Registered without the hook: picked up once the orphan expires
+        executions["s_1_3"] = _exec_entry("t3")
+        listener = _Listener("test.ipynb", executions, {}, None, None, None, None)
+        await mux._expire_orphans(listener)
+        assert not executions["s_1_3"]["outputs"]
+
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        monkeypatch.setattr(loop, "time", lambda: now + 2.0)
+        await mux._expire_orphans(listener)
+        await mux.stream_coalescer.flush_all()
+
+        assert executions["s_1_3"]["outputs"][0]["text"] == "late\n"
+        assert not mux._message_buffer
+
+
+@pytest.mark.asyncio
+class TestStreamCoalescing:
+    """Test merging of consecutive stream chunks per execution."""
+
+    async def _route(self, mux, executions, msg, notifications):
+        async def notify(method, params):
+            notifications.append((method, params))
+
+        await mux._route_message(
+            "test.ipynb", msg, executions, {}, None, None, notify,
+        )
+
+    async def test_consecutive_chunks_merge_into_one_output(self):
+        mux = IOMultiplexer(stream_coalescer=StreamCoalescer(window_seconds=10))
+        executions = {"s_1_0": _exec_entry("t0")}
+        notifications = []
+        for i in range(100):
+            await self._route(mux, executions, _stream_msg("s_1_0", f"{i}\n"), notifications)
+        assert not executions["s_1_0"]["outputs"]
+
+        await mux.stream_coalescer.flush_all()
+
+        outputs = executions["s_1_0"]["outputs"]
+        assert len(outputs) == 1
+        assert outputs[0]["text"] == "".join(f"{i}\n" for i in range(100))
+        assert len(notifications) == 1
+        params = notifications[0][1]
+        assert (params["seq_start"], params["seq_end"]) == (1, 100)
+
+    async def test_window_expiry_emits(self):
+        mux = IOMultiplexer(stream_coalescer=StreamCoalescer(window_seconds=0.01))
+        executions = {"s_1_0": _exec_entry("t0")}
+        notifications = []
+        await self._route(mux, executions, _stream_msg("s_1_0", "a"), notifications)
+        await self._route(mux, executions, _stream_msg("s_1_0", "b"), notifications)
+        await asyncio.sleep(0.05)
+
+        assert [o["text"] for o in executions["s_1_0"]["outputs"]] == ["ab"]
+
+    async def test_size_limit_and_interleaving_preserve_order(self):
+        mux = IOMultiplexer(
+            stream_coalescer=StreamCoalescer(window_seconds=10, max_bytes=4)
+        )
+        executions = {"s_1_0": _exec_entry("t0")}
+        notifications = []
+        err = _stream_msg("s_1_0", "E")
+        err["content"]["name"] = "stderr"
+        display = {
+            "msg_type": "display_data",
+            "parent_header": {"msg_id": "s_1_0"},
+            "content": {"data": {"text/plain": "x"}, "metadata": {}},
+            "header": {"msg_type": "display_data"},
+        }
+        for msg in [
+            _stream_msg("s_1_0", "ab"),
+            _stream_msg("s_1_0", "cd"),  # hits max_bytes
+            _stream_msg("s_1_0", "e"),
+            err,  # other stream flushes "e"
+            display,  # flushes "E"
+        ]:
+            await self._route(mux, executions, msg, notifications)
+
+        outputs = executions["s_1_0"]["outputs"]
+        assert [o.get("text") for o in outputs] == ["abcd", "e", "E", None]
+        assert [p.get("seq_start") for _, p in notifications] == [1, 3, 4, None]
+
+    async def test_disabled_window_emits_every_chunk(self):
+        mux = IOMultiplexer(stream_coalescer=StreamCoalescer(window_seconds=0))
+        executions = {"s_1_0": _exec_entry("t0")}
+        notifications = []
+        for text in ["a", "b"]:
+            await self._route(mux, executions, _stream_msg("s_1_0", text), notifications)
+
+        assert [o["text"] for o in executions["s_1_0"]["outputs"]] == ["a", "b"]
+
+
+class _QueuedIOPub:
+    """Kernel client double with non-blocking get_iopub_msg(timeout=0)."""
+
+    def __init__(self, msgs):
+        self.msgs = list(msgs)
+
+    async def get_iopub_msg(self, timeout=None):
+        if self.msgs:
+            return self.msgs.pop(0)
+        if timeout == 0:
+            raise Empty
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+class TestDirectIOPubBatching:
+    """Test draining queued IOPub messages into batch notifications."""
+
+    async def _forward(self, mux, kc):
+        notifications = []
+
+        async def notify(method, params):
+            notifications.append((method, params))
+
+        task = asyncio.create_task(
+            mux.listen_iopub_direct("test.ipynb", kc, notification_callback=notify)
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+        return notifications
+
+    async def test_queued_messages_go_out_as_one_batch(self):
+        mux = IOMultiplexer(iopub_batch_size=4)
+        kc = _QueuedIOPub(_stream_msg("s_1_0", f"{i}\n") for i in range(6))
+
+        notifications = await self._forward(mux, kc)
+
+        assert [method for method, _ in notifications] == [
+            "notebook/iopub_batch",
+            "notebook/iopub_batch",
+        ]
+        texts = [
+            m["content"]["text"]
+            for _, params in notifications
+            for m in params["messages"]
+        ]
+        assert texts == [f"{i}\n" for i in range(6)]
+        assert notifications[0][1]["notebook_path"] == "test.ipynb"
+        assert notifications[0][1]["messages"][0]["msg_id"] == "s_1_0"
+
+    async def test_batch_size_one_sends_single_messages(self):
+        mux = IOMultiplexer(iopub_batch_size=1)
+        kc = _QueuedIOPub(_stream_msg("s_1_0", f"{i}\n") for i in range(3))
+
+        notifications = await self._forward(mux, kc)
+
+        assert [method for method, _ in notifications] == [
+            "notebook/iopub_message"
+        ] * 3
+
+
+@pytest.mark.asyncio
+class TestDirectTracking:
+    """Test registered executions kept current on the direct path."""
+
+    async def test_outputs_and_idle_update_registered_execution(self):
+        mux = IOMultiplexer()
+        executions = {"s_1_0": _exec_entry("t0")}
+        msgs = [
+            _stream_msg("s_1_0", "a\n"),
+            {
+                "msg_type": "clear_output",
+                "parent_header": {"msg_id": "s_1_0"},
+                "content": {"wait": False},
+                "header": {"msg_type": "clear_output"},
+            },
+            _stream_msg("s_1_0", "b\n"),
+            _stream_msg("other_1_0", "ignored\n"),
+            {
+                "msg_type": "status",
+                "parent_header": {"msg_id": "s_1_0"},
+                "content": {"execution_state": "idle"},
+                "header": {"msg_type": "status"},
+            },
+        ]
+        notifications = []
+
+        async def notify(method, params):
+            notifications.append(method)
+
+        await mux.forward_iopub_batch(
+            "test.ipynb", msgs, notification_callback=notify, executions=executions
+        )
+
+        exec_data = executions["s_1_0"]
+        assert [o["text"] for o in exec_data["outputs"]] == ["b\n"]
+        assert exec_data["status"] == "completed"
+        assert exec_data["kernel_state"] == "idle"
+        # Forwarding is unchanged
+        assert notifications == ["notebook/iopub_batch"]
+        # Nothing is buffered for unregistered parents
+        assert not mux._message_buffer
+
+    async def test_error_status_survives_idle(self):
+        mux = IOMultiplexer()
+        executions = {"s_1_0": _exec_entry("t0")}
+        error = {
+            "msg_type": "error",
+            "parent_header": {"msg_id": "s_1_0"},
+            "content": {"ename": "ValueError", "evalue": "x", "traceback": []},
+            "header": {"msg_type": "error"},
+        }
+        idle = {
+            "msg_type": "status",
+            "parent_header": {"msg_id": "s_1_0"},
+            "content": {"execution_state": "idle"},
+            "header": {"msg_type": "status"},
+        }
+
+        mux.track_direct([error, idle], executions)
+
+        assert executions["s_1_0"]["status"] == "error"
+        assert executions["s_1_0"]["outputs"][0]["ename"] == "ValueError"
@@ -0,0 +1,136 @@
+"""
+Tests for the pluggable JSON codec
+==================================
+
+Every backend must round-trip notification payloads, fall back to stdlib
+for objects it cannot encode, and (micro-benchmark) report the per-message
+encoding cost of typical stream and display_data notifications.
+"""
+
+import base64
+import json
+import math
+import time
+
+import pytest
+
+from src import json_codec
+from src.json_codec import StdlibCodec, create_codec
+
+
+def _available_codecs():
+    codecs = [StdlibCodec()]
+    for name in ("orjson", "msgspec"):
+        codec = create_codec(name)
+        if codec.name == name:
+            codecs.append(codec)
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def _stream_message(i=0):
+    return {
+        "jsonrpc": "2.0",
+        "method": "notebook/output",
+        "params": {
+            "notebook_path": "/work/analysis.ipynb",
+            "task_id": "4b1c2d3e-0000-4000-8000-000000000000",
+            "cell_index": 3,
+            "output": {
+                "output_type": "stream",
+                "name": "stdout",
+                "text": f"epoch {i}: loss=0.{i:04d} accuracy=0.98 ✓\n" * 4,
+            },
+            "seq_start": i,
+            "seq_end": i,
+        },
+    }
+
+
+def _display_message(image_bytes=64 * 1024):
+    png = base64.b64encode(b"\x89PNG" + bytes(image_bytes)).decode("ascii")
+    return {
+        "jsonrpc": "2.0",
+        "method": "notebook/output",
+        "params": {
+            "notebook_path": "/work/analysis.ipynb",
+            "task_id": "4b1c2d3e-0000-4000-8000-000000000000",
+            "cell_index": 4,
+            "output": {
+                "output_type": "display_data",
+                "data": {"image/png": png, "text/plain": "<Figure size 640x480>"},
+                "metadata": {"image/png": {"width": 640, "height": 480}},
+            },
+        },
+    }
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_round_trip(codec):
+    for message in (_stream_message(7), _display_message(1024)):
+        assert codec.loads(codec.dumps(message)) == message
+        assert codec.loads(codec.dumpb(message)) == message
+        assert codec.loads(memoryview(codec.dumpb(message))) == message
+        assert json.loads(codec.dumps(message)) == message
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_falls_back_to_stdlib_for_unsupported_objects(codec):
+    # Non-str keys and ints over 64 bits are not accepted by every backend
+    assert json.loads(codec.dumps({1: "a"})) == {"1": "a"}
+    assert codec.loads(codec.dumps({"n": 2**70})) == {"n": 2**70}
+    assert codec.loads(codec.dumps({"x": object()}, default=lambda o: "obj")) == {
+        "x": "obj"
+    }
+    with pytest.raises(TypeError):
+        codec.dumps({"x": object()})
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_indent_and_nan(codec):
+    assert "\n" in codec.dumps({"a": [1, 2]}, indent=True)
+    # stdlib writes NaN; the fast backends write null. Both decode.
+    value = codec.loads(codec.dumps({"v": float("nan")}))["v"]
+    assert value is None or math.isnan(value)
+    assert codec.loads('{"v": NaN}')["v"] != 0
+
+
+def test_unknown_codec_falls_back(monkeypatch):
+    monkeypatch.setenv("MCP_JSON_CODEC", "stdlib")
+    assert create_codec().name == "stdlib"
+    assert create_codec("no-such-codec").name in {"orjson", "msgspec", "stdlib"}
+
+
+def test_module_functions_use_selected_codec():
+    message = _stream_message()
+    assert json_codec.loads(json_codec.dumpb(message)) == message
+    assert json_codec.codec.name in {"orjson", "msgspec", "stdlib"}
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "payload",
+    [_stream_message(), _display_message()],
+    ids=["stream", "display_data_64k"],
+)
+def test_encoding_cost_per_message(payload, capsys):
+    """Micro-benchmark: per-message encode cost of each installed backend."""
+    rounds = 2000 if payload["params"]["output"]["output_type"] == "stream" else 200
+    costs = {}
+    for codec in CODECS:
+        codec.dumpb(payload)  # warm up
+        start = time.perf_counter()
+        for _ in range(rounds):
+            codec.dumpb(payload)
+        costs[codec.name] = (time.perf_counter() - start) / rounds
+
+    with capsys.disabled():
+        print()
+        for name, cost in costs.items():
+            speedup = costs["stdlib"] / cost if cost else float("inf")
+            print(f"  {name:8s} {cost * 1e6:9.1f} µs/message  ({speedup:4.1f}x stdlib)")
+
+    # Generous bound: this is a report, not a tight performance gate
+    assert all(cost < 0.01 for cost in costs.values())
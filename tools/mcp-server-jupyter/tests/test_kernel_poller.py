@@ -0,0 +1,127 @@
+"""
+Tests for KernelChannelPoller
+=============================
+
+Verifies that one reader task serves many kernels' channels, that messages
+arrive in order and in batches, and that unregistered kernels stop being
+read.
+"""
+
+import asyncio
+from queue import Empty
+
+import pytest
+import zmq
+import zmq.asyncio
+
+from src.kernel_poller import KernelChannelPoller
+
+
+class _Channel:
+    """Minimal async channel over a zmq.asyncio socket (like jupyter_client's)."""
+
+    def __init__(self, socket):
+        self.socket = socket
+
+    async def get_msg(self, timeout=None):
+        timeout_ms = None if timeout is None else int(timeout * 1000)
+        if await self.socket.poll(timeout_ms):
+            return await self.socket.recv_json()
+        raise Empty
+
+
+class _Kernel:
+    """Kernel client double whose iopub/stdin channels are PAIR sockets."""
+
+    def __init__(self, ctx, name):
+        self.senders = {}
+        for channel in ("iopub", "stdin"):
+            address = f"inproc://{name}-{channel}"
+            receiver = ctx.socket(zmq.PAIR)
+            receiver.bind(address)
+            sender = ctx.socket(zmq.PAIR)
+            sender.connect(address)
+            setattr(self, f"{channel}_channel", _Channel(receiver))
+            self.senders[channel] = sender
+
+    async def send(self, channel, msg):
+        await self.senders[channel].send_json(msg)
+
+
+@pytest.fixture
+def ctx():
+    context = zmq.asyncio.Context()
+    yield context
+    context.destroy(linger=0)
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_one_task_reads_every_kernel(ctx):
+    poller = KernelChannelPoller(batch_size=16)
+    received = {}
+    kernels = [_Kernel(ctx, f"k{i}") for i in range(20)]
+    tasks_before = len(asyncio.all_tasks())
+
+    for i, kernel in enumerate(kernels):
+        key = f"nb{i}.ipynb"
+
+        async def on_iopub(msgs, key=key):
+            received.setdefault(key, []).extend(m["n"] for m in msgs)
+
+        poller.register(key, kernel, on_iopub)
+
+    # Twenty kernels, one reader task
+    assert len(asyncio.all_tasks()) == tasks_before + 1
+    assert KernelChannelPoller.supports(kernels[0])
+
+    for kernel in kernels:
+        for n in range(40):
+            await kernel.send("iopub", {"n": n})
+
+    await _wait_for(lambda: sum(len(v) for v in received.values()) == 20 * 40)
+    assert all(received[f"nb{i}.ipynb"] == list(range(40)) for i in range(20))
+    # Ready messages are read in batches, not one poll per message
+    assert poller.polls < 20 * 40
+
+    await poller.close()
+
+
+@pytest.mark.asyncio
+async def test_stdin_and_unregister(ctx):
+    poller = KernelChannelPoller()
+    kernel = _Kernel(ctx, "solo")
+    iopub, stdin = [], []
+
+    async def on_iopub(msgs):
+        iopub.extend(msgs)
+
+    async def on_stdin(msgs):
+        stdin.extend(msgs)
+
+    poller.register("solo.ipynb", kernel, on_iopub, on_stdin)
+    await kernel.send("stdin", {"prompt": "?"})
+    await _wait_for(lambda: stdin)
+    assert stdin == [{"prompt": "?"}]
+
+    poller.unregister("solo.ipynb")
+    assert "solo.ipynb" not in poller
+    await kernel.send("iopub", {"n": 1})
+    await asyncio.sleep(0.05)
+    assert iopub == []
+
+    await poller.close()
+
+
+def test_supports_rejects_clients_without_zmq_sockets():
+    class Fake:
+        iopub_channel = object()
+        stdin_channel = object()
+
+    assert not KernelChannelPoller.supports(Fake())
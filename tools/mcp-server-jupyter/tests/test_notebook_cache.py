@@ -0,0 +1,159 @@
+"""
+Tests for NotebookDocumentCache
+================================
+
+Verifies stat-based invalidation, LRU byte budget eviction, copy-on-write
+checkouts and cache population after atomic writes.
+"""
+
+import os
+
+import nbformat
+import pytest
+
+from src import notebook
+from src.notebook_cache import NotebookDocumentCache, notebook_cache
+
+
+def _write_nb(path, sources):
+    nb = nbformat.v4.new_notebook()
+    for src in sources:
+        cell = nbformat.v4.new_code_cell(src)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="out")]
+        nb.cells.append(cell)
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    return _write_nb(tmp_path / "cached.ipynb", ["a = 1", "b = a + 1"])
+
+
+class TestNotebookDocumentCache:
+    def test_unchanged_file_is_not_reparsed(self, nb_path):
+        cache = NotebookDocumentCache()
+        first = cache.get(nb_path)
+        second = cache.get(nb_path)
+
+        assert first is second
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_external_write_invalidates(self, nb_path, tmp_path):
+        cache = NotebookDocumentCache()
+        first = cache.get(nb_path)
+
+        # Rewrite via a different file + replace, like an editor save
+        other = _write_nb(tmp_path / "other.ipynb", ["c = 3"])
+        os.replace(other, nb_path)
+
+        second = cache.get(nb_path)
+        assert second is not first
+        assert second.cells[0].source == "c = 3"
+
+    def test_byte_budget_evicts_least_recently_used(self, tmp_path):
+        a = _write_nb(tmp_path / "a.ipynb", ["x = 1"])
+        b = _write_nb(tmp_path / "b.ipynb", ["y = 2"])
+        budget = os.path.getsize(a) + os.path.getsize(b) - 1
+
+        cache = NotebookDocumentCache(max_bytes=budget)
+        cache.get(a)
+        cache.get(b)
+
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["bytes"] <= budget
+
+        # 'a' was evicted, so this is a miss
+        cache.get(a)
+        assert cache.stats()["misses"] == 3
+
+    def test_checkout_is_private(self, nb_path):
+        cache = NotebookDocumentCache()
+        shared = cache.get(nb_path)
+        private = cache.checkout(nb_path)
+
+        private.cells[0].source = "changed"
+        private.cells[0].metadata["tags"] = ["x"]
+        private.cells[1].outputs.append(
+            nbformat.v4.new_output("stream", name="stdout", text="more")
+        )
+        private.metadata["kernelspec"] = {"name": "other"}
+        private.cells.pop()
+
+        assert shared.cells[0].source == "a = 1"
+        assert "tags" not in shared.cells[0].metadata
+        assert len(shared.cells[1].outputs) == 1
+        assert "kernelspec" not in shared.metadata
+        assert len(shared.cells) == 2
+
+        # Output payloads are shared rather than copied
+        assert private.cells[0].outputs[0] is shared.cells[0].outputs[0]
+
+
+class TestNotebookHelpersUseCache:
+    def test_write_populates_cache(self, nb_path):
+        notebook.edit_cell(nb_path, 0, "a = 42")
+
+        misses_before = notebook_cache.stats()["misses"]
+        cell = notebook.read_cell(nb_path, 0)
+        assert cell["source"] == "a = 42"
+        assert notebook_cache.stats()["misses"] == misses_before
+
+    def test_read_cell_returns_copy(self, nb_path):
+        cell = notebook.read_cell(nb_path, 0)
+        cell["metadata"]["tags"] = ["mutated"]
+
+        assert "tags" not in notebook.read_cell(nb_path, 0)["metadata"]
+
+    def test_save_cell_execution_does_not_alias_caller_list(self, nb_path):
+        outputs = [nbformat.v4.new_output("stream", name="stdout", text="1")]
+        notebook.save_cell_execution(nb_path, 0, outputs, execution_count=1)
+        outputs.append(nbformat.v4.new_output("stream", name="stdout", text="2"))
+
+        assert len(notebook.get_cell_outputs(nb_path, 0)) == 1
+
+
+class TestDerivedValues:
+    def test_derive_builds_once_per_document(self, nb_path):
+        cache = NotebookDocumentCache()
+        nb = cache.get(nb_path)
+        calls = []
+
+        def build():
+            calls.append(1)
+            return "value"
+
+        assert cache.derive(nb_path, nb, "k", build, size=len) == "value"
+        assert cache.derive(nb_path, nb, "k", build, size=len) == "value"
+        assert len(calls) == 1
+        assert cache.stats()["bytes"] == os.path.getsize(nb_path) + len("value")
+
+        # A new document (after a write) starts without derived values
+        notebook.edit_cell(nb_path, 0, "a = 2")
+        cache.store(nb_path, notebook_cache.get(nb_path))
+        cache.derive(nb_path, cache.get(nb_path), "k", build)
+        assert len(calls) == 2
+
+    def test_read_cell_smart_uses_line_index(self, tmp_path):
+        path = tmp_path / "long.ipynb"
+        nb = nbformat.v4.new_notebook()
+        cell = nbformat.v4.new_code_cell("for i in range(50000): print(i)")
+        cell.outputs = [
+            nbformat.v4.new_output(
+                "stream", name="stdout", text="\n".join(str(i) for i in range(50000))
+            )
+        ]
+        nb.cells.append(cell)
+        with open(path, "w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+
+        summary = notebook.read_cell_smart(str(path), 0, "output", "summary")
+        assert "0\n1\n2\n3\n4\n\n... (49990 lines hidden) ...\n\n49995" in summary
+
+        sliced = notebook.read_cell_smart(str(path), 0, "output", "slice", [-3, -1])
+        assert sliced.endswith("49997\n49998\n49999")
+        sliced = notebook.read_cell_smart(str(path), 0, "output", "slice", [100, 102])
+        assert sliced.endswith("OUTPUT ---\n\n100\n101")
@@ -128,3 +128,74 @@ def test_search_notebook(dummy_notebook):
     # Search for missing
     result_missing = notebook.search_notebook(dummy_notebook, "NonExistent")
     assert "No matches found" in result_missing
+
+
+def test_apply_notebook_edits_single_write(dummy_notebook, monkeypatch):
+    writes = []
+    real_write = notebook._atomic_write_notebook
+
+    def counting_write(nb, path, **kwargs):
+        writes.append(path)
+        real_write(nb, path, **kwargs)
+
+    monkeypatch.setattr(notebook, "_atomic_write_notebook", counting_write)
+
+    res = notebook.apply_notebook_edits(
+        dummy_notebook,
+        [
+            {"op": "insert", "index": 0, "content": "import os", "cell_type": "code"},
+            {"op": "edit", "index": 1, "content": "print('Edited')"},
+            {"op": "delete", "index": -1},
+            {"op": "move", "from_index": 2, "to_index": 0},
+            {"op": "tag", "index": 0, "add": ["setup", "x"], "remove": ["x"]},
+            {"op": "metadata", "metadata": {"custom": {"k": 1}}},
+            {"op": "insert", "content": "# Notes", "cell_type": "markdown"},
+        ],
+    )
+
+    assert len(writes) == 1
+    assert "Applied 7 edits" in res
+
+    with open(dummy_notebook, "r") as f:
+        nb = nbformat.read(f, as_version=4)
+
+    assert [c.source for c in nb.cells] == [
+        "print('Cell 1')",
+        "import os",
+        "print('Edited')",
+        "# Notes",
+    ]
+    assert nb.cells[0].metadata["tags"] == ["setup"]
+    assert nb.cells[3].cell_type == "markdown"
+    assert nb.metadata["custom"] == {"k": 1}
+
+
+def test_apply_notebook_edits_by_cell_id(dummy_notebook):
+    outline = notebook.get_notebook_outline(dummy_notebook)
+    target = outline[2]["id"]
+
+    notebook.apply_notebook_edits(
+        dummy_notebook, [{"op": "edit", "cell_id": target, "content": "z = 3"}]
+    )
+
+    with open(dummy_notebook, "r") as f:
+        nb = nbformat.read(f, as_version=4)
+    assert nb.cells[2].source == "z = 3"
+
+
+def test_apply_notebook_edits_is_all_or_nothing(dummy_notebook):
+    before = Path(dummy_notebook).read_text()
+
+    with pytest.raises(ValueError, match="Edit op 1"):
+        notebook.apply_notebook_edits(
+            dummy_notebook,
+            [
+                {"op": "edit", "index": 0, "content": "changed"},
+                {"op": "delete", "index": 99},
+            ],
+        )
+
+    assert Path(dummy_notebook).read_text() == before
+
+    with pytest.raises(ValueError, match="Unknown op"):
+        notebook.apply_notebook_edits(dummy_notebook, [{"op": "explode"}])
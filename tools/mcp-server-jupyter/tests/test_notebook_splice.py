@@ -0,0 +1,182 @@
+"""
+Tests for the splice writer
+===========================
+
+Verifies that splicing unchanged cells produces exactly the bytes
+nbformat.write would, for edits, inserts, deletes, moves and execution
+results, and that unusual files fall back to a full write.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import nbformat
+import pytest
+
+from src import notebook, notebook_splice
+from src.notebook_cache import notebook_cache
+
+
+@pytest.fixture
+def splice_always(monkeypatch):
+    monkeypatch.setattr(notebook_splice, "SPLICE_MIN_BYTES", 1)
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3"}
+    for i in range(6):
+        cell = nbformat.v4.new_code_cell(f"x = {i}\nprint(x)")
+        cell.id = f"c{i}"
+        cell.outputs = [
+            nbformat.v4.new_output("stream", name="stdout", text=f"{i}\n" * 3),
+            nbformat.v4.new_output(
+                "display_data", data={"image/png": "iVBORw0K" * 50, "text/plain": "<img>"}
+            ),
+        ]
+        cell.execution_count = i + 1
+        nb.cells.append(cell)
+    md = nbformat.v4.new_markdown_cell("# Title\nünïcode ✓")
+    md.id = "md"
+    nb.cells.insert(0, md)
+
+    path = tmp_path / "splice.ipynb"
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+def _expected_bytes(path):
+    """What a full nbformat.write of the current document produces."""
+    with open(path, encoding="utf-8") as f:
+        nb = nbformat.read(f, as_version=4)
+    return nbformat.writes(nb).encode("utf-8") + b"\n"
+
+
+def _count_splices(monkeypatch):
+    calls = []
+    original = notebook_splice.try_splice_write
+
+    def counting(nb, path, temp_fd):
+        result = original(nb, path, temp_fd)
+        calls.append(result is not None)
+        return result
+
+    monkeypatch.setattr(notebook_splice, "try_splice_write", counting)
+    return calls
+
+
+class TestSpliceWrite:
+    @pytest.mark.parametrize(
+        "edit",
+        [
+            lambda p: notebook.edit_cell(p, 3, "y = 2"),
+            lambda p: notebook.insert_cell(p, 2, "inserted = True"),
+            lambda p: notebook.delete_cell(p, 4),
+            lambda p: notebook.move_cell(p, 1, 5),
+            lambda p: notebook.save_cell_execution(
+                p, 2, [{"output_type": "stream", "name": "stdout", "text": "new\n"}], 9
+            ),
+        ],
+        ids=["edit", "insert", "delete", "move", "execution"],
+    )
+    def test_output_is_byte_identical(self, nb_path, splice_always, monkeypatch, edit):
+        calls = _count_splices(monkeypatch)
+        notebook_cache.get(nb_path)
+
+        edit(nb_path)
+
+        assert calls == [True]
+        with open(nb_path, "rb") as f:
+            assert f.read() == _expected_bytes(nb_path)
+
+    def test_consecutive_splices_reuse_new_spans(self, nb_path, splice_always, monkeypatch):
+        notebook_cache.get(nb_path)
+        notebook.edit_cell(nb_path, 1, "first edit")
+
+        scans = []
+        original = notebook_splice.scan_cell_spans
+        monkeypatch.setattr(
+            notebook_splice,
+            "scan_cell_spans",
+            lambda path: scans.append(path) or original(path),
+        )
+        notebook.edit_cell(nb_path, 4, "second edit")
+
+        assert scans == []
+        with open(nb_path, "rb") as f:
+            assert f.read() == _expected_bytes(nb_path)
+
+    def test_cells_without_ids_on_disk_are_rewritten(
+        self, nb_path, splice_always, monkeypatch
+    ):
+        # nbformat.read fills in the ids this 4.5 file is missing
+        with open(nb_path, encoding="utf-8") as f:
+            data = json.load(f)
+        for cell in data["cells"]:
+            del cell["id"]
+        with open(nb_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, indent=1, sort_keys=True, ensure_ascii=False) + "\n")
+
+        calls = _count_splices(monkeypatch)
+        cached_ids = [cell.id for cell in notebook_cache.get(nb_path).cells]
+        notebook.edit_cell(nb_path, 3, "y = 2")
+
+        # Nothing matched the file's (missing) ids, so nothing was copied
+        assert calls == [False]
+        with open(nb_path, encoding="utf-8") as f:
+            assert [cell.get("id") for cell in json.load(f)["cells"]] == cached_ids
+        with open(nb_path, "rb") as f:
+            assert f.read() == _expected_bytes(nb_path)
+
+    def test_kernel_copy_failure_falls_back_to_read_write(
+        self, nb_path, splice_always, monkeypatch
+    ):
+        def unsupported(*args):
+            raise OSError("EXDEV")
+
+        monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+        notebook_cache.get(nb_path)
+        notebook.edit_cell(nb_path, 3, "y = 2")
+
+        with open(nb_path, "rb") as f:
+            assert f.read() == _expected_bytes(nb_path)
+
+
+class TestFallback:
+    def test_small_notebooks_use_full_write(self, nb_path, monkeypatch):
+        monkeypatch.setattr(notebook_splice, "SPLICE_MIN_BYTES", 1 << 40)
+        calls = _count_splices(monkeypatch)
+        notebook_cache.get(nb_path)
+        notebook.edit_cell(nb_path, 0, "small")
+        assert calls == [False]
+
+    def test_foreign_formatting_uses_full_write(self, nb_path, splice_always, monkeypatch):
+        # Compact JSON written by another tool: cells can't be copied verbatim
+        with open(nb_path, encoding="utf-8") as f:
+            data = json.load(f)
+        with open(nb_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        calls = _count_splices(monkeypatch)
+        notebook_cache.get(nb_path)
+        notebook.edit_cell(nb_path, 0, "reformatted")
+
+        assert calls == [False]
+        with open(nb_path, "rb") as f:
+            assert f.read() == _expected_bytes(nb_path)
+
+    def test_file_changed_behind_cache_uses_full_write(
+        self, nb_path, splice_always, monkeypatch
+    ):
+        calls = _count_splices(monkeypatch)
+        nb = notebook_cache.checkout(nb_path)
+        nb.cells[0].source = "edited elsewhere"
+        with open(nb_path, "a", encoding="utf-8") as f:
+            f.write("\n")
+
+        notebook._atomic_write_notebook(nb, Path(nb_path))
+        assert calls == [False]
+        assert notebook.read_cell(nb_path, 0)["source"] == "edited elsewhere"
@@ -0,0 +1,108 @@
+"""
+Tests for the streaming notebook skeleton reader
+================================================
+
+Verifies that the skeleton matches nbformat for everything outline, search
+and validate use, while outputs are only counted.
+"""
+
+import json
+
+import nbformat
+import pytest
+
+from src import notebook
+from src.notebook_stream import SkeletonCache, scan_notebook_skeleton
+
+
+@pytest.fixture
+def plot_notebook(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3"}
+    code = nbformat.v4.new_code_cell('plt.plot(x)\nprint("done \\"quoted\\"")')
+    code.execution_count = 3
+    code.outputs = [
+        nbformat.v4.new_output(
+            "display_data", data={"image/png": "iVBORw0KGgo" * 50000}
+        ),
+        nbformat.v4.new_output("stream", name="stdout", text='{"[not json]\\'),
+    ]
+    nb.cells = [
+        nbformat.v4.new_markdown_cell("# Title with ünïcode"),
+        code,
+        nbformat.v4.new_code_cell(""),
+    ]
+    path = tmp_path / "plots.ipynb"
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+class TestSkeletonReader:
+    def test_matches_nbformat_without_outputs(self, plot_notebook):
+        full = nbformat.read(plot_notebook, as_version=4)
+        skeleton = scan_notebook_skeleton(plot_notebook)
+
+        assert skeleton.nbformat == full.nbformat
+        assert skeleton.nbformat_minor == full.nbformat_minor
+        assert skeleton.metadata == full.metadata
+        assert len(skeleton.cells) == len(full.cells)
+        for sk_cell, cell in zip(skeleton.cells, full.cells):
+            assert sk_cell.id == cell.id
+            assert sk_cell.cell_type == cell.cell_type
+            assert sk_cell.source == cell.source
+            assert "outputs" not in sk_cell
+
+        assert skeleton.cells[1].output_count == 2
+        assert skeleton.cells[1].execution_count == 3
+        assert skeleton.cells[2].output_count == 0
+
+    def test_list_source_is_joined(self, tmp_path):
+        raw = {
+            "nbformat": 4,
+            "nbformat_minor": 5,
+            "metadata": {},
+            "cells": [
+                {
+                    "cell_type": "code",
+                    "id": "abc",
+                    "metadata": {},
+                    "source": ["x = 1\n", "y = 2"],
+                    "outputs": [],
+                    "execution_count": None,
+                }
+            ],
+        }
+        path = tmp_path / "list_source.ipynb"
+        path.write_text(json.dumps(raw))
+
+        assert scan_notebook_skeleton(path).cells[0].source == "x = 1\ny = 2"
+
+    def test_malformed_file_raises(self, tmp_path):
+        path = tmp_path / "broken.ipynb"
+        path.write_text('{"cells": [')
+        with pytest.raises(ValueError):
+            scan_notebook_skeleton(path)
+
+    def test_cache_reuses_until_file_changes(self, plot_notebook):
+        cache = SkeletonCache()
+        first = cache.get(plot_notebook)
+        assert cache.get(plot_notebook) is first
+
+        notebook.edit_cell(plot_notebook, 2, "z = 3")
+        assert cache.get(plot_notebook).cells[2].source == "z = 3"
+
+
+class TestHelpersUseSkeleton:
+    def test_outline_search_validate(self, plot_notebook):
+        outline = notebook.get_notebook_outline(plot_notebook)
+        assert [c["state"] for c in outline] == ["fresh", "executed", "fresh"]
+
+        result = notebook.search_notebook(plot_notebook, "plt.plot")
+        assert "Cell 1 (Line 1)" in result
+        # Output text is not searched
+        assert "No matches" in notebook.search_notebook(plot_notebook, "iVBOR")
+
+        report = notebook.validate_notebook(plot_notebook)
+        assert report["valid"] is True
+        assert report["cell_count"] == 3
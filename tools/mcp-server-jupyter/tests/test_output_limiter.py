@@ -0,0 +1,187 @@
+"""
+Tests for OutputRateLimiter
+===========================
+
+Per-execution token buckets: bursts are merged and delayed, the tail is
+always delivered (before the status that follows it), every message sent
+costs a token, and executions do not share a budget.
+"""
+
+import asyncio
+
+import pytest
+
+from src.output_limiter import OutputRateLimiter, coalesce
+
+
+def _stream(task_id, text, seq, name="stdout"):
+    return {
+        "method": "notebook/output",
+        "params": {
+            "notebook_path": "nb.ipynb",
+            "task_id": task_id,
+            "output": {"output_type": "stream", "name": name, "text": text},
+            "seq_start": seq,
+            "seq_end": seq,
+        },
+    }
+
+
+def _display(task_id):
+    return {
+        "method": "notebook/output",
+        "params": {
+            "notebook_path": "nb.ipynb",
+            "task_id": task_id,
+            "output": {"output_type": "display_data", "data": {}, "metadata": {}},
+        },
+    }
+
+
+def test_coalesce_merges_runs_of_one_stream():
+    messages = [
+        _stream("t", "a", 1),
+        _stream("t", "b", 2),
+        _stream("t", "!", 3, name="stderr"),
+        _display("t"),
+        _stream("t", "c", 4),
+    ]
+
+    merged = coalesce(messages)
+
+    assert [m["params"]["output"].get("text") for m in merged] == ["ab", "!", None, "c"]
+    assert merged[0]["params"]["coalesced"] == 2
+    assert (merged[0]["params"]["seq_start"], merged[0]["params"]["seq_end"]) == (1, 2)
+    assert "coalesced" not in merged[1]["params"]
+    # Inputs are not mutated
+    assert messages[0]["params"]["output"]["text"] == "a"
+    # Non-stream messages pass through as the same object
+    assert merged[2] is messages[3]
+
+
+@pytest.mark.asyncio
+async def test_burst_is_delayed_not_dropped():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    limiter = OutputRateLimiter(send, rate=20, burst=2)
+    for i in range(10):
+        await limiter.submit(_stream("t", f"{i}", i))
+
+    assert len(sent) == 2
+    assert limiter.pending_count() == 8
+
+    await asyncio.sleep(0.1)
+
+    assert limiter.pending_count() == 0
+    assert "".join(m["params"]["output"]["text"] for m in sent) == "0123456789"
+    assert sent[-1]["params"]["coalesced"] == 8
+
+
+def test_coalesce_keeps_counts_of_requeued_merges():
+    first = coalesce([_stream("t", "a", 1), _stream("t", "b", 2)])
+
+    merged = coalesce(first + [_stream("t", "c", 3)])
+
+    assert merged[0]["params"]["output"]["text"] == "abc"
+    assert merged[0]["params"]["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_each_flushed_message_costs_a_token():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    limiter = OutputRateLimiter(send, rate=5, burst=1)
+    for _ in range(4):
+        await limiter.submit(_display("t"))
+    assert len(sent) == 1
+
+    # One refill (200 ms) pays for one display, not the whole tail
+    await asyncio.sleep(0.3)
+    assert len(sent) == 2
+    assert limiter.pending_count() == 2
+
+    await asyncio.sleep(0.6)
+    assert len(sent) == 4
+    assert limiter.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_forced_flush_sends_everything_and_charges_for_it():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    limiter = OutputRateLimiter(send, rate=1, burst=1)
+    for _ in range(4):
+        await limiter.submit(_display("t"))
+
+    await limiter.flush("nb.ipynb")
+
+    assert len(sent) == 4
+    bucket = next(iter(limiter._buckets.values()))
+    assert bucket.tokens < -2
+
+
+@pytest.mark.asyncio
+async def test_forced_flush_waits_for_a_flush_in_progress():
+    sent = []
+
+    async def send(message):
+        # Slow client: the timer flush is still sending when the status comes
+        await asyncio.sleep(0.05)
+        sent.append(message["params"].get("n", message["method"]))
+
+    # A frozen clock: no refills, so only the timer flush sends the tail
+    limiter = OutputRateLimiter(send, rate=100, burst=1, clock=lambda: 0.0)
+    for n in range(5):
+        message = _display("t")
+        message["params"]["n"] = n
+        await limiter.submit(message)
+    # The timer flush is sending message 1
+    await asyncio.sleep(0.03)
+    assert sent == [0]
+
+    await limiter.flush("nb.ipynb")
+    await send({"method": "notebook/status", "params": {}})
+
+    assert sent == [0, 1, 2, 3, 4, "notebook/status"]
+    assert limiter.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_executions_have_separate_buckets():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    limiter = OutputRateLimiter(send, rate=1, burst=1)
+    await limiter.submit(_stream("a", "x", 1))
+    await limiter.submit(_stream("a", "y", 2))
+    await limiter.submit(_stream("b", "z", 1))
+
+    assert [m["params"]["task_id"] for m in sent] == ["a", "b"]
+
+    await limiter.flush("nb.ipynb")
+    assert [m["params"]["output"]["text"] for m in sent] == ["x", "z", "y"]
+
+
+@pytest.mark.asyncio
+async def test_zero_rate_disables_limiting():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    limiter = OutputRateLimiter(send, rate=0)
+    for i in range(5):
+        await limiter.submit(_stream("t", f"{i}", i))
+
+    assert len(sent) == 5
@@ -0,0 +1,126 @@
+"""
+Tests for SpillableOutputs
+==========================
+
+Verifies that execution outputs past the memory ceiling go to an
+append-only spill file, and that the accumulator still reads like the
+list it replaces, including for save_cell_execution.
+"""
+
+import gc
+import json
+import os
+
+import nbformat
+import pytest
+
+from src import notebook, output_spill
+from src.output_spill import SpillableOutputs
+
+
+def _output(text):
+    return nbformat.v4.new_output("stream", name="stdout", text=text)
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    return SpillableOutputs(tmp_path / "spill", memory_limit_bytes=10)
+
+
+def test_small_outputs_stay_in_memory(tmp_path):
+    outputs = SpillableOutputs(tmp_path / "spill", memory_limit_bytes=1024)
+    outputs.append(_output("hello"))
+
+    assert not outputs.spilled
+    assert outputs.spill_path is None
+    assert outputs == [_output("hello")]
+
+
+def test_overflow_spills_in_order(outputs):
+    texts = [f"line {i}\n" for i in range(20)]
+    for text in texts:
+        outputs.append(_output(text))
+
+    assert outputs.spilled
+    assert os.path.exists(outputs.spill_path)
+    assert outputs.stats()["in_memory"] == 1
+    assert len(outputs) == 20
+    assert [o["text"] for o in outputs] == texts
+    assert outputs[5].text == texts[5]
+    assert outputs[-1]["text"] == texts[-1]
+    assert [o["text"] for o in outputs[18:]] == texts[18:]
+    with pytest.raises(IndexError):
+        outputs[20]
+
+
+def test_clear_removes_spill_file(outputs):
+    for i in range(5):
+        outputs.append(_output(f"text {i}"))
+    path = outputs.spill_path
+
+    outputs.clear()
+
+    assert len(outputs) == 0
+    assert not os.path.exists(path)
+    outputs.append(_output("after"))
+    assert [o["text"] for o in outputs] == ["after"]
+
+
+def test_spill_file_removed_on_collection(tmp_path):
+    outputs = SpillableOutputs(tmp_path / "spill", memory_limit_bytes=10)
+    for i in range(5):
+        outputs.append(_output(f"text {i}"))
+    path = outputs.spill_path
+
+    del outputs
+    gc.collect()
+
+    assert not os.path.exists(path)
+
+
+def test_save_cell_execution_keeps_spilled_outputs_on_disk(tmp_path, outputs):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell("print('x')")]
+    nb_path = tmp_path / "spill.ipynb"
+    with open(nb_path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+
+    texts = [f"row {i}\n" for i in range(50)]
+    for text in texts:
+        outputs.append(_output(text))
+    head = len(outputs.head())
+    assert outputs.spilled and 0 < head < len(texts)
+
+    # The spilled tail must not be read back into memory
+    def fail(*args, **kwargs):
+        raise AssertionError("spilled outputs were materialized")
+
+    SpillableOutputs.__iter__, original = fail, SpillableOutputs.__iter__
+    try:
+        notebook.save_cell_execution(str(nb_path), 0, outputs, execution_count=1)
+    finally:
+        SpillableOutputs.__iter__ = original
+
+    saved = nbformat.read(str(nb_path), as_version=4)
+    saved_outputs = saved.cells[0].outputs
+    assert [o["text"] for o in saved_outputs[:-1]] == texts[:head]
+    stub = saved_outputs[-1]["text"]
+    assert f"{len(texts) - head} more outputs" in stub
+
+    asset = tmp_path / "assets" / f"outputs_{outputs.name}.jsonl"
+    assert f"assets/{asset.name}" in stub
+    with open(asset, encoding="utf-8") as f:
+        tail = [json.loads(line)["text"] for line in f]
+    assert tail == texts[head:]
+
+    # The asset outlives the accumulator's spill file
+    outputs.clear()
+    assert asset.exists()
+
+
+def test_persistable_outputs_copies_plain_lists(tmp_path):
+    plain = [_output("a\n")]
+    copied = output_spill.persistable_outputs(plain, tmp_path / "nb.ipynb")
+    assert copied == plain and copied is not plain
+    assert output_spill.persistable_outputs(None, tmp_path / "nb.ipynb") == []
+    assert not (tmp_path / "assets").exists()
@@ -0,0 +1,158 @@
+"""
+Tests for the content-addressed output blob store
+=================================================
+
+Verifies that large payloads are moved out of the notebook and dedupe
+across cells and re-runs, that reference counts follow output changes,
+that garbage collection only removes unreferenced blobs, and that
+get_cell_outputs restores the original bundle.
+"""
+
+import base64
+import os
+
+import nbformat
+import pytest
+
+from src import notebook, output_store
+
+PNG = base64.b64encode(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 400).decode("ascii")
+
+
+def _png_output(png=PNG):
+    return nbformat.v4.new_output(
+        "display_data", data={"image/png": png, "text/plain": "<Figure>"}
+    )
+
+
+@pytest.fixture
+def blob_store_enabled(monkeypatch):
+    monkeypatch.setattr(output_store, "_ENABLED", True)
+    monkeypatch.setattr(output_store, "MIN_BLOB_BYTES", 1024)
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(f"plot({i})") for i in range(3)]
+    path = tmp_path / "plots.ipynb"
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+def _blobs(nb_path):
+    return sorted(output_store.get_store(nb_path).blob_dir.glob("*/*"))
+
+
+class TestExternalize:
+    def test_large_payload_is_stored_once(self, nb_path, blob_store_enabled):
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 1)
+        notebook.save_cell_execution(nb_path, 1, [_png_output()], 2)
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 3)  # re-run
+
+        blobs = _blobs(nb_path)
+        assert len(blobs) == 1
+        assert blobs[0].suffix == ".png"
+        assert blobs[0].read_bytes().startswith(b"\x89PNG")
+
+        with open(nb_path, encoding="utf-8") as f:
+            assert PNG not in f.read()
+
+        store = output_store.get_store(nb_path)
+        assert store.refcount(blobs[0].stem) == 2
+
+    def test_small_payloads_stay_inline(self, nb_path, blob_store_enabled):
+        notebook.save_cell_execution(nb_path, 0, [_png_output("aGVsbG8=")], 1)
+        assert _blobs(nb_path) == []
+        assert notebook.read_cell(nb_path, 0)["outputs"][0]["data"]["image/png"] == "aGVsbG8="
+
+    def test_disabled_by_default(self, nb_path, monkeypatch):
+        monkeypatch.setattr(output_store, "MIN_BLOB_BYTES", 1024)
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 1)
+        assert _blobs(nb_path) == []
+
+    def test_get_cell_outputs_hydrates(self, nb_path, blob_store_enabled):
+        json_output = nbformat.v4.new_output(
+            "execute_result",
+            data={"application/json": {"values": list(range(500))}},
+            execution_count=1,
+        )
+        notebook.save_cell_execution(nb_path, 0, [_png_output(), json_output], 1)
+
+        outputs = notebook.get_cell_outputs(nb_path, 0)
+        assert outputs[0]["data"]["image/png"] == PNG
+        assert outputs[0]["data"]["text/plain"] == "<Figure>"
+        assert outputs[1]["data"] == {"application/json": {"values": list(range(500))}}
+        assert all(output_store.BLOB_METADATA_KEY not in o["metadata"] for o in outputs)
+
+
+class TestReferenceCounting:
+    def test_rerun_with_new_output_releases_old_blob(self, nb_path, blob_store_enabled):
+        other = base64.b64encode(b"other" * 1000).decode("ascii")
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 1)
+        old_sha = _blobs(nb_path)[0].stem
+
+        notebook.save_cell_execution(nb_path, 0, [_png_output(other)], 2)
+        store = output_store.get_store(nb_path)
+        assert store.refcount(old_sha) == 0
+
+        result = store.collect_garbage(grace_seconds=0)
+        assert result["deleted"] == [f"{old_sha}.png"]
+        assert len(_blobs(nb_path)) == 1
+        assert notebook.get_cell_outputs(nb_path, 0)[0]["data"]["image/png"] == other
+
+    def test_clear_outputs_releases_blobs(self, nb_path, blob_store_enabled):
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 1)
+        sha = _blobs(nb_path)[0].stem
+        notebook.clear_all_outputs(nb_path)
+        assert output_store.get_store(nb_path).refcount(sha) == 0
+
+    def test_gc_recounts_instead_of_trusting_refcounts(self, nb_path, blob_store_enabled):
+        notebook.save_cell_execution(nb_path, 0, [_png_output()], 1)
+        notebook.save_cell_execution(nb_path, 1, [_png_output()], 1)
+        store = output_store.get_store(nb_path)
+        sha = _blobs(nb_path)[0].stem
+
+        # delete_cell does not track blobs: the count is now too high
+        notebook.delete_cell(nb_path, 0)
+        assert store.refcount(sha) == 2
+        assert store.collect_garbage(grace_seconds=0)["deleted"] == []
+        assert store.refcount(sha) == 1
+
+        notebook.delete_cell(nb_path, 0)
+        assert store.collect_garbage(grace_seconds=0)["deleted"] == [f"{sha}.png"]
+
+    def test_grace_period_protects_new_blobs(self, nb_path, blob_store_enabled):
+        store = output_store.get_store(nb_path)
+        store.put(b"not referenced yet", ".txt")
+        assert store.collect_garbage()["deleted"] == []
+
+    def test_reused_blob_gets_a_new_grace_period(self, nb_path, blob_store_enabled):
+        store = output_store.get_store(nb_path)
+        blob = store.put(b"stored long ago", ".txt")
+        os.utime(blob, (0, 0))
+
+        # A dedupe hit for an output about to be saved
+        assert store.put(b"stored long ago", ".txt") == blob
+        assert store.collect_garbage(notebooks=[])["deleted"] == []
+        assert blob.exists()
+
+    def test_gc_skips_blobs_removed_during_the_sweep(
+        self, nb_path, blob_store_enabled, monkeypatch
+    ):
+        store = output_store.get_store(nb_path)
+        gone = store.put(b"renamed away", ".txt")
+        kept = store.put(b"old and unreferenced", ".txt")
+        os.utime(kept, (0, 0))
+        real_stat = type(gone).stat
+
+        def stat(path, *args, **kwargs):
+            if path == gone:
+                raise FileNotFoundError(path)
+            return real_stat(path, *args, **kwargs)
+
+        monkeypatch.setattr(type(gone), "stat", stat)
+        result = store.collect_garbage(notebooks=[], grace_seconds=60)
+
+        assert result["deleted"] == [kept.name]
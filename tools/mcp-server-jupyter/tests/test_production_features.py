@@ -4,14 +4,29 @@ import json
 from unittest.mock import MagicMock, patch
 from src.main import ConnectionManager, get_server_status, connection_manager
 from src.utils import get_project_root
+from src.output_limiter import OutputRateLimiter
 
 # --- Throttling Tests ---
 
 
+def _stream_output(text, seq):
+    return {
+        "method": "notebook/output",
+        "params": {
+            "notebook_path": "nb.ipynb",
+            "task_id": "t1",
+            "output": {"output_type": "stream", "name": "stdout", "text": text},
+            "seq_start": seq,
+            "seq_end": seq,
+        },
+    }
+
+
 @pytest.mark.asyncio
 async def test_broadcast_throttling():
-    """Verify that messages are throttled to ~10Hz."""
+    """Verify that bursts of output are delayed and merged, never dropped."""
     cm = ConnectionManager()
+    cm.output_limiter = OutputRateLimiter(cm._fanout, rate=10, burst=1)
     mock_socket = MagicMock()
     mock_socket.send_text = MagicMock(return_value=asyncio.Future())
     mock_socket.send_text.return_value.set_result(None)
@@ -19,28 +34,52 @@ async def test_broadcast_throttling():
     await cm.connect(mock_socket)
 
     # 1. Send first message (should execute)
-    await cm.broadcast({"method": "notebook/output", "data": "1"})
+    await cm.broadcast(_stream_output("1\n", 1))
     assert mock_socket.send_text.call_count == 1
 
-    # 2. Send immediate second message (should be dropped/skipped due to throttling)
-    # We mock time to be same instant
-    with patch("time.time", return_value=cm.last_broadcast + 0.05):
-        await cm.broadcast({"method": "notebook/output", "data": "2"})
-
-    # Call count should STILL be 1
+    # 2. Immediate follow-ups wait for the next token instead of being dropped
+    await cm.broadcast(_stream_output("2\n", 2))
+    await cm.broadcast(_stream_output("3\n", 3))
     assert mock_socket.send_text.call_count == 1
 
-    # 3. Send message after 0.2s (should execute)
-    with patch("time.time", return_value=cm.last_broadcast + 0.2):
-        await cm.broadcast({"method": "notebook/output", "data": "3"})
-
+    # 3. After the refill they arrive as one merged message
+    await asyncio.sleep(0.2)
     assert mock_socket.send_text.call_count == 2
+    merged = json.loads(mock_socket.send_text.call_args[0][0])["params"]
+    assert merged["output"]["text"] == "2\n3\n"
+    assert (merged["seq_start"], merged["seq_end"]) == (2, 3)
+    assert merged["coalesced"] == 2
 
     # 4. Verify non-output messages are NOT throttled
     await cm.broadcast({"method": "notebook/status", "data": "urgent"})
     assert mock_socket.send_text.call_count == 3
 
 
+@pytest.mark.asyncio
+async def test_status_flushes_pending_output_first():
+    """The last output of a cell is delivered before its status message."""
+    cm = ConnectionManager()
+    cm.output_limiter = OutputRateLimiter(cm._fanout, rate=1, burst=1)
+    mock_socket = MagicMock()
+    mock_socket.send_text = MagicMock(return_value=asyncio.Future())
+    mock_socket.send_text.return_value.set_result(None)
+    await cm.connect(mock_socket)
+
+    await cm.broadcast(_stream_output("first\n", 1))
+    await cm.broadcast(_stream_output("last\n", 2))
+    await cm.broadcast(
+        {"method": "notebook/status", "params": {"notebook_path": "nb.ipynb"}}
+    )
+
+    sent = [json.loads(call[0][0]) for call in mock_socket.send_text.call_args_list]
+    assert [m["method"] for m in sent] == [
+        "notebook/output",
+        "notebook/output",
+        "notebook/status",
+    ]
+    assert sent[1]["params"]["output"]["text"] == "last\n"
+
+
 # --- Server Status Tests ---
 
 
@@ -0,0 +1,156 @@
+"""
+Tests for the workspace search index
+====================================
+
+Verifies incremental (signature-based) reindexing, write-through updates
+from _atomic_write_notebook, regex prefiltering and the search_workspace
+helper.
+"""
+
+import time
+
+import nbformat
+import pytest
+
+from src import notebook, search_index
+from src.search_index import WorkspaceSearchIndex, _required_literal
+
+
+def _write_nb(path, sources):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(src) for src in sources]
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "project"
+    (root / "sub").mkdir(parents=True)
+    (root / ".ipynb_checkpoints").mkdir()
+    _write_nb(root / "load.ipynb", ["import pandas as pd", "df_clean = df.dropna()"])
+    _write_nb(root / "sub" / "plot.ipynb", ["plt.plot(df_clean.x)\nplt.show()"])
+    _write_nb(root / ".ipynb_checkpoints" / "load-checkpoint.ipynb", ["df_clean = 0"])
+    return root
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    idx = WorkspaceSearchIndex(tmp_path / "index.db")
+    monkeypatch.setattr(search_index, "_index", idx)
+    return idx
+
+
+class TestWorkspaceSearchIndex:
+    def test_finds_substring_across_notebooks(self, workspace, index):
+        assert index.refresh(workspace) == 2
+
+        hits = index.search("df_clean", root=workspace)
+        assert [(h["path"].split("/")[-1], h["cell_index"], h["line"]) for h in hits] == [
+            ("load.ipynb", 1, 1),
+            ("plot.ipynb", 0, 1),
+        ]
+
+    def test_search_is_case_sensitive_and_handles_short_queries(self, workspace, index):
+        index.refresh(workspace)
+        assert index.search("DF_CLEAN") == []
+        assert len(index.search("pd")) == 1
+
+    def test_only_changed_notebooks_are_reindexed(self, workspace, index):
+        index.refresh(workspace)
+        assert index.refresh(workspace, force=True) == 0
+
+        time.sleep(0.01)
+        _write_nb(workspace / "load.ipynb", ["df_final = 1"])
+        assert index.refresh(workspace, force=True) == 1
+        assert index.search("df_final")[0]["cell_index"] == 0
+
+    def test_deleted_notebook_is_dropped(self, workspace, index):
+        index.refresh(workspace)
+        (workspace / "sub" / "plot.ipynb").unlink()
+        index.refresh(workspace, force=True)
+
+        assert [h["path"].split("/")[-1] for h in index.search("df_clean")] == [
+            "load.ipynb"
+        ]
+
+    def test_atomic_write_updates_tracked_notebook(self, workspace, index):
+        index.refresh(workspace)
+        notebook.edit_cell(str(workspace / "load.ipynb"), 0, "import polars as pl")
+
+        # No refresh: the write itself updated the index
+        assert index.search("polars")[0]["cell_index"] == 0
+        assert index.search("pandas") == []
+
+    def test_regex_with_limit(self, workspace, index):
+        index.refresh(workspace)
+        hits = index.search(r"plt\.\w+\(", regex=True, limit=1)
+        assert len(hits) == 1
+        assert hits[0]["text"] == "plt.plot(df_clean.x)"
+
+
+class TestRequiredLiteral:
+    @pytest.mark.parametrize(
+        "pattern, literal",
+        [
+            ("df_clean", "df_clean"),
+            (r"def\s+load_data", "load_data"),
+            ("colou?r_map", "r_map"),
+            ("(abc)?define", "define"),
+            (r"plt\.show", "plt.show"),
+            ("foo|bar", None),
+            ("x.*yz", None),
+            # Multi-character escapes are skipped whole, never read as text
+            (r"\x41bc", None),
+            (r"\x41bcdef", "bcdef"),
+            (r"\101bcd", "bcd"),
+            (r"\u00e9tude", "tude"),
+            (r"\U0001F600face", "face"),
+            (r"\N{LATIN SMALL LETTER E WITH ACUTE}cole", "cole"),
+            (r"(ab)\1cdef", "cdef"),
+            # Class contents are skipped whole: a leading ]/^] or an escaped
+            # \] does not end the class
+            ("[]abc]xyz", "xyz"),
+            ("[^]abc]xy", None),
+            (r"[a\]bcd]efg", "efg"),
+            ("(x[)]abc)?zzz", "zzz"),
+        ],
+    )
+    def test_extraction(self, pattern, literal):
+        assert _required_literal(pattern) == literal
+
+    def test_escaped_characters_still_match(self, tmp_path, index):
+        root = tmp_path / "escapes"
+        root.mkdir()
+        _write_nb(root / "esc.ipynb", ["Abcdef = 1", "école = 2"])
+        index.refresh(root)
+
+        for pattern in (r"\x41bcdef", r"\101bcdef", r"\u00e9cole", r"\N{LATIN SMALL LETTER E WITH ACUTE}cole"):
+            assert len(index.search(pattern, regex=True, root=root)) == 1, pattern
+
+
+    @pytest.mark.parametrize(
+        "pattern, text",
+        [
+            ("[^]abc]xy", "zxy = 1"),
+            (r"[a\]bcd]efg", "]efg = 1"),
+            ("(x[)]abc)?zzz", "zzz = 1"),
+        ],
+    )
+    def test_class_contents_cause_no_false_negatives(self, tmp_path, index, pattern, text):
+        root = tmp_path / "classes"
+        root.mkdir()
+        _write_nb(root / "cls.ipynb", [text])
+        index.refresh(root)
+
+        assert len(index.search(pattern, regex=True, root=root)) == 1
+
+
+def test_search_workspace_tool_output(workspace, index):
+    result = notebook.search_workspace("df_clean", root=str(workspace))
+    assert result.startswith("Matches found:")
+    assert "load.ipynb Cell 1 (Line 1): df_clean = df.dropna()" in result
+    assert "checkpoint" not in result
+
+    assert "Invalid regex" in notebook.search_workspace("(", regex=True, root=str(workspace))
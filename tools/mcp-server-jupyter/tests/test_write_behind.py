@@ -0,0 +1,142 @@
+"""
+Tests for NotebookWriteBehind
+=============================
+
+Verifies that per-cell execution results are coalesced into one notebook
+rewrite, and that debounce, durability window and forced flushes all land
+the results on disk.
+"""
+
+import asyncio
+
+import nbformat
+import pytest
+
+from src import notebook
+from src.write_behind import NotebookWriteBehind
+
+
+def _output(text):
+    return nbformat.v4.new_output("stream", name="stdout", text=text)
+
+
+@pytest.fixture
+def nb_path(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell(f"x = {i}") for i in range(5)]
+    path = tmp_path / "wb.ipynb"
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    return str(path)
+
+
+@pytest.fixture
+def write_counter(monkeypatch):
+    writes = []
+    original = notebook._atomic_write_notebook
+
+    def counting_write(nb, path, **kwargs):
+        writes.append(path)
+        return original(nb, path, **kwargs)
+
+    monkeypatch.setattr(notebook, "_atomic_write_notebook", counting_write)
+    return writes
+
+
+class TestNotebookWriteBehind:
+    async def test_burst_is_coalesced_into_one_write(self, nb_path, write_counter):
+        wb = NotebookWriteBehind(debounce_seconds=60, max_unflushed_seconds=60)
+        for i in range(5):
+            await wb.save(nb_path, i, [_output(str(i))], execution_count=i + 1)
+
+        assert write_counter == []
+        assert wb.pending_count(nb_path) == 5
+
+        assert await wb.flush(nb_path) == 5
+        assert len(write_counter) == 1
+
+        cells = [notebook.read_cell(nb_path, i) for i in range(5)]
+        assert [c["execution_count"] for c in cells] == [1, 2, 3, 4, 5]
+        assert cells[4]["outputs"][0]["text"] == "4"
+
+    async def test_same_cell_last_result_wins(self, nb_path, write_counter):
+        wb = NotebookWriteBehind(debounce_seconds=60, max_unflushed_seconds=60)
+        await wb.save(nb_path, 0, [_output("old")], execution_count=1)
+        await wb.save(nb_path, 0, [_output("new")], execution_count=2)
+        await wb.flush(nb_path)
+
+        cell = notebook.read_cell(nb_path, 0)
+        assert cell["execution_count"] == 2
+        assert cell["outputs"][0]["text"] == "new"
+
+    async def test_debounce_flushes_in_background(self, nb_path, write_counter):
+        wb = NotebookWriteBehind(debounce_seconds=0.05, max_unflushed_seconds=60)
+        await wb.save(nb_path, 1, [_output("a")], execution_count=1)
+        await wb.save(nb_path, 2, [_output("b")], execution_count=2)
+
+        for _ in range(50):
+            if write_counter:
+                break
+            await asyncio.sleep(0.02)
+
+        assert len(write_counter) == 1
+        assert wb.pending_count(nb_path) == 0
+
+    async def test_zero_window_is_write_through(self, nb_path, write_counter):
+        wb = NotebookWriteBehind(max_unflushed_seconds=0)
+        await wb.save(nb_path, 0, [_output("now")], execution_count=1)
+
+        assert len(write_counter) == 1
+        assert notebook.read_cell(nb_path, 0)["execution_count"] == 1
+
+    async def test_flush_all(self, nb_path, tmp_path, write_counter):
+        other = tmp_path / "other.ipynb"
+        other.write_text(open(nb_path).read())
+
+        wb = NotebookWriteBehind(debounce_seconds=60, max_unflushed_seconds=60)
+        await wb.save(nb_path, 0, [], execution_count=1)
+        await wb.save(str(other), 0, [], execution_count=1)
+
+        assert await wb.flush_all() == 2
+        assert len(write_counter) == 2
+        assert wb.stats()["pending_cells"] == 0
+
+    async def test_structural_edit_writes_pending_results_first(self, nb_path):
+        wb = NotebookWriteBehind(debounce_seconds=60, max_unflushed_seconds=60)
+        await wb.save(nb_path, 2, [_output("two")], execution_count=3)
+
+        # Inside the debounce window: cell 2 becomes cell 3
+        notebook.insert_cell(nb_path, 0, "inserted")
+
+        assert wb.pending_count(nb_path) == 0
+        assert notebook.read_cell(nb_path, 3)["outputs"][0]["text"] == "two"
+        assert notebook.read_cell(nb_path, 2)["outputs"] == []
+
+        await wb.save(nb_path, 1, [_output("one")], execution_count=4)
+        notebook.apply_notebook_edits(nb_path, [{"op": "delete", "index": 0}])
+        assert notebook.read_cell(nb_path, 0)["outputs"][0]["text"] == "one"
+
+    async def test_failed_write_is_requeued_and_reported(
+        self, nb_path, monkeypatch
+    ):
+        wb = NotebookWriteBehind(debounce_seconds=60, max_unflushed_seconds=60)
+        original = notebook.save_cell_execution
+        calls = []
+
+        def flaky(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(notebook, "save_cell_execution", flaky)
+        await wb.save(nb_path, 0, [_output("kept")], execution_count=1)
+
+        assert await wb.flush(nb_path) == 0
+        stats = wb.stats()
+        assert stats["failed_writes"] == 1
+        assert "disk full" in stats["last_error"]
+        assert wb.pending_count(nb_path) == 1
+
+        assert await wb.flush(nb_path) == 1
+        assert notebook.read_cell(nb_path, 0)["outputs"][0]["text"] == "kept"
@@ -85,6 +85,16 @@ export class McpNotebookController {
       }
     }
 
+    // 2b. Batched IOPub Messages (same entries as iopub_message, in arrival order)
+    else if (event.method === 'notebook/iopub_batch') {
+      for (const params of event.params.messages ?? []) {
+        const execution = this.kernelMsgIdToExecution.get(params.parent_header?.msg_id);
+        if (execution) {
+          await this.processIOPubMessage(execution, params);
+        }
+      }
+    }
+
     // Legacy handling for backward compatibility
     else if (event.method === 'notebook/output') {
       const { exec_id, type, content } = event.params;